@@ -0,0 +1,358 @@
+"""
+Two-tier cache backend: bounded in-process LRU (L1) in front of a shared
+cache such as Redis (L2), with stampede protection.
+
+- L1 keeps pickled values for ``L1_TIMEOUT`` seconds at most and evicts the
+  least recently used entries beyond ``L1_MAX_ENTRIES``/``L1_MAX_BYTES``.
+  Entries deleted in another process may be served from L1 for up to
+  ``L1_TIMEOUT`` seconds.
+- ``get()`` never blocks: a miss returns ``default`` to every caller.
+- Stampede protection is opt-in through ``get_or_set(key, callable)``: on a
+  miss only one caller (across threads and processes, via a lock key in L2)
+  runs the callable, and concurrent callers wait up to ``LOCK_WAIT`` seconds
+  for its value to appear in L2. The lock is released as soon as the
+  callable returns or raises; ``LOCK_TIMEOUT`` only covers a process that
+  died while holding it.
+- The async methods are BaseCache's ``sync_to_async`` wrappers and never
+  wait for a fill lock (``aget_or_set`` is built on ``aget``/``aadd``): they
+  all share one thread, where a wait would stall every async request. Async
+  callers deduplicate misses themselves (``news.async_views.cached``).
+- Values are stored in L2 with their expiry and regeneration time, and in
+  ``get_or_set()`` a single caller refreshes a hot key shortly before it
+  expires (probabilistic early expiration, "XFetch") while the others keep
+  getting the cached value.
+
+``cache_page`` below is Django's ``cache_page`` with the same single-flight
+for whole pages, usable with any cache backend: on a miss only one request
+renders the page, the others wait up to ``PAGE_LOCK_WAIT`` seconds for it to
+appear in the cache.
+
+Integers are stored raw and bypass L1, so incr()/decr() stay atomic in L2.
+
+Example::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'config.cache.TieredCache',
+            'LOCATION': 'tiered',
+            'OPTIONS': {'L2': 'redis', 'L1_TIMEOUT': 5},
+        },
+        'redis': {...},
+    }
+"""
+import math
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.middleware.cache import CacheMiddleware
+from django.utils.cache import get_cache_key, learn_cache_key
+from django.utils.decorators import decorator_from_middleware_with_args
+
+# Значение в L2: сам объект, момент истечения (time.time()) и время его вычисления
+_Entry = namedtuple('_Entry', ['value', 'expires_at', 'delta'])
+
+# Общие для всех потоков процесса структуры (экземпляры кэша у Django свои в каждом потоке)
+_l1_stores = {}
+_l1_locks = {}
+_fill_events = {}
+
+_POLL_INTERVAL = 0.05
+# Итоги ожидания чужого заполнения в _wait_for_fill
+_LEAD = object()  # лидер пропал, блокировку взял этот вызывающий
+_TIMED_OUT = object()
+
+
+class _LRUStore:
+    def __init__(self):
+        self.entries = OrderedDict()  # key -> (expires_at, pickled)
+        self.size = 0
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._name = location or 'tiered'
+        self._l2_alias = options['L2']
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_max_bytes = options.get('L1_MAX_BYTES', 64 * 1024 * 1024)
+        self._lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self._lock_wait = options.get('LOCK_WAIT', 3)
+        self._beta = options.get('EARLY_REFRESH_BETA', 1.0)
+        self._l1 = _l1_stores.setdefault(self._name, _LRUStore())
+        self._l1_lock = _l1_locks.setdefault(self._name, threading.Lock())
+        self._fills = _fill_events.setdefault(self._name, {})
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    # --- L1 ---
+
+    def _l1_get(self, l1_key):
+        with self._l1_lock:
+            item = self._l1.entries.get(l1_key)
+            if item is None:
+                return None
+            expires_at, pickled = item
+            if expires_at <= time.time():
+                self._l1_pop(l1_key)
+                return None
+            self._l1.entries.move_to_end(l1_key)
+        return pickle.loads(pickled)
+
+    def _l1_set(self, l1_key, entry):
+        expires_at = time.time() + self._l1_timeout
+        if entry.expires_at is not None:
+            expires_at = min(expires_at, entry.expires_at)
+        pickled = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) > self._l1_max_bytes:
+            return
+        with self._l1_lock:
+            self._l1_pop(l1_key)
+            self._l1.entries[l1_key] = (expires_at, pickled)
+            self._l1.size += len(pickled)
+            while len(self._l1.entries) > self._l1_max_entries or self._l1.size > self._l1_max_bytes:
+                oldest = next(iter(self._l1.entries))
+                self._l1_pop(oldest)
+
+    def _l1_pop(self, l1_key):
+        # Вызывается под self._l1_lock
+        item = self._l1.entries.pop(l1_key, None)
+        if item is not None:
+            self._l1.size -= len(item[1])
+
+    def _l1_delete(self, l1_key):
+        with self._l1_lock:
+            self._l1_pop(l1_key)
+
+    # --- single-flight ---
+
+    def _lock_key(self, key):
+        return f'tiered-fill-lock:{key}'
+
+    def _try_lead(self, key, version, l1_key):
+        if not self.l2.add(self._lock_key(key), 1, self._lock_timeout, version=version):
+            return False
+        with self._l1_lock:
+            self._fills.setdefault(l1_key, threading.Event())
+        return True
+
+    def _release(self, key, version, l1_key):
+        self.l2.delete(self._lock_key(key), version=version)
+        with self._l1_lock:
+            event = self._fills.pop(l1_key, None)
+        if event is not None:
+            event.set()
+
+    def _fill(self, key, default, timeout, version, l1_key):
+        """Вычисляет значение под уже взятой блокировкой и кладёт его в кэш."""
+        started = time.monotonic()
+        try:
+            value = default() if callable(default) else default
+            if value is not None:
+                self._store(key, value, timeout, version, l1_key, time.monotonic() - started)
+            return value
+        finally:
+            self._release(key, version, l1_key)
+
+    def _wait_for_fill(self, key, version, l1_key):
+        """Значение, положенное лидером в L2, либо _LEAD или _TIMED_OUT."""
+        with self._l1_lock:
+            event = self._fills.get(l1_key)
+        deadline = time.monotonic() + self._lock_wait
+        while time.monotonic() < deadline:
+            if event is not None:
+                # Лидер в этом же процессе: ждём его без опроса L2
+                event.wait(deadline - time.monotonic())
+                event = None
+            else:
+                time.sleep(_POLL_INTERVAL)
+            raw = self.l2.get(key, version=version)
+            if raw is not None:
+                return self._unwrap(raw, l1_key)
+            if self._try_lead(key, version, l1_key):
+                return _LEAD
+        return _TIMED_OUT
+
+    def _should_refresh_early(self, entry):
+        if entry.expires_at is None or not entry.delta:
+            return False
+        # XFetch: вероятность ранней перегенерации растёт по мере приближения к expires_at
+        return time.time() - entry.delta * self._beta * math.log(random.random() or 1e-12) >= entry.expires_at
+
+    def _unwrap(self, raw, l1_key):
+        if isinstance(raw, _Entry):
+            self._l1_set(l1_key, raw)
+            return raw.value
+        return raw
+
+    # --- API кэша ---
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        entry = self._l1_get(l1_key)
+        if entry is not None:
+            return entry.value
+        raw = self.l2.get(key, version=version)
+        if raw is None:
+            return default
+        return self._unwrap(raw, l1_key)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Значение ключа; при промахе default (или default()) вычисляет только
+        один вызывающий, остальные ждут его результат до LOCK_WAIT секунд.
+        """
+        l1_key = self.make_and_validate_key(key, version=version)
+        timeout = self._resolve_timeout(timeout)
+        entry = self._l1_get(l1_key)
+        if entry is not None:
+            return entry.value
+
+        raw = self.l2.get(key, version=version)
+        if raw is not None:
+            if isinstance(raw, _Entry) and self._should_refresh_early(raw) and self._try_lead(key, version, l1_key):
+                # Этот вызывающий перегенерирует значение, остальные получают текущее
+                return self._fill(key, default, timeout, version, l1_key)
+            return self._unwrap(raw, l1_key)
+
+        if self._try_lead(key, version, l1_key):
+            return self._fill(key, default, timeout, version, l1_key)
+        value = self._wait_for_fill(key, version, l1_key)
+        if value is _LEAD:
+            return self._fill(key, default, timeout, version, l1_key)
+        if value is not _TIMED_OUT:
+            return value
+        # Лидер не успел за LOCK_WAIT: вычисляем сами, не дожидаясь дальше
+        value = default() if callable(default) else default
+        if value is not None:
+            self._store(key, value, timeout, version, l1_key, 0.0)
+        return value
+
+    def _resolve_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _wrap(self, value, timeout, delta=0.0):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        expires_at = None if timeout is None else time.time() + timeout
+        return _Entry(value, expires_at, delta)
+
+    def _store(self, key, value, timeout, version, l1_key, delta):
+        raw = self._wrap(value, timeout, delta)
+        self.l2.set(key, raw, timeout, version=version)
+        if isinstance(raw, _Entry):
+            self._l1_set(l1_key, raw)
+        else:
+            self._l1_delete(l1_key)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._store(key, value, self._resolve_timeout(timeout), version, l1_key, 0.0)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        timeout = self._resolve_timeout(timeout)
+        raw = self._wrap(value, timeout)
+        added = self.l2.add(key, raw, timeout, version=version)
+        if added and isinstance(raw, _Entry):
+            self._l1_set(l1_key, raw)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.touch(key, self._resolve_timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        return self._l1_get(l1_key) is not None or self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.decr(key, delta, version=version)
+
+    def clear(self):
+        with self._l1_lock:
+            self._l1.entries.clear()
+            self._l1.size = 0
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+
+# cache_page с защитой от одновременных промахов
+PAGE_LOCK_TIMEOUT = 10  # блокировка заполнения страницы, если рендеривший процесс умер
+PAGE_LOCK_WAIT = 3  # сколько остальные запросы ждут страницу, прежде чем рендерить сами
+PAGE_HEADERS_TIMEOUT = 60 * 60 * 24  # список заголовков Vary страницы живёт дольше самой страницы
+
+
+class SingleFlightCacheMiddleware(CacheMiddleware):
+    """
+    CacheMiddleware, у которой промах по странице рендерит один запрос: он
+    берёт блокировку (cache.add) на ключ страницы, остальные запросы того же
+    варианта страницы ждут её появления в кэше до PAGE_LOCK_WAIT секунд.
+    Ключ страницы зависит от заголовков Vary, которые Django запоминает на
+    время жизни страницы; здесь они хранятся PAGE_HEADERS_TIMEOUT, иначе
+    после истечения страницы ключ был бы неизвестен как раз тогда, когда
+    нужна блокировка. Самый первый запрос страницы идёт без защиты.
+    """
+    def process_request(self, request):
+        response = super().process_request(request)
+        if response is not None or not request._cache_update_cache:
+            return response
+        cache_key = get_cache_key(request, self.key_prefix, 'GET', cache=self.cache)
+        if cache_key is None:
+            return None
+        lock_key = f'{cache_key}:fill'
+        if self.cache.add(lock_key, 1, PAGE_LOCK_TIMEOUT):
+            request._cache_fill_lock = lock_key
+            return None
+        deadline = time.monotonic() + PAGE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(_POLL_INTERVAL)
+            response = super().process_request(request)
+            if response is not None:
+                return response
+        # Рендеривший запрос не успел за PAGE_LOCK_WAIT: рендерим сами
+        return None
+
+    def process_response(self, request, response):
+        try:
+            response = super().process_response(request, response)
+            if getattr(request, '_cache_update_cache', False) and response.status_code == 200:
+                learn_cache_key(request, response, PAGE_HEADERS_TIMEOUT, self.key_prefix, cache=self.cache)
+            return response
+        finally:
+            self._release(request)
+
+    def process_exception(self, request, exception):
+        self._release(request)
+
+    def _release(self, request):
+        lock_key = getattr(request, '_cache_fill_lock', None)
+        if lock_key is not None:
+            self.cache.delete(lock_key)
+            request._cache_fill_lock = None
+
+
+def cache_page(timeout, *, cache=None, key_prefix=None):
+    """Как django.views.decorators.cache.cache_page, но промах по странице рендерит один запрос."""
+    return decorator_from_middleware_with_args(SingleFlightCacheMiddleware)(
+        page_timeout=timeout, cache_alias=cache, key_prefix=key_prefix,
+    )
@@ -3,6 +3,7 @@ Celery configuration for News Portal project.
 """
 import os
 from celery import Celery
+from celery.signals import task_prerun, task_postrun, worker_process_shutdown
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -23,3 +24,42 @@ app.autodiscover_tasks()
 def debug_task(self):
     print(f'Request: {self.request!r}')
 
+
+# Метрики задач. config.metrics импортируется лениво: к этому моменту
+# Django settings уже загружены и PROMETHEUS_MULTIPROC_DIR выставлен.
+@task_prerun.connect
+def _metrics_task_prerun(task_id=None, **kwargs):
+    from config import metrics
+    metrics.task_started(task_id)
+
+
+@task_postrun.connect
+def _metrics_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    from config import metrics
+    metrics.task_finished(task_id, task.name, (state or 'unknown').lower())
+
+
+@worker_process_shutdown.connect
+def _metrics_process_shutdown(pid=None, **kwargs):
+    from config import metrics
+    metrics.process_exited(pid or os.getpid())
+
+
+# Роутер реплик: каждая задача начинает с чтения из реплик
+@task_prerun.connect
+def _router_task_prerun(**kwargs):
+    from config.routers import reset_pin
+    reset_pin()
+
+
+# Лог медленных запросов: помечаем запросы именем выполняемой задачи
+@task_prerun.connect
+def _slowlog_task_prerun(task=None, **kwargs):
+    from config.slowlog import call_site
+    call_site.set(f'task:{task.name}')
+
+
+@task_postrun.connect
+def _slowlog_task_postrun(**kwargs):
+    from config.slowlog import call_site
+    call_site.set('-')
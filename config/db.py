@@ -0,0 +1,19 @@
+"""
+Helpers for features that depend on the database backend.
+"""
+from django.db import connections
+
+
+def is_postgres(using='default') -> bool:
+    return connections[using].vendor == 'postgresql'
+
+
+def supports_update_returning(using='default') -> bool:
+    """UPDATE ... RETURNING: Postgres и SQLite 3.35+."""
+    connection = connections[using]
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def supports_skip_locked(using='default') -> bool:
+    """SELECT ... FOR UPDATE SKIP LOCKED (Postgres, MySQL 8+, Oracle)."""
+    return connections[using].features.has_select_for_update_skip_locked
@@ -0,0 +1,125 @@
+"""
+Prometheus metrics for the web process and Celery workers.
+
+Metric values are written to ``PROMETHEUS_MULTIPROC_DIR`` (set in settings
+before this module is imported), so every gunicorn/uwsgi worker and every
+Celery process contributes to the same numbers served by ``/metrics``.
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    'newsportal_http_request_duration_seconds',
+    'Request latency by URL name',
+    ['view', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUEST_QUERIES = Histogram(
+    'newsportal_http_request_db_queries',
+    'Number of DB queries per request by URL name',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250),
+)
+CACHE_PAGE_REQUESTS = Counter(
+    'newsportal_cache_page_requests_total',
+    'cache_page lookups by URL name and result (hit/miss)',
+    ['view', 'result'],
+)
+TASK_LATENCY = Histogram(
+    'newsportal_celery_task_duration_seconds',
+    'Celery task run time',
+    ['task'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 1800.0),
+)
+TASK_RESULTS = Counter(
+    'newsportal_celery_tasks_total',
+    'Finished Celery tasks by state (success/failure/retry)',
+    ['task', 'state'],
+)
+EMAILS_SENT = Counter(
+    'newsportal_emails_sent_total',
+    'Emails handed to the mail backend, by task',
+    ['task'],
+)
+
+# task_id -> perf_counter() на момент task_prerun
+_task_started = {}
+
+
+def view_name(request) -> str:
+    """Имя URL-маршрута (news:news_list) или 'unresolved' для 404."""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match and match.view_name else 'unresolved'
+
+
+class MetricsMiddleware:
+    """
+    Records latency, DB query count and cache_page hit/miss per URL name.
+
+    Should be the first entry of MIDDLEWARE so the latency covers the whole
+    middleware stack.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = view_name(request)
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(elapsed)
+        REQUEST_QUERIES.labels(view).observe(queries[0])
+
+        # FetchFromCacheMiddleware (cache_page) выставляет этот флаг:
+        # False - ответ отдан из кэша, True - кэш промахнулся и ответ будет сохранён.
+        # Для остальных методов флаг всегда False, и это не попадание в кэш.
+        update_cache = getattr(request, '_cache_update_cache', None)
+        if update_cache is not None and request.method in ('GET', 'HEAD'):
+            CACHE_PAGE_REQUESTS.labels(view, 'miss' if update_cache else 'hit').inc()
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition, aggregated over all processes."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def task_started(task_id):
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id, task_name, state):
+    start = _task_started.pop(task_id, None)
+    if start is not None:
+        TASK_LATENCY.labels(task_name).observe(time.perf_counter() - start)
+    TASK_RESULTS.labels(task_name, state).inc()
+
+
+def process_exited(pid):
+    multiprocess.mark_process_dead(pid)
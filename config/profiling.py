@@ -0,0 +1,73 @@
+"""
+On-demand cProfile profiling of single requests.
+
+A request is profiled when either
+- a staff user adds ``?_profile=1`` to the URL, or
+- the request carries an ``X-Profile`` header with a token signed by
+  ``make_profile_token()`` (see ``manage.py profiles --token``).
+
+The resulting ``.prof`` file is written to ``settings.PROFILES_DIR`` and can be
+inspected with ``manage.py profiles`` or any pstats-compatible viewer.
+"""
+import cProfile
+import os
+import time
+
+from django.conf import settings
+from django.core import signing
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+_TOKEN_SALT = 'newsportal.profiling'
+_TOKEN_VALUE = 'profile'
+
+
+def make_profile_token() -> str:
+    return signing.TimestampSigner(salt=_TOKEN_SALT).sign(_TOKEN_VALUE)
+
+
+def _valid_token(token: str) -> bool:
+    try:
+        value = signing.TimestampSigner(salt=_TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILE_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return value == _TOKEN_VALUE
+
+
+class ProfilingMiddleware:
+    """
+    Runs the rest of the stack under cProfile when profiling is requested.
+
+    Place after AuthenticationMiddleware (the staff check needs request.user).
+    Requests without the parameter or header only pay for two dict lookups.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        header = request.META.get(PROFILE_HEADER)
+        if header is None and PROFILE_PARAM not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+        if not self._allowed(request, header):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        response['X-Profile-File'] = self._dump(request, profiler)
+        return response
+
+    def _allowed(self, request, header) -> bool:
+        if header is not None:
+            return _valid_token(header)
+        user = getattr(request, 'user', None)
+        return PROFILE_PARAM in request.GET and user is not None and user.is_staff
+
+    def _dump(self, request, profiler) -> str:
+        match = request.resolver_match
+        view = match.view_name.replace(':', '_') if match and match.view_name else 'unresolved'
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{view}-{os.getpid()}.prof"
+        settings.PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(settings.PROFILES_DIR / filename)
+        return filename
@@ -0,0 +1,116 @@
+"""
+Cache-backed rate limiting (sliding window counter).
+
+Each limit counts hits per key in two fixed windows of ``period`` seconds:
+the current one and the previous one. The previous window's count is weighted
+by the part of it still inside the sliding window, so
+``previous * (1 - elapsed / period) + current`` estimates the hits over the
+last ``period`` seconds without a boundary burst of 2x the limit.
+
+A check costs three cache round trips and no DB queries. The counter is
+bumped with an atomic ``incr()`` before the decision is made, so concurrent
+requests each see a distinct count and cannot all slip under the limit.
+Rejected hits are rolled back, so an over-limit client doesn't extend its
+own lockout. If the cache is down the check fails open.
+
+The counters need a cache shared by all processes (Redis, or the
+``TieredCache`` in front of it, which keeps integers out of L1). With the
+default LocMemCache each process counts on its own.
+
+``AnonRateLimitMiddleware`` throttles anonymous clients per IP with
+``ANON_RATE_LIMIT`` (on by default only when ``RATELIMIT_IP_HEADER`` is set,
+since behind a proxy ``REMOTE_ADDR`` is the proxy for every client). The
+client address is the right-most entry of that header not added by one of
+our own ``RATELIMIT_TRUSTED_PROXIES`` proxies: entries to the left of it
+come from the client and can be forged.
+
+The counters are approximate and reset with the cache, so business rules
+such as the daily publication limit are checked in the database instead
+(``news.views.PostCreateMixin``).
+"""
+import functools
+import math
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+Decision = namedtuple('Decision', 'allowed count retry_after')
+
+
+class RateLimit:
+    def __init__(self, scope, limit, period):
+        self.scope = scope
+        self.limit = limit
+        self.period = period
+
+    def _key(self, key, window):
+        return f'ratelimit:{self.scope}:{key}:{window}'
+
+    def _incr(self, cache_key, delta):
+        try:
+            return cache.incr(cache_key, delta)
+        except ValueError:
+            # Ключа ещё нет (или он истёк между add и incr)
+            if delta < 0:
+                return None
+            cache.add(cache_key, 0, self.period * 2)
+            try:
+                return cache.incr(cache_key, delta)
+            except ValueError:
+                return None
+
+    def hit(self, key) -> Decision:
+        """Учитывает обращение и решает, пропустить ли его."""
+        now = time.time()
+        window, elapsed = divmod(now, self.period)
+        current = self._incr(self._key(key, int(window)), 1)
+        if current is None:
+            # Кэш недоступен: лучше пропустить, чем заблокировать всех
+            return Decision(True, 0, 0)
+        previous = cache.get(self._key(key, int(window) - 1), 0)
+        count = previous * (1 - elapsed / self.period) + current
+        if count <= self.limit:
+            return Decision(True, count, 0)
+        self._incr(self._key(key, int(window)), -1)
+        return Decision(False, count, math.ceil(self.period - elapsed))
+
+
+@functools.cache
+def parse_rate(rate) -> RateLimit:
+    """'300/60' -> RateLimit на 300 обращений за 60 секунд."""
+    limit, period = rate.split('/')
+    return RateLimit('anon', int(limit), int(period))
+
+
+def client_ip(request) -> str:
+    header = settings.RATELIMIT_IP_HEADER
+    hops = [hop.strip() for hop in request.META.get(header, '').split(',') if hop.strip()] if header else []
+    if not hops:
+        return request.META.get('REMOTE_ADDR', '')
+    # Каждый наш прокси дописывает справа адрес, с которого к нему пришли; левее - то, что прислал клиент
+    trusted = max(1, settings.RATELIMIT_TRUSTED_PROXIES)
+    return hops[-min(trusted, len(hops))]
+
+
+class AnonRateLimitMiddleware:
+    """
+    Ограничивает частоту запросов анонимных клиентов по IP (ANON_RATE_LIMIT).
+    Пользователь без cookie сессии - аноним без обращения к БД; с cookie -
+    проверяется request.user (сессия понадобится запросу в любом случае).
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.ANON_RATE_LIMIT
+        if rate and not (settings.SESSION_COOKIE_NAME in request.COOKIES and request.user.is_authenticated):
+            decision = parse_rate(rate).hit(client_ip(request))
+            if not decision.allowed:
+                response = HttpResponse('Слишком много запросов, попробуйте позже.', status=429,
+                                        content_type='text/plain; charset=utf-8')
+                response['Retry-After'] = str(decision.retry_after)
+                return response
+        return self.get_response(request)
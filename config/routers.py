@@ -0,0 +1,136 @@
+"""
+Primary/replica database router.
+
+Reads go to a random healthy replica from ``settings.DATABASE_REPLICAS``,
+writes go to ``default``. Once a request (or task) has written, the rest of it
+reads from the primary; ``ReplicaPinMiddleware`` extends that to the user's
+following requests for ``REPLICA_PIN_SECONDS`` via a cookie, so users see
+their own posts and subscriptions despite replication lag. Replicas lagging
+more than ``REPLICA_MAX_LAG_SECONDS`` are skipped. The replica is chosen
+once per request (or task) and kept for its other reads, so one request
+never mixes snapshots of replicas at different replay positions.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models.signals import post_migrate, pre_migrate
+from django.dispatch import receiver
+
+PIN_COOKIE = 'pin_primary'
+
+_pinned = ContextVar('replica_pinned', default=False)
+_wrote = ContextVar('replica_wrote', default=False)
+_replica = ContextVar('replica_alias', default=None)  # реплика, выбранная для текущего запроса/задачи
+
+# alias -> (время проверки, отставание в секундах)
+_lag_cache = {}
+
+
+def replica_lag(alias) -> float:
+    """Отставание реплики в секундах (кэшируется на REPLICA_LAG_CHECK_INTERVAL)."""
+    checked_at, lag = _lag_cache.get(alias, (0.0, 0.0))
+    now = time.monotonic()
+    if now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return lag
+    if 'postgresql' not in settings.DATABASES[alias]['ENGINE']:
+        # SQLite-заглушки реплик отставания не имеют
+        lag = 0.0
+    else:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+                )
+                lag = float(cursor.fetchone()[0])
+        except DatabaseError:
+            lag = float('inf')
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas():
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+
+
+def reset_pin():
+    """Сбрасывает привязку к primary (начало новой Celery-задачи)."""
+    _pinned.set(False)
+    _wrote.set(False)
+    _replica.set(None)
+
+
+@contextmanager
+def pinned_to_primary():
+    """Все чтения внутри блока идут в primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+@receiver(pre_migrate)
+def _pin_during_migrate(sender, **kwargs):
+    # Data-миграции читают через менеджеры без using(): читаем из мигрируемой primary
+    _pinned.set(True)
+
+
+@receiver(post_migrate)
+def _unpin_after_migrate(sender, **kwargs):
+    reset_pin()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or not settings.DATABASE_REPLICAS:
+            return 'default'
+        replica = _replica.get()
+        if replica is None:
+            replicas = healthy_replicas()
+            replica = random.choice(replicas) if replicas else 'default'
+            _replica.set(replica)
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # После записи дочитываем из primary до конца запроса/задачи
+        _wrote.set(True)
+        _pinned.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinMiddleware:
+    """
+    Pins a client to the primary for REPLICA_PIN_SECONDS after it wrote.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned_token = _pinned.set(PIN_COOKIE in request.COOKIES)
+        wrote_token = _wrote.set(False)
+        replica_token = _replica.set(None)
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                response.set_cookie(
+                    PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+                )
+            return response
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
+            _replica.reset(replica_token)
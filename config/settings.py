@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from celery.schedules import crontab
+from kombu import Queue
+from django.core.exceptions import ImproperlyConfigured
+import importlib.util
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -81,11 +84,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',  # первым: измеряет весь стек middleware
     'django.middleware.security.SecurityMiddleware',
+    'config.routers.ReplicaPinMiddleware',  # чтение из primary после записи
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.ratelimit.AnonRateLimitMiddleware',  # 429 для анонимов сверх ANON_RATE_LIMIT, без запросов к БД
+    'config.profiling.ProfilingMiddleware',  # ?_profile=1 для staff или подписанный X-Profile
+    'config.slowlog.SlowQueryContextMiddleware',  # имя view для лога медленных запросов
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -114,13 +122,87 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Выбор СУБД через переменные окружения: DB_ENGINE=sqlite (по умолчанию) или postgres.
+# Для postgres нужен psycopg; без него - ошибка конфигурации, а не тихий переход на SQLite.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+if DB_ENGINE == 'postgres' and importlib.util.find_spec('psycopg') is None:
+    raise ImproperlyConfigured('DB_ENGINE=postgres требует пакет psycopg: pip install "psycopg[binary]"')
+
+# PRAGMA, выполняемые при открытии каждого SQLite-соединения:
+# WAL - читатели не блокируются писателем, synchronous=NORMAL - безопасно в WAL
+# и без fsync на каждый коммит, busy_timeout - ждать блокировку вместо
+# мгновенного "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # 256 МБ
+    'cache_size': -64 * 1024,  # в КиБ (отрицательное значение), т.е. 64 МБ
+    'busy_timeout': 5000,  # мс
+    'temp_store': 'MEMORY',
 }
 
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'newsportal'),
+            'USER': os.environ.get('DB_USER', 'newsportal'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'OPTIONS': {},
+        }
+    }
+    if importlib.util.find_spec('psycopg_pool') is not None:
+        # Нативный пул psycopg: соединениями управляет пул, CONN_MAX_AGE должен быть 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = 600
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': 600,  # постоянные соединения вместо нового на каждый запрос
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                # Транзакции сразу берут блокировку на запись: без взаимоблокировок
+                # при повышении DEFERRED-транзакции с чтения до записи
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Реплики только для чтения: DB_REPLICAS - список через запятую хостов (Postgres)
+# или путей к файлам (SQLite, для локальной проверки роутера). В тестах
+# реплики зеркалируют default.
+DATABASE_REPLICAS = []
+for _index, _replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    _alias = f'replica{_index}'
+    DATABASES[_alias] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    DATABASES[_alias]['HOST' if DB_ENGINE == 'postgres' else 'NAME'] = _replica.strip()
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['config.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 5  # сколько после записи пользователь читает из primary
+REPLICA_MAX_LAG_SECONDS = 10  # реплики с большим отставанием не используются
+REPLICA_LAG_CHECK_INTERVAL = 5  # как часто перепроверять отставание, с
+
+# Размер пачки для потоковых выборок (QuerySet.iterator); на Postgres
+# iterator() использует серверные курсоры
+DB_ITERATOR_CHUNK_SIZE = 2000
+
+
+# Baseline для manage.py bench_views: регрессия латентности, числа запросов
+# или размера ответа относительно него завершает команду с ошибкой
+BENCHMARK_BASELINE = BASE_DIR / 'benchmarks' / 'baseline.json'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -167,10 +249,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SITE_ID = 1
 
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
-    'allauth.account.auth_backends.AuthenticationBackend',
+    # ModelBackend и бэкенд allauth с кэшированием пользователя, его групп и прав (sign/backends.py)
+    'sign.backends.CachedModelBackend',
+    'sign.backends.CachedAuthenticationBackend',
 ]
 
+# Сколько хранятся в кэше пользователь, его группы и права, с (сбрасываются при их изменении)
+AUTH_CACHE_TIMEOUT = 3600
+
+# За сколько последних дней RSS/Atom-ленты содержат полный текст постов (news/feeds.py);
+# для более старых записей из БД читается только начало текста
+FEED_FULL_TEXT_DAYS = 3
+
+# Async-версии страниц только для чтения (news/async_views.py) для запуска под ASGI.
+# Под WSGI каждая из них выполнялась бы через async_to_sync, поэтому по умолчанию выключено
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
+# Сессии читаются из кэша (при REDIS_CACHE_URL - через L1/Redis) и пишутся в БД;
+# запрос с живой сессией не обращается к django_session
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
 # Email settings
 # Загружаем учетные данные из файла
 email_credentials = load_email_credentials()
@@ -237,7 +336,6 @@ SOCIALACCOUNT_USERNAME_REQUIRED = False
 
 # Cache Configuration
 # Используем локальное кэширование в памяти по умолчанию
-# Если Redis доступен, можно переключиться на него вручную
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -247,21 +345,43 @@ CACHES = {
     }
 }
 
-# Если Redis доступен, можно использовать его (раскомментируйте при запущенном Redis):
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': 'redis://127.0.0.1:6379/1',  # Используем базу 1 для кэша (0 для Celery)
-#         'KEY_PREFIX': 'newsportal',
-#         'TIMEOUT': 300,  # 5 минут по умолчанию
-#         'OPTIONS': {
-#             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-#             'SOCKET_CONNECT_TIMEOUT': 1,
-#             'SOCKET_TIMEOUT': 1,
-#             'IGNORE_EXCEPTIONS': True,  # Игнорировать ошибки подключения
-#         }
-#     }
-# }
+# Если задан REDIS_CACHE_URL (например redis://127.0.0.1:6379/1, база 1 - кэш, 0 - Celery),
+# используется двухуровневый кэш: LRU в памяти процесса (L1) перед общим Redis (L2)
+# с защитой от одновременной перегенерации одного ключа (config.cache.TieredCache)
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'config.cache.TieredCache',
+            'LOCATION': 'newsportal-l1',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'L2': 'redis',
+                'L1_TIMEOUT': 5,  # максимум устаревания L1 относительно Redis, с
+                'L1_MAX_ENTRIES': 1000,
+                'L1_MAX_BYTES': 64 * 1024 * 1024,
+                'LOCK_TIMEOUT': 10,  # сколько живёт блокировка перегенерации ключа, с
+                'LOCK_WAIT': 3,  # сколько остальные ждут перегенерированное значение, с
+            },
+        },
+        'redis': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'KEY_PREFIX': 'newsportal',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'SOCKET_CONNECT_TIMEOUT': 1,
+                'SOCKET_TIMEOUT': 1,
+                'IGNORE_EXCEPTIONS': True,  # Игнорировать ошибки подключения
+            },
+        },
+    }
+
+# Redis pub/sub для событий о новых постах (SSE, news/events.py), например
+# redis://127.0.0.1:6379/2. Без него события раздаются только внутри процесса,
+# поэтому с несколькими воркерами или постами из Celery/WSGI он обязателен
+EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL')
 
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'  # URL для подключения к Redis
@@ -274,6 +394,60 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 минут максимум на задачу
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 минут мягкий лимит
 
+# Короткие таймауты и без бесконечных повторов подключения: если брокер
+# недоступен, scheduler.queue.enqueue() быстро откладывает задачу в спул
+CELERY_BROKER_CONNECTION_TIMEOUT = 1
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'max_retries': 1,
+    'interval_start': 0,
+    'interval_step': 0.2,
+    'interval_max': 0.5,
+    'socket_connect_timeout': 1,
+    'socket_timeout': 2,
+}
+CELERY_REDIS_SOCKET_CONNECT_TIMEOUT = 1
+CELERY_REDIS_SOCKET_TIMEOUT = 2
+CELERY_RESULT_BACKEND_TRANSPORT_OPTIONS = {
+    'retry_policy': {'max_retries': 1, 'interval_start': 0, 'interval_step': 0.2, 'interval_max': 0.5},
+}
+CELERY_TASK_PUBLISH_RETRY = False
+
+# Очереди и маршрутизация задач (топология воркеров - в README):
+# realtime    - уведомления о новых постах и письма регистрации, должны уходить сразу
+# bulk        - еженедельный дайджест: много писем, ограничение скорости
+# maintenance - служебные задачи (переотправка спула, пересчёт цензуры)
+CELERY_TASK_QUEUES = (
+    Queue('realtime', routing_key='realtime'),
+    Queue('bulk', routing_key='bulk'),
+    Queue('maintenance', routing_key='maintenance'),
+)
+CELERY_TASK_DEFAULT_QUEUE = 'realtime'
+CELERY_TASK_ROUTES = {
+    'news.tasks.notify_subscribers': {'queue': 'realtime'},
+    'sign.tasks.send_welcome_email': {'queue': 'realtime'},
+    'news.tasks.send_weekly_digest': {'queue': 'bulk'},
+    'news.tasks.send_category_digest': {'queue': 'bulk'},
+    'news.tasks.notify_imported_posts': {'queue': 'bulk'},
+    'scheduler.tasks.replay_spooled_tasks': {'queue': 'maintenance'},
+    'news.tasks.recensor': {'queue': 'maintenance'},
+    'config.celery.debug_task': {'queue': 'maintenance'},
+}
+# Приоритеты внутри очереди (Redis: 0 - наивысший), задаются в @shared_task(priority=...)
+CELERY_BROKER_TRANSPORT_OPTIONS['priority_steps'] = list(range(10))
+CELERY_BROKER_TRANSPORT_OPTIONS['sep'] = ':'
+CELERY_BROKER_TRANSPORT_OPTIONS['queue_order_strategy'] = 'priority'
+CELERY_TASK_DEFAULT_PRIORITY = 5
+# По умолчанию воркер не набирает задач впрок: длинная задача дайджеста не держит
+# за собой очередь. Воркеры realtime запускаются с --prefetch-multiplier 4.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Circuit breaker для отправки задач (scheduler.queue)
+CELERY_BREAKER_FAILURE_THRESHOLD = 1  # ошибок подряд до размыкания
+CELERY_BREAKER_RESET_TIMEOUT = 30  # через сколько секунд пробовать брокер снова
+CELERY_SPOOL_REPLAY_BATCH = 500
+CELERY_SPOOL_MAX_ATTEMPTS = 10  # после стольких ошибок задача помечается failed и больше не отправляется
+CELERY_SPOOL_CLAIM_TIMEOUT = 300  # секунд: захваченная пачка возвращается в спул, если воркер упал
+
 CELERY_BEAT_SCHEDULE = {
     'weekly-digest': {
         'task': 'news.tasks.send_weekly_digest',
@@ -282,8 +456,36 @@ CELERY_BEAT_SCHEDULE = {
             'expires': 60.0 * 60 * 24,  # Истекает через день
         },
     },
+    'replay-spooled-tasks': {
+        'task': 'scheduler.tasks.replay_spooled_tasks',
+        'schedule': 60.0,  # Каждую минуту: переотправка задач, отложенных при недоступном брокере
+        'options': {
+            'expires': 50.0,
+        },
+    },
 }
 
+# Prometheus metrics
+# Каталог, через который процессы (веб-воркеры и Celery) суммируют метрики.
+# Должен быть выставлен до первого импорта prometheus_client; при деплое
+# каталог очищают перед стартом процессов.
+METRICS_DIR = Path(os.environ.get('PROMETHEUS_MULTIPROC_DIR', BASE_DIR / 'metrics'))
+METRICS_DIR.mkdir(exist_ok=True)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', str(METRICS_DIR))
+# С каких адресов доступен /metrics
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Ограничение частоты (config.ratelimit). Счётчики - в кэше, общем для процессов (REDIS_CACHE_URL)
+# За прокси - заголовок с адресом клиента, например HTTP_X_FORWARDED_FOR; иначе REMOTE_ADDR
+RATELIMIT_IP_HEADER = os.environ.get('RATELIMIT_IP_HEADER')
+# Сколько своих прокси дописывают адрес в этот заголовок (nginx с $proxy_add_x_forwarded_for - 1)
+RATELIMIT_TRUSTED_PROXIES = int(os.environ.get('RATELIMIT_TRUSTED_PROXIES', '1'))
+# Запросов анонимного клиента с одного IP: 'число/секунды'; пустая строка отключает.
+# По умолчанию включено только с RATELIMIT_IP_HEADER: за прокси без него все клиенты
+# пришли бы с адреса прокси и делили бы один счётчик
+ANON_RATE_LIMIT = os.environ.get('ANON_RATE_LIMIT', '300/60' if RATELIMIT_IP_HEADER else '') or None
+POST_DAILY_LIMIT = 3  # публикаций одного пользователя за скользящие сутки
+
 # Logging Configuration
 import os
 import logging
@@ -292,6 +494,14 @@ import logging
 LOGS_DIR = BASE_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Профили запросов (config.profiling.ProfilingMiddleware)
+PROFILES_DIR = LOGS_DIR / 'profiles'
+PROFILE_TOKEN_MAX_AGE = 60 * 60  # подписанный токен X-Profile действует 1 час
+
+# Лог медленных запросов (config.slowlog): запросы дольше порога пишутся в slow_queries.log
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_LOG = LOGS_DIR / 'slow_queries.log'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -317,6 +527,11 @@ LOGGING = {
             'format': '{asctime} {levelname} {module} {message}',
             'style': '{',
         },
+        # Форматтер для slow_queries.log: только JSON-сообщение
+        'slow_queries': {
+            'format': '{message}',
+            'style': '{',
+        },
         # Форматтер для email: время, уровень, сообщение, pathname (без exc_info)
         'email': {
             'format': '{asctime} {levelname} {message} {pathname}',
@@ -361,6 +576,13 @@ LOGGING = {
             'filename': LOGS_DIR / 'security.log',
             'formatter': 'security',
         },
+        # Обработчик для slow_queries.log: JSON-строки из config.slowlog
+        'slow_queries_file': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'formatter': 'slow_queries',
+        },
         # Email обработчик: ERROR и выше, отправляет через SMTP всегда (даже при DEBUG=True)
         'mail_admins': {
             'level': 'ERROR',
@@ -394,12 +616,19 @@ LOGGING = {
             'level': 'DEBUG',  # DEBUG и выше, чтобы все сообщения попадали в root
             'propagate': True,  # Разрешаем распространение в root logger для консоли
         },
-        # Логгер для базы данных
+        # Логгер для базы данных: без построчного DEBUG-лога каждого запроса,
+        # медленные запросы пишет config.slowlog в slow_queries.log
         'django.db.backends': {
             'handlers': ['errors_file'],
-            'level': 'DEBUG',  # DEBUG и выше, чтобы все сообщения попадали в root
+            'level': 'INFO',
             'propagate': True,  # Разрешаем распространение в root logger для консоли
         },
+        # Лог медленных запросов
+        'slow_queries': {
+            'handlers': ['slow_queries_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         # Логгер для безопасности
         'django.security': {
             'handlers': ['security_file'],
@@ -0,0 +1,127 @@
+"""
+Slow query log with asynchronous EXPLAIN capture.
+
+Every DB connection gets an execute wrapper (installed on ``connection_created``)
+that times each query. Queries slower than ``settings.SLOW_QUERY_THRESHOLD_MS``
+are written as JSON lines to the ``slow_queries`` logger together with their
+normalized fingerprint and call site (view or Celery task). The first time a
+fingerprint is seen in a process its plan is captured by a background thread,
+so the request that hit the slow query doesn't pay for the EXPLAIN.
+
+``manage.py slowqueries`` aggregates the log by fingerprint.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('slow_queries')
+
+# Откуда выполняется запрос: 'view:news:news_list', 'task:news.tasks.notify_subscribers'
+call_site = ContextVar('slow_query_call_site', default='-')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+_explained = set()
+_explained_lock = threading.Lock()
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+_local = threading.local()
+
+
+def normalize_sql(sql: str) -> str:
+    """Заменяет литералы и плейсхолдеры на '?', схлопывает IN-списки и пробелы."""
+    normalized = _STRING_RE.sub('?', sql)
+    normalized = normalized.replace('%s', '?')
+    normalized = _NUMBER_RE.sub('?', normalized)
+    normalized = _IN_LIST_RE.sub('(...)', normalized)
+    return _SPACE_RE.sub(' ', normalized).strip()
+
+
+def fingerprint(normalized_sql: str) -> str:
+    return hashlib.md5(normalized_sql.encode('utf-8')).hexdigest()[:16]
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS and not getattr(_local, 'explaining', False):
+            _record(context['connection'].alias, sql, params, many, duration_ms)
+
+
+def _record(alias, sql, params, many, duration_ms):
+    normalized = normalize_sql(sql)
+    fp = fingerprint(normalized)
+    logger.info(json.dumps({
+        'type': 'query',
+        'ts': time.time(),
+        'fingerprint': fp,
+        'duration_ms': round(duration_ms, 3),
+        'call_site': call_site.get(),
+        'alias': alias,
+        'sql': normalized,
+    }, ensure_ascii=False))
+
+    if many or sql.lstrip()[:6].upper() != 'SELECT':
+        return
+    with _explained_lock:
+        if fp in _explained:
+            return
+        _explained.add(fp)
+    _explain_executor.submit(_explain, alias, sql, params, fp)
+
+
+def _explain(alias, sql, params, fp):
+    connection = connections[alias]
+    _local.explaining = True
+    try:
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            plan = '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+        logger.info(json.dumps({'type': 'explain', 'ts': time.time(), 'fingerprint': fp, 'plan': plan},
+                               ensure_ascii=False))
+    except Exception:
+        # План не критичен: при ошибке запрос всё равно остаётся в логе
+        with _explained_lock:
+            _explained.discard(fp)
+    finally:
+        _local.explaining = False
+        connection.close()
+
+
+@receiver(connection_created)
+def install_slow_query_wrapper(sender, connection, **kwargs):
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+class SlowQueryContextMiddleware:
+    """Marks queries issued while handling a request with the view's URL name."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = call_site.set(f'view:{request.path}')
+        try:
+            return self.get_response(request)
+        finally:
+            call_site.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match and request.resolver_match.view_name:
+            call_site.set(f'view:{request.resolver_match.view_name}')
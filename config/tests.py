@@ -0,0 +1,142 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_concurrent_hits_do_not_exceed_limit(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from config.ratelimit import RateLimit
+
+        limit = RateLimit('test', 3, 60)
+        with ThreadPoolExecutor(8) as pool:
+            decisions = list(pool.map(lambda _: limit.hit('user'), range(20)))
+        self.assertEqual(sum(decision.allowed for decision in decisions), 3)
+
+    def test_previous_window_is_weighted(self):
+        from unittest import mock
+
+        from config.ratelimit import RateLimit
+
+        limit = RateLimit('test', 4, 100)
+        with mock.patch('config.ratelimit.time.time', return_value=1090):
+            self.assertEqual([limit.hit('ip').allowed for _ in range(5)], [True] * 4 + [False])
+        # Через четверть следующего окна из прошлых 4 учитываются 3
+        with mock.patch('config.ratelimit.time.time', return_value=1125):
+            self.assertEqual([limit.hit('ip').allowed for _ in range(2)], [True, False])
+            decision = limit.hit('ip')
+        self.assertEqual(decision.retry_after, 75)
+
+    @override_settings(ANON_RATE_LIMIT='2/60')
+    def test_anonymous_clients_throttled_per_ip_without_queries(self):
+        url = reverse('news:api_post', args=[1])
+        for _ in range(2):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.7').status_code, 404)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, REMOTE_ADDR='10.0.0.7')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(response['Retry-After'])
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.8').status_code, 404)
+
+        self.client.force_login(User.objects.create_user('regular'))
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.7').status_code, 404)
+
+    @override_settings(ANON_RATE_LIMIT='2/60', RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_forged_forwarded_for_does_not_bypass_limit(self):
+        url = reverse('news:api_post', args=[1])
+        statuses = [
+            self.client.get(url, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'1.2.3.{i}, 203.0.113.5').status_code
+            for i in range(10)
+        ]
+        self.assertEqual(statuses, [404, 404] + [429] * 8)
+
+    def test_client_ip_is_right_most_untrusted_hop(self):
+        from django.test import RequestFactory
+
+        from config.ratelimit import client_ip
+
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2, 10.0.0.1')
+        with self.settings(RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR', RATELIMIT_TRUSTED_PROXIES=1):
+            self.assertEqual(client_ip(request), '10.0.0.1')
+        with self.settings(RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR', RATELIMIT_TRUSTED_PROXIES=2):
+            self.assertEqual(client_ip(request), '2.2.2.2')
+        with self.settings(RATELIMIT_IP_HEADER=None):
+            self.assertEqual(client_ip(request), '10.0.0.2')
+
+
+class SingleFlightCachePageTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_concurrent_misses_render_page_once(self):
+        import threading
+        import time
+
+        from django.core.cache import cache
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from django.utils.cache import get_cache_key
+
+        from config.cache import cache_page
+
+        calls = []
+
+        @cache_page(60)
+        def view(request):
+            calls.append(1)
+            time.sleep(0.2)
+            return HttpResponse(f'render {len(calls)}')
+
+        request = RequestFactory().get('/page/')
+        self.assertEqual(view(request).content, b'render 1')
+        # Страница истекла, список заголовков Vary остался
+        cache.delete(get_cache_key(request))
+
+        barrier = threading.Barrier(3)
+        contents = []
+
+        def fetch():
+            barrier.wait()
+            contents.append(view(RequestFactory().get('/page/')).content)
+
+        threads = [threading.Thread(target=fetch) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(contents, [b'render 2'] * 3)
+
+    def test_failed_render_releases_lock(self):
+        from django.core.cache import cache
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from django.utils.cache import get_cache_key
+
+        from config.cache import cache_page
+
+        fail = []
+
+        @cache_page(60)
+        def view(request):
+            if fail:
+                raise RuntimeError('boom')
+            return HttpResponse('ok')
+
+        view(RequestFactory().get('/page/'))
+        key = get_cache_key(RequestFactory().get('/page/'))
+        cache.delete(key)
+        fail.append(1)
+        with self.assertRaises(RuntimeError):
+            view(RequestFactory().get('/page/'))
+        self.assertIsNone(cache.get(f'{key}:fill'))
@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.views.decorators.cache import cache_page
-from news.views import NewsListView
+from config.cache import cache_page
+from news.urls import NewsListView  # синхронная или async-версия (ASYNC_VIEWS)
+from config.metrics import metrics_view
+from news.sitemaps import sitemap_index, sitemap_month
 from oauth_views import google_login_direct, yandex_login_direct
 
 urlpatterns = [
@@ -27,6 +29,9 @@ urlpatterns = [
     path('sign/', include('sign.urls')),
     path('accounts/', include('allauth.urls')),
     path('news/', include('news.urls', namespace='news')),
+    path('metrics', metrics_view, name='metrics'),
+    path('sitemap.xml', sitemap_index, name='sitemap'),
+    path('sitemap-<int:year>-<int:month>-<int:page>.xml', sitemap_month, name='sitemap_month'),
     
     # Direct OAuth redirects
     path('oauth/google/', google_login_direct, name='google_direct'),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Author, Category, Post, PostCategory, Comment
+from .models import Author, BannedWord, Category, Post, PostCategory, Comment
 
 
 @admin.register(Author)
@@ -32,4 +32,10 @@ class CommentAdmin(admin.ModelAdmin):
     search_fields = ("text",)
 
 
+@admin.register(BannedWord)
+class BannedWordAdmin(admin.ModelAdmin):
+    list_display = ("word",)
+    search_fields = ("word",)
+
+
 # Register your models here.
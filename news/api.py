@@ -0,0 +1,283 @@
+"""
+JSON API только для чтения: посты, категории и комментарии.
+
+    /news/api/posts/?fields=id,title,author&type=NW&category=3&limit=20&cursor=...
+    /news/api/posts/<id>/?fields=...
+    /news/api/categories/?fields=id,name,posts_count
+    /news/api/comments/?post=<id>
+
+Ответ списка: {"results": [...], "next": "<URL следующей страницы>" или null}.
+Пагинация курсорная (keyset) по полям сортировки ресурса: без COUNT и OFFSET,
+страницы не съезжают при появлении новых постов. Курсор непрозрачный.
+
+fields= выбирает поля (по умолчанию все), и по ним же строится запрос:
+values() только нужных колонок, JOIN с автором - только если запрошен author,
+аннотация posts_count - только по запросу, категории постов - одним
+запросом на страницу (как prefetch_related). Строки ответа собираются из
+словарей values() без моделей и сериализаторов.
+
+title и text постов и text комментариев отдаются отцензурированными, как на
+сайте и в лентах: сохранённая копия, а у строк без неё - исходный текст через
+censor_text.
+
+Ответ несёт ETag (хэш тела); при совпадении с If-None-Match - 304 без тела.
+"""
+import base64
+import hashlib
+import json
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Case, Count, F, Q, TextField, When
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+
+from .censor import censor_text
+from .models import Category, Comment, Post, PostCategory
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    """Ошибка в параметрах запроса; ответ 400 с текстом ошибки."""
+
+
+class Field:
+    """
+    Поле ресурса. lookup - путь для values(); annotation - выражение для
+    annotate() под именем lookup (или именем поля), добавляется только когда
+    поле запрошено; load(ids) - отдельный
+    запрос на всю страницу, {id: значение}; compute(row) - значение из других
+    колонок строки (их lookup перечислены в requires); convert - приведение
+    значения из БД к JSON.
+    """
+    def __init__(self, lookup=None, annotation=None, load=None, compute=None, requires=(), convert=None):
+        self.lookup = lookup
+        self.annotation = annotation
+        self.load = load
+        self.compute = compute
+        self.requires = requires
+        self.convert = convert
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+class Resource:
+    def __init__(self, model, fields, ordering, filters=None):
+        self.model = model
+        self.fields = fields
+        self.ordering = ordering  # последнее поле должно быть уникальным (id)
+        self.filters = filters or {}  # параметр запроса -> функция (queryset, значение) -> queryset
+
+    def parse_fields(self, value):
+        if not value:
+            return list(self.fields)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ApiError(f'Неизвестные поля: {", ".join(unknown)}. Доступны: {", ".join(self.fields)}')
+        return names
+
+    def queryset(self, names, params):
+        """Запрос под выбранные поля: (queryset с values(), поля с отдельной загрузкой)."""
+        queryset = self.model.objects.all()
+        for param, apply in self.filters.items():
+            if params.get(param):
+                try:
+                    queryset = apply(queryset, params[param])
+                except ValueError:
+                    raise ApiError(f'Неверное значение параметра {param}')
+        lookups = {'id', *(field.lstrip('-') for field in self.ordering)}
+        annotations = {}
+        loaded = []
+        for name in names:
+            field = self.fields[name]
+            lookups.update(field.requires)
+            if field.annotation is not None:
+                annotations[field.lookup or name] = field.annotation
+            elif field.lookup:
+                lookups.add(field.lookup)
+            if field.load:
+                loaded.append(name)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.order_by(*self.ordering).values(*lookups, *annotations), loaded
+
+    def serialize(self, rows, names, loaded):
+        extra = {name: self.fields[name].load([row['id'] for row in rows]) for name in loaded} if rows else {}
+        results = []
+        for row in rows:
+            item = {}
+            for name in names:
+                field = self.fields[name]
+                if field.load:
+                    value = extra[name].get(row['id'], [])
+                elif field.compute:
+                    value = field.compute(row)
+                else:
+                    value = row[field.lookup or name]
+                item[name] = field.convert(value) if field.convert and value is not None else value
+            results.append(item)
+        return results
+
+    def encode_cursor(self, row):
+        values = [row[field.lstrip('-')] for field in self.ordering]
+        data = json.dumps(values, default=_isoformat).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def after_cursor(self, cursor):
+        """Условие "строго после курсора" в порядке ordering."""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            names = [field.lstrip('-') for field in self.ordering]
+            values = [self.model._meta.get_field(name).to_python(value) for name, value in zip(names, values, strict=True)]
+        except (ValueError, TypeError, ValidationError) as exc:
+            raise ApiError(f'Неверный курсор ({exc.__class__.__name__})')
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            step = Q(**{f"{names[i]}__{'lt' if field.startswith('-') else 'gt'}": values[i]})
+            for name, value in zip(names[:i], values):
+                step &= Q(**{name: value})
+            condition |= step
+        return condition
+
+
+def _censored(model, source):
+    """Отцензурированное поле: копия из БД, строки без копии (версии нет) - через censor_text."""
+    alias = f'{source}_censored'
+    return Field(
+        alias,
+        annotation=Case(
+            When(censor_version='', then=F(source)), default=F(model.CENSORED_FIELDS[source]),
+            output_field=TextField(),
+        ),
+        compute=lambda row: row[alias] if row['censor_version'] else censor_text(row[alias]),
+        requires=('censor_version',),
+    )
+
+
+def _post_categories(ids):
+    categories = defaultdict(list)
+    mapping = (
+        PostCategory.objects.filter(post_id__in=ids)
+        .order_by('category__name')
+        .values_list('post_id', 'category_id', 'category__name')
+    )
+    for post_id, category_id, name in mapping:
+        categories[post_id].append({'id': category_id, 'name': name})
+    return categories
+
+
+POSTS = Resource(
+    Post,
+    fields={
+        'id': Field('id'),
+        'type': Field('post_type'),
+        'title': _censored(Post, 'title'),
+        'text': _censored(Post, 'text'),
+        'rating': Field('rating'),
+        'created_at': Field('created_at', convert=_isoformat),
+        'author': Field('author__user__username'),
+        'categories': Field(load=_post_categories),
+        'url': Field(compute=lambda row: Post(id=row['id'], post_type=row['post_type']).get_absolute_url(),
+                     requires=('post_type',)),
+    },
+    ordering=('-created_at', '-id'),
+    filters={
+        'type': lambda queryset, value: queryset.filter(post_type=value),
+        'category': lambda queryset, value: queryset.filter(categories=int(value)),
+    },
+)
+
+CATEGORIES = Resource(
+    Category,
+    fields={
+        'id': Field('id'),
+        'name': Field('name'),
+        'posts_count': Field(annotation=Count('posts')),
+        'url': Field(compute=lambda row: reverse('news:category_detail', args=[row['id']])),
+    },
+    ordering=('name', 'id'),
+)
+
+COMMENTS = Resource(
+    Comment,
+    fields={
+        'id': Field('id'),
+        'post': Field('post_id'),
+        'user': Field('user__username'),
+        'text': _censored(Comment, 'text'),
+        'rating': Field('rating'),
+        'created_at': Field('created_at', convert=_isoformat),
+    },
+    ordering=('-created_at', '-id'),
+    filters={
+        'post': lambda queryset, value: queryset.filter(post_id=int(value)),
+    },
+)
+
+
+def _json_response(request, data):
+    body = json.dumps(data, ensure_ascii=False).encode()
+    etag = f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+    response = HttpResponse(body, content_type='application/json; charset=utf-8')
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def _list(request, resource):
+    try:
+        names = resource.parse_fields(request.GET.get('fields'))
+        try:
+            limit = min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            raise ApiError('Неверный limit')
+        if limit < 1:
+            raise ApiError('Неверный limit')
+        queryset, loaded = resource.queryset(names, request.GET)
+        if request.GET.get('cursor'):
+            queryset = queryset.filter(resource.after_cursor(request.GET['cursor']))
+    except ApiError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    rows = list(queryset[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        params = request.GET.copy()
+        params['cursor'] = resource.encode_cursor(rows[-1])
+        next_url = f'{request.path}?{params.urlencode()}'
+    return _json_response(request, {'results': resource.serialize(rows, names, loaded), 'next': next_url})
+
+
+@require_GET
+def posts_api(request):
+    return _list(request, POSTS)
+
+
+@require_GET
+def post_api(request, pk):
+    try:
+        names = POSTS.parse_fields(request.GET.get('fields'))
+    except ApiError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    queryset, loaded = POSTS.queryset(names, {})
+    rows = list(queryset.filter(pk=pk))
+    if not rows:
+        return JsonResponse({'error': 'Пост не найден'}, status=404)
+    return _json_response(request, POSTS.serialize(rows, names, loaded)[0])
+
+
+@require_GET
+def categories_api(request):
+    return _list(request, CATEGORIES)
+
+
+@require_GET
+def comments_api(request):
+    return _list(request, COMMENTS)
@@ -6,4 +6,5 @@ class NewsConfig(AppConfig):
     name = 'news'
 
     def ready(self):
-        from . import signals  # noqa
\ No newline at end of file
+        from . import signals  # noqa
+        from config import routers, slowlog  # noqa: сигналы роутера реплик и лога медленных запросов
@@ -0,0 +1,180 @@
+"""
+Async-версии страниц только для чтения для запуска под ASGI (config/asgi.py).
+Подключаются вместо синхронных настройкой ASYNC_VIEWS (см. news/urls.py).
+
+Запросы к БД идут через async-API ORM (aget, acount, async for), а данные
+страниц кэшируются через cache.aget/aset на те же 5 минут, что и cache_page у
+синхронных view. В кэше лежат объекты, а не готовый HTML, поэтому страница
+не зависит от того, какой пользователь её запросил первым. Шаблон
+возвращается как TemplateResponse: Django рендерит его одним переходом в
+поток, где ленивые user и messages из контекст-процессоров доступны без
+SynchronousOnlyOperation.
+
+Одновременные промахи по одной странице в одном event loop ждут один
+запрос к БД (asyncio-задача на ключ, см. cached()). Блокировки заполнения
+TieredCache (get_or_set) рассчитаны на потоки и здесь не используются:
+cache.aget/aset выполняются в общем потоке sync_to_async, и ожидание
+блокировки в нём остановило бы все async-запросы процесса.
+"""
+import asyncio
+import weakref
+
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.views.generic.base import ContextMixin, TemplateResponseMixin, View
+
+from . import views
+from .views import PaginationWindowMixin
+
+CACHE_TIMEOUT = 60 * 5  # как cache_page(60 * 5) у синхронных view
+
+# event loop -> {ключ кэша: задача, которая сейчас вычисляет страницу}
+_fills = weakref.WeakKeyDictionary()
+
+
+async def _fill(key, timeout, fetch):
+    data = await fetch()
+    await cache.aset(key, data, timeout)
+    return data
+
+
+async def cached(key, timeout, fetch):
+    """
+    Значение из кэша или результат await fetch(), сохранённый на timeout секунд.
+    На промахе fetch() выполняется один раз на ключ и event loop: остальные
+    запросы ждут ту же задачу. Исключение fetch() (например, Http404) получают все.
+    """
+    data = await cache.aget(key)
+    if data is not None:
+        return data
+    fills = _fills.setdefault(asyncio.get_running_loop(), {})
+    task = fills.get(key)
+    if task is None:
+        task = fills[key] = asyncio.ensure_future(_fill(key, timeout, fetch))
+        task.add_done_callback(lambda _: fills.pop(key, None))
+    # shield: отключившийся клиент не отменяет вычисление для остальных
+    return await asyncio.shield(task)
+
+
+class AsyncListView(TemplateResponseMixin, ContextMixin, View):
+    """Async-аналог ListView: get_queryset() и пагинация по ?page=N или ?page=last."""
+    context_object_name = None
+    paginate_by = None
+    cache_timeout = None  # None - без кэширования
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def cache_key(self, page):
+        return f'async-view:{self.__class__.__qualname__}:{page}'
+
+    async def get(self, request, *args, **kwargs):
+        page = request.GET.get('page') or '1'
+        if page != 'last':
+            try:
+                page = int(page)
+            except ValueError:
+                raise Http404('Номер страницы должен быть числом или "last"')
+
+        if self.cache_timeout:
+            data = await cached(self.cache_key(page), self.cache_timeout, lambda: self.fetch(page))
+        else:
+            data = await self.fetch(page)
+        object_list, count, number = data
+
+        context = {'paginator': None, 'page_obj': None, 'is_paginated': False, 'object_list': object_list}
+        if self.paginate_by:
+            paginator = Paginator(range(count), self.paginate_by)
+            page_obj = paginator.page(number)
+            page_obj.object_list = object_list
+            context.update(paginator=paginator, page_obj=page_obj, is_paginated=paginator.num_pages > 1)
+        if self.context_object_name:
+            context[self.context_object_name] = object_list
+        return self.render_to_response(self.get_context_data(**context))
+
+    async def fetch(self, page):
+        """(объекты страницы, всего объектов, номер страницы)."""
+        queryset = self.get_queryset()
+        if not self.paginate_by:
+            object_list = [obj async for obj in queryset]
+            return object_list, len(object_list), 1
+        # Пагинатор по range: номер страницы проверяется без запроса к БД
+        paginator = Paginator(range(await queryset.acount()), self.paginate_by)
+        try:
+            page_obj = paginator.page(paginator.num_pages if page == 'last' else page)
+        except InvalidPage as exc:
+            raise Http404(f'Неверная страница ({page}): {exc}')
+        bottom = page_obj.start_index() - 1 if paginator.count else 0
+        object_list = [obj async for obj in queryset[bottom:bottom + self.paginate_by]]
+        return object_list, paginator.count, page_obj.number
+
+
+class AsyncDetailView(TemplateResponseMixin, ContextMixin, View):
+    """Async-аналог DetailView: объект по pk из get_queryset()."""
+    context_object_name = None
+    cache_timeout = None
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def cache_key(self, pk):
+        return f'async-view:{self.__class__.__qualname__}:{pk}'
+
+    async def get(self, request, *args, **kwargs):
+        pk = self.kwargs['pk']
+        if self.cache_timeout:
+            obj = await cached(self.cache_key(pk), self.cache_timeout, lambda: self.fetch(pk))
+        else:
+            obj = await self.fetch(pk)
+        self.object = obj
+        context = {'object': obj}
+        if self.context_object_name:
+            context[self.context_object_name] = obj
+        return self.render_to_response(self.get_context_data(**context))
+
+    async def fetch(self, pk):
+        try:
+            return await self.get_queryset().aget(pk=pk)
+        except ObjectDoesNotExist:
+            raise Http404('Объект не найден')
+
+
+# Запросы и шаблоны те же, что у синхронных версий в news/views.py
+
+class NewsListView(PaginationWindowMixin, AsyncListView):
+    template_name = 'news/list.html'
+    context_object_name = 'posts'
+    paginate_by = 10
+    cache_timeout = CACHE_TIMEOUT
+    get_queryset = views.NewsListView.get_queryset
+
+
+class NewsDetailView(AsyncDetailView):
+    template_name = 'news/detail.html'
+    context_object_name = 'post'
+    cache_timeout = CACHE_TIMEOUT
+    get_queryset = views.NewsDetailView.get_queryset
+
+
+class ArticleListView(PaginationWindowMixin, AsyncListView):
+    template_name = 'news/article_list.html'
+    context_object_name = 'posts'
+    paginate_by = 10
+    cache_timeout = CACHE_TIMEOUT
+    get_queryset = views.ArticleListView.get_queryset
+
+
+class ArticleDetailView(AsyncDetailView):
+    template_name = 'news/article_detail.html'
+    context_object_name = 'post'
+    cache_timeout = CACHE_TIMEOUT
+    get_queryset = views.ArticleDetailView.get_queryset
+
+
+class CategoryListView(AsyncListView):
+    # Как и синхронная версия, без кэша: счётчики постов должны быть актуальны
+    template_name = 'news/category_list.html'
+    context_object_name = 'categories'
+    get_queryset = views.CategoryListView.get_queryset
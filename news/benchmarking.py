@@ -0,0 +1,276 @@
+"""
+Общие утилиты для бенчмарков и management-команд с замерами.
+
+measure() принимает функцию без аргументов, как benchmark() из pytest-benchmark,
+поэтому те же цели (news_url_targets) можно гонять и из pytest.
+"""
+import functools
+import math
+import shutil
+import smtplib
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+def percentile(sorted_values, pct):
+    """Перцентиль по методу ближайшего ранга для отсортированного списка."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct * len(sorted_values) / 100) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies_ms):
+    """Сводка по списку латентностей в миллисекундах."""
+    values = sorted(latencies_ms)
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+    }
+
+
+# Границы корзин гистограммы латентности, мс
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def histogram(latencies_ms, bounds=HISTOGRAM_BOUNDS_MS):
+    """[(верхняя граница, число значений)]; последняя корзина - float('inf')."""
+    counts = [0] * (len(bounds) + 1)
+    for value in latencies_ms:
+        counts[next((i for i, bound in enumerate(bounds) if value <= bound), len(bounds))] += 1
+    return list(zip((*bounds, float('inf')), counts))
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Создаёт пустую тестовую БД для alias default (как manage.py test) и удаляет
+    её по выходу. SQLite-база создаётся во временном файле, а не в памяти:
+    так блокировки как в продакшене, и данные не переживают контекст, даже если
+    соединение осталось открытым в другом потоке.
+    """
+    connection = connections['default']
+    workdir = None
+    test_settings = connection.settings_dict.get('TEST', {})
+    if connection.vendor == 'sqlite':
+        workdir = Path(tempfile.mkdtemp(prefix='bench-'))
+        connection.settings_dict['TEST'] = {**test_settings, 'NAME': str(workdir / 'db.sqlite3')}
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST'] = test_settings
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def temporary_sqlite_database(alias, conn_max_age=0, options=None, app_labels=('auth', 'news')):
+    """
+    Регистрирует временную SQLite-БД под именем ``alias``, применяет к ней
+    миграции ``app_labels`` (вместе с зависимостями) и удаляет её по выходу
+    из контекста.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix=f'{alias}-'))
+    config = connections.configure_settings({
+        'default': dict(settings.DATABASES['default']),
+        alias: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': workdir / 'db.sqlite3',
+            'CONN_MAX_AGE': conn_max_age,
+            'OPTIONS': options or {},
+        },
+    })[alias]
+    connections.settings[alias] = config
+    try:
+        for app_label in app_labels:
+            call_command('migrate', app_label, database=alias, verbosity=0)
+        yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# Наборы данных для bench_views (параметры create_test_data)
+SCALES = {
+    'small': {'users': 20, 'categories': 8, 'posts': 1_000},
+    'medium': {'users': 200, 'categories': 12, 'posts': 20_000},
+    'large': {'users': 2_000, 'categories': 20, 'posts': 200_000},
+}
+
+# URL, которые не замеряются: бесконечный поток SSE
+SKIPPED_URLS = {'post_events'}
+
+# Параметры запроса для URL, которые без них почти ничего не делают
+URL_QUERY_STRINGS = {
+    'news_search': '?title=Новые',
+}
+
+
+def news_url_targets():
+    """
+    (имя, путь) для каждого URL из news/urls.py. В URL с pk подставляется
+    первый по pk подходящий объект: новость, статья, пост или категория; если
+    такого объекта нет, URL пропускается.
+    """
+    from news import urls
+    from news.models import Category, Post
+
+    objects = {
+        'news_': Post.objects.filter(post_type=Post.NEWS),
+        'article_': Post.objects.filter(post_type=Post.ARTICLE),
+        'category_': Category.objects.all(),
+        'post_': Post.objects.all(),
+        'api_post': Post.objects.all(),
+    }
+    targets = []
+    for pattern in urls.urlpatterns:
+        name = pattern.name
+        if name in SKIPPED_URLS:
+            continue
+        kwargs = {}
+        if 'pk' in pattern.pattern.converters:
+            queryset = next(qs for prefix, qs in objects.items() if name.startswith(prefix))
+            kwargs['pk'] = queryset.order_by('pk').values_list('pk', flat=True).first()
+            if kwargs['pk'] is None:
+                continue
+        targets.append((name, reverse(f'{urls.app_name}:{name}', kwargs=kwargs) + URL_QUERY_STRINGS.get(name, '')))
+    return targets
+
+
+def measure(func, iterations, warmup=0, before=None):
+    """
+    Вызывает func() warmup + iterations раз; возвращает summarize() латентностей
+    (мс) и результат последнего вызова. before() вызывается перед каждым
+    вызовом и в замер не входит.
+    """
+    latencies = []
+    result = None
+    for i in range(warmup + iterations):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        result = func()
+        if i >= warmup:
+            latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies), result
+
+
+def measure_request(client, path, iterations=20, warmup=2, clear_cache=True):
+    """
+    Латентность GET-запроса через тестовый клиент, число SQL-запросов
+    (по всем БД) и размер ответа в байтах.
+    """
+    def request():
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in settings.DATABASES
+            ]
+            response = client.get(path)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+        return response.status_code, sum(len(c) for c in captured), size
+
+    stats, (status, queries, size) = measure(request, iterations, warmup, cache.clear if clear_cache else None)
+    return {**stats, 'status': status, 'queries': queries, 'bytes': size}
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25, noise_ms=1.0):
+    """
+    Регрессии results относительно baseline ({scale: {url: метрики}}):
+    больше SQL-запросов, p95 хуже на tolerance (и больше чем на noise_ms)
+    или ответ больше на tolerance. Возвращает список описаний.
+    """
+    regressions = []
+    for scale, urls in results.items():
+        for name, current in urls.items():
+            base = baseline.get(scale, {}).get(name)
+            if base is None:
+                continue
+            if current['queries'] > base['queries']:
+                regressions.append(f"{scale}/{name}: SQL-запросов {base['queries']} -> {current['queries']}")
+            if current['p95'] > base['p95'] * (1 + tolerance) and current['p95'] - base['p95'] > noise_ms:
+                regressions.append(f"{scale}/{name}: p95 {base['p95']:.2f} -> {current['p95']:.2f} мс")
+            if current['bytes'] > base['bytes'] * (1 + tolerance):
+                regressions.append(f"{scale}/{name}: размер ответа {base['bytes']} -> {current['bytes']} байт")
+    return regressions
+
+
+class PhaseTimer:
+    """
+    Суммирует время по фазам. Фазы могут быть вложенными (SQL внутри рендеринга
+    шаблона): у каждой фазы считается собственное время, без вложенных.
+    """
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = Counter()
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        self._stack.append(0.0)  # время вложенных фаз
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            self.totals[name] += elapsed - nested
+            self.counts[name] += 1
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def sql(self, execute, sql, params, many, context):
+        """Для connection.execute_wrapper(): время SQL-запросов - фаза 'sql'."""
+        with self.phase('sql'):
+            return execute(sql, params, many, context)
+
+
+class TimingEmailBackend(BaseEmailBackend):
+    """
+    Почтовый бэкенд для бенчмарков: отдельно замеряет сборку MIME (фаза 'mime')
+    и доставку (фаза 'delivery'). Без SMTP_ADDRESS письма только считаются;
+    с ним - отправляются по SMTP (например, в локальный приёмник), по одному
+    соединению на вызов send_messages(), как у стандартного SMTP-бэкенда.
+    """
+    timer = None
+    smtp_address = None
+    sent = 0
+
+    def send_messages(self, email_messages):
+        timer = type(self).timer or PhaseTimer()
+        with timer.phase('mime'):
+            payloads = [(m.from_email, m.recipients(), m.message().as_bytes()) for m in email_messages]
+        with timer.phase('delivery'):
+            if self.smtp_address:
+                with smtplib.SMTP(*self.smtp_address) as smtp:
+                    for from_email, recipients, payload in payloads:
+                        smtp.sendmail(from_email, recipients, payload)
+        type(self).sent += len(payloads)
+        return len(payloads)
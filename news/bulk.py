@@ -0,0 +1,22 @@
+"""
+Помощники для массовой загрузки данных через bulk_create.
+"""
+from contextlib import contextmanager
+
+
+@contextmanager
+def keep_auto_now_add(model, *field_names):
+    """
+    bulk_create перезаписывает поля с auto_now_add текущим временем. Внутри
+    блока эти поля сохраняются как есть (значение нужно задать самому).
+    Меняет метаданные модели для всего процесса - только для команд, не для запросов.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
@@ -0,0 +1,204 @@
+"""
+События о новых постах для SSE-потока (news/views.py: post_events).
+
+Пост публикуется в каналы 'posts', 'posts:<тип>' и 'category:<id>' после
+коммита транзакции (news/signals.py). Подписчики - корутины SSE-ответов в
+цикле событий ASGI-сервера, у каждого своя asyncio.Queue: тысячи
+простаивающих соединений стоят по задаче и очереди, без потока на каждое.
+
+LocalBroker раздаёт события внутри процесса. Если задан EVENTS_REDIS_URL,
+RedisBroker публикует их в Redis pub/sub, и событие из любого процесса
+(WSGI, Celery, админка, другой воркер uvicorn) доходит до всех ASGI-воркеров.
+"""
+import asyncio
+import functools
+import json
+import logging
+import threading
+from collections import defaultdict
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100  # событий в очереди подписчика; при переполнении теряются самые старые
+HEARTBEAT_SECONDS = 15  # пинг-комментарий, чтобы прокси не закрывали простаивающее соединение
+RETRY_MS = 5000  # через сколько браузер переподключается после обрыва
+REDIS_CHANNEL = 'newsportal:post-events'
+
+
+def post_channels(post_type, category_ids):
+    return ['posts', f'posts:{post_type}', *(f'category:{pk}' for pk in category_ids)]
+
+
+def post_event(post, category_ids):
+    """Лёгкое событие о посте: без текста, только то, что нужно для строки списка."""
+    return {
+        'id': post.pk,
+        'type': post.post_type,
+        'title': post.display_title,  # как на сайте: отцензурированный
+        'url': post.get_absolute_url(),
+        'created_at': post.created_at.isoformat(),
+        'categories': sorted(category_ids),
+    }
+
+
+def publish_post(post):
+    """Публикует событие о посте; вызывается после коммита, когда категории уже сохранены."""
+    category_ids = list(post.categories.values_list('pk', flat=True))
+    get_broker().publish(post_channels(post.post_type, category_ids), post_event(post, category_ids))
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: post\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+class Subscription:
+    """Очередь событий одного SSE-соединения в цикле событий, где оно подписалось."""
+    def __init__(self, channels):
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        """Кладёт событие в очередь; можно вызывать из любого потока."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:  # цикл событий уже закрыт
+            pass
+
+    async def get(self, timeout):
+        """Следующее событие или None, если за timeout секунд ничего не пришло."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """Pub/sub внутри процесса."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # канал -> {Subscription}
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channels, event):
+        self.dispatch(channels, event)
+
+    def dispatch(self, channels, event):
+        """Раздаёт событие подписчикам каналов; подписанный на несколько из них получит его один раз."""
+        with self._lock:
+            targets = set().union(*(self._subscribers.get(channel, ()) for channel in channels))
+        for subscription in targets:
+            subscription.deliver(event)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Публикация через Redis pub/sub. В каждом цикле событий, где есть
+    подписчики, работает одна задача-слушатель, которая раздаёт события
+    из Redis локальным подписчикам.
+    """
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+        self._listeners = {}  # цикл событий -> задача-слушатель
+
+    def publish(self, channels, event):
+        try:
+            self.client.publish(REDIS_CHANNEL, json.dumps({'channels': channels, 'event': event}))
+        except redis.RedisError:
+            logger.warning('Redis недоступен, событие о посте %s раздано только внутри процесса',
+                           event['id'], exc_info=True)
+            self.dispatch(channels, event)
+
+    def subscribe(self, channels):
+        subscription = super().subscribe(channels)
+        listener = self._listeners.get(subscription.loop)
+        if listener is None or listener.done():
+            self._listeners[subscription.loop] = subscription.loop.create_task(self._listen())
+        return subscription
+
+    def _handle(self, raw):
+        # Битое сообщение пропускаем: исключение остановило бы слушателя для всех подписчиков цикла
+        try:
+            data = json.loads(raw)
+            channels, event = data['channels'], data['event']
+            if not isinstance(event.get('id'), int) or 'type' not in event:
+                raise ValueError('в событии нет id или type')
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.warning('Некорректное сообщение в %s: %.200r', REDIS_CHANNEL, raw, exc_info=True)
+            return
+        self.dispatch(channels, event)
+
+    async def _listen(self):
+        while True:
+            client = redis.asyncio.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(REDIS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self._handle(message['data'])
+            except redis.RedisError:
+                logger.warning('Потеряно соединение с Redis pub/sub, переподключение', exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+@functools.cache
+def get_broker():
+    url = settings.EVENTS_REDIS_URL
+    return RedisBroker(url) if url else LocalBroker()
+
+
+async def event_stream(channels, post_type=None, missed=None):
+    """
+    SSE-поток подписчика каналов. missed - async-функция, возвращающая
+    пропущенные события (по Last-Event-ID); она вызывается уже после
+    подписки, чтобы между ними ничего не потерялось. Затем идут новые
+    события (только типа post_type, если он задан) и пинг раз в
+    HEARTBEAT_SECONDS. Подписка снимается, когда сервер закрывает поток
+    после отключения клиента.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(channels)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        last_id = 0
+        if missed is not None:
+            for event in await missed():
+                last_id = max(last_id, event['id'])
+                yield format_event(event)
+        while True:
+            event = await subscription.get(HEARTBEAT_SECONDS)
+            if event is None:
+                yield ': ping\n\n'
+            elif event['id'] > last_id and post_type in (None, event['type']):
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,193 @@
+"""
+RSS- и Atom-ленты: все новости, все статьи и каждая категория.
+
+Тело ленты кэшируется под ключом с версией её области ('type:NW', 'type:AR',
+'category:<id>'). Версия - время последнего изменения поста в области; её
+обновляют сигналы (news/signals.py) после коммита, поэтому лента
+перегенерируется только тогда, когда в ней что-то поменялось. Версия же
+служит Last-Modified, а хэш тела - ETag; запрос с If-None-Match или
+If-Modified-Since получает 304. Версию 'all' пишет только массовый импорт,
+поэтому при первом чтении она заводится нулём - иначе каждый запрос ленты
+промахивался бы мимо кэша. Тело ленты генерирует один запрос, остальные
+ждут его (cache.get_or_set, см. config/cache.py).
+
+Полный текст выбирается из БД только для постов моложе FEED_FULL_TEXT_DAYS
+дней; для более старых записей в запросе вместо текста - его начало
+(Substr), как у Post.preview(). Текст берётся уже отцензурированный
+(Post.censored_text).
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, Q, TextField, When
+from django.db.models.functions import Substr
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date
+
+from .censor import censor_text
+from .models import Category, Post
+
+FEED_ITEMS = 30
+FEED_CACHE_TIMEOUT = 60 * 60 * 24  # старые версии просто вытесняются из кэша
+PREVIEW_LENGTH = 124  # как у Post.preview()
+ALL_SCOPE = 'all'  # изменение, затрагивающее все ленты (например, массовый импорт)
+
+
+def _version_key(scope):
+    return f'feed-version:{scope}'
+
+
+def touch_feeds(scopes):
+    """Отмечает области изменёнными: их ленты перегенерируются при следующем запросе."""
+    now = time.time_ns()
+    cache.set_many({_version_key(scope): now for scope in scopes}, None)
+
+
+def feed_version(scope):
+    """Время последнего изменения области (нс); области без версии получают текущее время."""
+    versions = cache.get_many([_version_key(scope), _version_key(ALL_SCOPE)])
+    if _version_key(ALL_SCOPE) not in versions:
+        # 0 - "общих изменений не было": решает версия самой области
+        cache.add(_version_key(ALL_SCOPE), 0, None)
+    if _version_key(scope) not in versions:
+        cache.add(_version_key(scope), time.time_ns(), None)
+        versions[_version_key(scope)] = cache.get(_version_key(scope), time.time_ns())
+    return max(versions.values())
+
+
+def post_scopes(post_type, category_ids):
+    return [f'type:{post_type}', *(f'category:{pk}' for pk in category_ids)]
+
+
+class CachedFeedMixin:
+    """Отдаёт тело ленты из кэша с ETag и Last-Modified; генерирует его только при смене версии."""
+    def scope(self, **kwargs):
+        raise NotImplementedError
+
+    def __call__(self, request, *args, **kwargs):
+        scope = self.scope(**kwargs)
+        version = feed_version(scope)
+        key = f'feed:{self.__class__.__name__}:{scope}:{version}'
+
+        def render():
+            response = super(CachedFeedMixin, self).__call__(request, *args, **kwargs)
+            etag = f'"{hashlib.md5(response.content, usedforsecurity=False).hexdigest()}"'
+            return response.content, response['Content-Type'], etag
+
+        content, content_type, etag = cache.get_or_set(key, render, FEED_CACHE_TIMEOUT)
+        last_modified = version // 1_000_000_000
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+
+class PostFeed(CachedFeedMixin, Feed):
+    post_type = None
+
+    def scope(self, **kwargs):
+        return f'type:{self.post_type}'
+
+    def get_queryset(self, obj):
+        return Post.objects.filter(post_type=self.post_type)
+
+    def items(self, obj=None):
+        # Полный текст - только для свежих постов, для остальных - начало текста
+        cutoff = timezone.now() - timedelta(days=settings.FEED_FULL_TEXT_DAYS)
+        # Строки без сохранённой копии (версии нет) цензурируются в item_description
+        source = Case(When(censor_version='', then=F('text')), default=F('censored_text'), output_field=TextField())
+        return (
+            self.get_queryset(obj)
+            .select_related('author__user')
+            .prefetch_related('categories')
+            .defer('text', 'censored_text')
+            .annotate(
+                is_recent=ExpressionWrapper(Q(created_at__gte=cutoff), output_field=BooleanField()),
+                body=Case(
+                    When(created_at__gte=cutoff, then=source),
+                    default=Substr(source, 1, PREVIEW_LENGTH + 1),
+                    output_field=TextField(),
+                ),
+            )
+            .order_by('-created_at')[:FEED_ITEMS]
+        )
+
+    def item_title(self, item):
+        return item.display_title
+
+    def item_description(self, item):
+        body = item.body
+        if not item.is_recent and len(body) > PREVIEW_LENGTH:
+            body = f'{body[:PREVIEW_LENGTH]}...'
+        return body if item.censor_version else censor_text(body)
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+    def item_author_name(self, item):
+        return item.author.user.username
+
+    def item_categories(self, item):
+        return [category.name for category in item.categories.all()]
+
+
+class NewsFeed(PostFeed):
+    post_type = Post.NEWS
+    title = 'News Portal: новости'
+    description = 'Последние новости'
+
+    def link(self):
+        return reverse('news:news_list')
+
+
+class ArticlesFeed(PostFeed):
+    post_type = Post.ARTICLE
+    title = 'News Portal: статьи'
+    description = 'Последние статьи'
+
+    def link(self):
+        return reverse('news:article_list')
+
+
+class CategoryFeed(PostFeed):
+    def scope(self, pk):
+        return f'category:{pk}'
+
+    def get_object(self, request, pk):
+        return get_object_or_404(Category, pk=pk)
+
+    def get_queryset(self, obj):
+        return Post.objects.filter(categories=obj)
+
+    def title(self, obj):
+        return f'News Portal: {obj.name}'
+
+    def description(self, obj):
+        return f'Новости и статьи категории «{obj.name}»'
+
+    def link(self, obj):
+        return obj.get_absolute_url()
+
+
+class NewsAtomFeed(NewsFeed):
+    feed_type = Atom1Feed
+    subtitle = NewsFeed.description
+
+
+class ArticlesAtomFeed(ArticlesFeed):
+    feed_type = Atom1Feed
+    subtitle = ArticlesFeed.description
+
+
+class CategoryAtomFeed(CategoryFeed):
+    feed_type = Atom1Feed
+    subtitle = CategoryFeed.description
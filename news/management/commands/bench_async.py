@@ -0,0 +1,191 @@
+"""
+Бенчмарк страниц только для чтения: WSGI с пулом потоков против ASGI с одним
+циклом событий на воркер (как у uvicorn).
+Использование: python manage.py bench_async [--concurrency 1 16 64] [--requests 500]
+               [--mode wsgi asgi-sync asgi-async] [--scale small]
+
+Режимы:
+  wsgi        - WSGIHandler и синхронные view в пуле из N потоков (gthread);
+  asgi-sync   - ASGIHandler и синхронные view (каждая через sync_to_async);
+  asgi-async  - ASGIHandler и async-версии из news/async_views.py (ASYNC_VIEWS).
+В ASGI-режимах N запросов одновременно выполняются в одном цикле событий.
+Запросы вызывают приложение напрямую, без HTTP-сервера, поэтому разница
+между режимами - это накладные расходы обработчиков и переходов между
+потоками. Набор путей (списки и карточки новостей и статей, категории)
+одинаковый во всех режимах; кэш очищается перед каждым прогоном.
+"""
+import asyncio
+import importlib
+import json
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import clear_url_caches, reverse
+
+from news.benchmarking import SCALES, benchmark_database, summarize
+from news.models import Category, Post
+
+MODES = ('wsgi', 'asgi-sync', 'asgi-async')
+
+
+@contextmanager
+def async_views(enabled):
+    """Перестраивает URLconf под ASYNC_VIEWS=enabled (выбор view делается при импорте news/urls.py)."""
+    import config.urls
+    import news.urls
+
+    def rebuild():
+        importlib.reload(news.urls)
+        importlib.reload(config.urls)
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=enabled):
+            rebuild()
+            yield
+    finally:
+        rebuild()
+
+
+def run_wsgi(paths, concurrency):
+    handler = WSGIHandler()
+
+    def call(path):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+            'REMOTE_ADDR': '127.0.0.1', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.url_scheme': 'http', 'wsgi.input': StringIO(), 'wsgi.errors': StringIO(),
+            'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        status = []
+        start = time.perf_counter()
+        response = handler(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+        for _ in response:
+            pass
+        response.close()
+        return status[0], (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(call, paths))
+
+
+def run_asgi(paths, concurrency):
+    application = get_asgi_application()
+
+    async def call(path, semaphore):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(), 'root_path': '',
+            'query_string': url.query.encode(), 'headers': [(b'host', b'testserver')],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        requested = False
+        finished = asyncio.Event()
+        status = []
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            latency = (time.perf_counter() - start) * 1000
+        finished.set()
+        return status[0], latency
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(call(path, semaphore) for path in paths))
+
+    return asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает WSGI и ASGI (синхронные и async view) на страницах только для чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64],
+                            help='Одновременных запросов (по умолчанию 1 16 64)')
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на прогон (по умолчанию 500)')
+        parser.add_argument('--mode', nargs='+', choices=MODES, default=list(MODES),
+                            help='Режимы (по умолчанию все)')
+        parser.add_argument('--scale', choices=list(SCALES), default='small', help='Набор данных (по умолчанию small)')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генераторов (по умолчанию 42)')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        setup_test_environment(debug=False)
+        try:
+            # Все запросы идут с одного адреса: ограничение частоты для анонимов отключено
+            with benchmark_database(), override_settings(ANON_RATE_LIMIT=None):
+                self.stdout.write(f"Заполнение БД: {options['scale']} {SCALES[options['scale']]}")
+                call_command('create_test_data', seed=options['seed'], stdout=StringIO(), **SCALES[options['scale']])
+                paths = self._paths(options['requests'], random.Random(options['seed']))
+                self.stdout.write(f"  {'режим':11} {'N':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  коды")
+                for mode in options['mode']:
+                    with async_views(mode == 'asgi-async'):
+                        for concurrency in options['concurrency']:
+                            results.setdefault(mode, {})[concurrency] = self._run(mode, paths, concurrency)
+        finally:
+            teardown_test_environment()
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    def _paths(self, count, rng):
+        def ids(queryset):
+            return list(queryset.order_by('?').values_list('pk', flat=True)[:1000]) or [0]
+
+        news = ids(Post.objects.filter(post_type=Post.NEWS))
+        articles = ids(Post.objects.filter(post_type=Post.ARTICLE))
+        makers = [
+            lambda: reverse('news:news_list') + f'?page={rng.randint(1, 5)}',
+            lambda: reverse('news:news_detail', args=[rng.choice(news)]),
+            lambda: reverse('news:article_list') + f'?page={rng.randint(1, 5)}',
+            lambda: reverse('news:article_detail', args=[rng.choice(articles)]),
+            lambda: reverse('news:category_list'),
+        ]
+        return [rng.choice(makers)() for _ in range(count)]
+
+    def _run(self, mode, paths, concurrency):
+        cache.clear()
+        start = time.perf_counter()
+        samples = run_wsgi(paths, concurrency) if mode == 'wsgi' else run_asgi(paths, concurrency)
+        elapsed = time.perf_counter() - start
+
+        stats = summarize([latency for _, latency in samples])
+        statuses = Counter(status for status, _ in samples)
+        result = {**stats, 'rps': len(samples) / elapsed, 'statuses': {str(s): n for s, n in statuses.items()}}
+        codes = ' '.join(f'{status}:{count}' for status, count in sorted(statuses.items()))
+        line = (
+            f"  {mode:11} {concurrency:4} {result['rps']:8.1f} "
+            f"{stats['p50']:8.2f} {stats['p95']:8.2f} {stats['p99']:8.2f}  {codes}"
+        )
+        self.stdout.write(line if not any(status >= 500 for status in statuses) else self.style.WARNING(line))
+        return result
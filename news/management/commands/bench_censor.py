@@ -0,0 +1,86 @@
+"""
+Бенчмарк фильтра censor на больших текстах: прежняя реализация (callback на
+каждое слово текста) против news/censor.py (split() и проверка различных
+слов текста по словарю).
+Использование: python manage.py bench_censor [--size-mb 1 5] [--words 10000]
+
+Словарь и текст синтетические, БД не нужна: в тексте около 1% слов из
+словаря, часть - с заглавной буквы. Результаты обеих реализаций сверяются.
+"""
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.censor import censor_words
+
+_ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+_LEGACY_WORD_RE = re.compile(r"\b([A-Za-zА-Яа-яЁё])([a-zа-яё]+)\b")
+
+
+def legacy_censor(value, words):
+    """Фильтр в том виде, в каком он был до словаря в БД (news_filters.BAD_WORDS)."""
+    def repl(match):
+        first, rest = match.group(1), match.group(2)
+        word = first + rest
+        if rest == rest.lower():
+            if word.lower() in words:
+                return first + ("*" * len(rest))
+        return word
+
+    return _LEGACY_WORD_RE.sub(repl, value)
+
+
+def _random_word(rng):
+    return ''.join(rng.choices(_ALPHABET, k=rng.randint(3, 10)))
+
+
+def _make_text(rng, banned, size):
+    vocabulary = [_random_word(rng) for _ in range(5000)]
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(banned) if rng.random() < 0.01 else rng.choice(vocabulary)
+        if rng.random() < 0.1:
+            word = word.capitalize()
+        separator = '.\n' if rng.random() < 0.05 else ', ' if rng.random() < 0.1 else ' '
+        parts.append(word + separator)
+        length += len(word) + len(separator)
+    return ''.join(parts)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость прежнего и нового фильтра censor на текстах в мегабайты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=float, nargs='+', default=[1.0, 5.0],
+                            help='Размеры текста, млн символов (по умолчанию 1 5)')
+        parser.add_argument('--words', type=int, default=10000, help='Словоформ в словаре (по умолчанию 10000)')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора текста')
+
+    def handle(self, *args, **options):
+        if options['words'] < 1:
+            raise CommandError('--words должно быть положительным')
+        rng = random.Random(options['seed'])
+        banned = sorted({_random_word(rng) for _ in range(options['words'])})
+
+        words = frozenset(banned)
+        self.stdout.write(f'Словарь: {len(words)} словоформ')
+
+        for size_mb in options['size_mb']:
+            text = _make_text(rng, banned, int(size_mb * 1_000_000))
+            results = {}
+            for name, run in (
+                ('legacy', lambda: legacy_censor(text, words)),
+                ('engine', lambda: censor_words(text, words)),
+            ):
+                start = time.perf_counter()
+                results[name] = run()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{size_mb:g} M символов, {name:6}: {elapsed:7.3f} с, {size_mb / elapsed:6.1f} M символов/с'
+                )
+            if results['legacy'] != results['engine']:
+                raise CommandError('Результаты реализаций расходятся')
+        self.stdout.write(self.style.SUCCESS('Результаты реализаций совпадают'))
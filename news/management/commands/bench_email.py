@@ -0,0 +1,197 @@
+"""
+Бенчмарк почтовой рассылки: notify_subscribers и send_category_digest
+(часть send_weekly_digest) на заданном числе подписчиков.
+Использование: python manage.py bench_email [--subscribers 10000 100000]
+               [--pipeline notify digest] [--smtp] [--history benchmarks/email_history.jsonl]
+
+Задачи выполняются синхронно во временной тестовой БД. Время разбивается на
+фазы: выполнение SQL-запросов, рендеринг шаблонов, сборка MIME, доставка и
+остальное (в том числе чтение строк курсором и код самих задач).
+По умолчанию письма никуда не отправляются (только считаются); с --smtp они
+доставляются в локальный SMTP-приёмник (нужен пакет aiosmtpd). Результаты
+дописываются в историю вместе с текущим коммитом и сравниваются с прошлым
+запуском на той же конфигурации.
+"""
+import json
+import subprocess
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from news import tasks
+from news.benchmarking import PhaseTimer, TimingEmailBackend, benchmark_database
+from news.models import Author, Category, Post, PostCategory
+
+PHASES = ('sql', 'render', 'mime', 'delivery', 'other')
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class _SmtpSink:
+    """Локальный SMTP-приёмник на aiosmtpd: принимает и отбрасывает письма."""
+    def __init__(self):
+        try:
+            from aiosmtpd.controller import Controller
+        except ImportError:
+            raise CommandError('Для --smtp нужен пакет aiosmtpd: pip install aiosmtpd')
+        self.received = 0
+        self.controller = Controller(self, hostname='127.0.0.1', port=0)
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+    def __enter__(self):
+        self.controller.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.controller.stop()
+
+    @property
+    def address(self):
+        return self.controller.hostname, self.controller.server.sockets[0].getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Замеряет рассылку писем подписчикам по фазам: SQL, шаблоны, MIME, доставка'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, nargs='+', default=[10_000],
+                            help='Число подписчиков (можно несколько; по умолчанию 10000)')
+        parser.add_argument('--pipeline', nargs='+', choices=['notify', 'digest'], default=['notify', 'digest'],
+                            help='Что замерять (по умолчанию notify и digest)')
+        parser.add_argument('--digest-posts', type=int, default=20, help='Постов в дайджесте (по умолчанию 20)')
+        parser.add_argument('--smtp', action='store_true', help='Доставлять в локальный SMTP-приёмник (aiosmtpd)')
+        parser.add_argument('--history', default=str(settings.BASE_DIR / 'benchmarks' / 'email_history.jsonl'),
+                            help='Файл истории результатов (по умолчанию benchmarks/email_history.jsonl)')
+        parser.add_argument('--no-history', action='store_true', help='Не записывать результат в историю')
+
+    def handle(self, *args, **options):
+        sink = _SmtpSink() if options['smtp'] else None
+        results = []
+        setup_test_environment(debug=False)
+        try:
+            if sink:
+                sink.__enter__()
+            TimingEmailBackend.smtp_address = sink.address if sink else None
+            for subscribers in options['subscribers']:
+                results.extend(self._bench_subscribers(subscribers, options))
+        finally:
+            TimingEmailBackend.smtp_address = None
+            if sink:
+                sink.__exit__(None, None, None)
+            teardown_test_environment()
+
+        history = Path(options['history'])
+        previous = self._previous(history)
+        for result in results:
+            self._report(result, previous.get((result['pipeline'], result['subscribers'], result['delivery'])))
+        if not options['no_history']:
+            history.parent.mkdir(parents=True, exist_ok=True)
+            with history.open('a', encoding='utf-8') as f:
+                for result in results:
+                    f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    def _seed(self, subscribers, digest_posts):
+        author = Author.objects.create(user=User.objects.create_user('bench_author'))
+        category = Category.objects.create(name='Бенчмарк')
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            (User(username=f'sub{i}', email=f'sub{i}@example.com', password=password) for i in range(subscribers)),
+            batch_size=5000,
+        )
+        Category.subscribers.through.objects.bulk_create(
+            (Category.subscribers.through(category_id=category.pk, user_id=user.pk) for user in users),
+            batch_size=5000,
+        )
+        posts = Post.objects.bulk_create(
+            Post(author=author, post_type=Post.NEWS, title=f'Новость {i}', text='текст новости ' * 30)
+            for i in range(digest_posts)
+        )
+        PostCategory.objects.bulk_create(PostCategory(post=post, category=category) for post in posts)
+        return category, posts[0]
+
+    def _bench_subscribers(self, subscribers, options):
+        with benchmark_database():
+            self.stdout.write(f'Подписчиков: {subscribers}, заполнение БД...')
+            category, post = self._seed(subscribers, options['digest_posts'])
+            return [self._bench(pipeline, subscribers, category, post, options) for pipeline in options['pipeline']]
+
+    def _bench(self, pipeline, subscribers, category, post, options):
+        try:
+            timer = PhaseTimer()
+            TimingEmailBackend.timer = timer
+            TimingEmailBackend.sent = 0
+            with override_settings(EMAIL_BACKEND='news.benchmarking.TimingEmailBackend'), \
+                    mock.patch.object(tasks, 'render_to_string', timer.wrap('render', tasks.render_to_string)), \
+                    connection.execute_wrapper(timer.sql):
+                start = time.perf_counter()
+                if pipeline == 'notify':
+                    tasks.notify_subscribers(post.pk)
+                else:
+                    since = timezone.now() - timedelta(days=7)
+                    tasks.send_category_digest(category.pk, since.isoformat())
+                total = time.perf_counter() - start
+        finally:
+            TimingEmailBackend.timer = None
+
+        phases = {name: timer.totals[name] for name in PHASES[:-1]}
+        phases['other'] = max(0.0, total - sum(phases.values()))
+        return {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(timespec='seconds'),
+            'pipeline': pipeline,
+            'subscribers': subscribers,
+            'delivery': 'smtp' if options['smtp'] else 'memory',
+            'emails': TimingEmailBackend.sent,
+            'queries': timer.counts['sql'],
+            'total': total,
+            'phases': phases,
+        }
+
+    def _previous(self, history):
+        """Последний результат для каждой конфигурации из истории."""
+        previous = {}
+        if history.exists():
+            for line in history.read_text(encoding='utf-8').splitlines():
+                try:
+                    entry = json.loads(line)
+                    previous[(entry['pipeline'], entry['subscribers'], entry['delivery'])] = entry
+                except (ValueError, KeyError):
+                    continue
+        return previous
+
+    def _report(self, result, previous):
+        emails = result['emails'] or 1
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{result['pipeline']}: {result['subscribers']} подписчиков, писем {result['emails']}, "
+            f"SQL-запросов {result['queries']}, всего {result['total']:.2f} с "
+            f"({result['emails'] / result['total']:.0f} писем/с), доставка: {result['delivery']}"
+        ))
+        self.stdout.write(f"  {'фаза':10} {'с':>9} {'мс/письмо':>10} {'доля':>7}")
+        for name in PHASES:
+            seconds = result['phases'][name]
+            self.stdout.write(
+                f"  {name:10} {seconds:9.3f} {seconds * 1000 / emails:10.3f} {seconds / result['total']:7.1%}"
+            )
+        if previous:
+            change = result['total'] / previous['total'] - 1 if previous['total'] else 0.0
+            self.stdout.write(f"  прошлый запуск ({previous['commit']}): {previous['total']:.2f} с, изменение {change:+.1%}")
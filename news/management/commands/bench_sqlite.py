@@ -0,0 +1,109 @@
+"""
+Конкурентный бенчмарк чтения/записи SQLite: настройки по умолчанию
+против SQLITE_PRAGMAS + постоянных соединений + BEGIN IMMEDIATE.
+Использование: python manage.py bench_sqlite [--readers 8] [--writers 2] [--duration 5]
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from news.benchmarking import summarize, temporary_sqlite_database
+from news.models import Author, Category, Post, PostCategory
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность SQLite по умолчанию и с production-настройками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Потоков чтения списка новостей (по умолчанию 8)')
+        parser.add_argument('--writers', type=int, default=2, help='Потоков создания постов (по умолчанию 2)')
+        parser.add_argument('--duration', type=float, default=5.0, help='Длительность прогона, с (по умолчанию 5)')
+        parser.add_argument('--posts', type=int, default=2000, help='Постов в начальных данных (по умолчанию 2000)')
+
+    def handle(self, *args, **options):
+        default_options = settings.DATABASES['default'].get('OPTIONS', {})
+        profiles = [
+            ('default', 0, {}),
+            ('tuned', settings.DATABASES['default'].get('CONN_MAX_AGE', 600), {
+                'init_command': default_options.get('init_command', ''),
+                'transaction_mode': default_options.get('transaction_mode', 'IMMEDIATE'),
+            }),
+        ]
+        for name, conn_max_age, db_options in profiles:
+            with temporary_sqlite_database(f'bench_{name}', conn_max_age, db_options) as alias:
+                self._seed(alias, options['posts'])
+                result = self._run(alias, options['readers'], options['writers'], options['duration'])
+            self._report(name, result, options['duration'])
+
+    def _seed(self, alias, num_posts):
+        user = User.objects.db_manager(alias).create_user('bench', 'bench@example.com')
+        author = Author.objects.using(alias).create(user=user)
+        self.category = Category.objects.using(alias).create(name='Бенчмарк')
+        with transaction.atomic(using=alias):
+            posts = Post.objects.using(alias).bulk_create(
+                Post(author=author, post_type=Post.NEWS, title=f'Новость {i}', text='текст ' * 50)
+                for i in range(num_posts)
+            )
+            PostCategory.objects.using(alias).bulk_create(
+                PostCategory(post=post, category=self.category) for post in posts
+            )
+        self.author_id = author.pk
+        connections[alias].close()
+
+    def _run(self, alias, readers, writers, duration):
+        deadline = time.perf_counter() + duration
+        result = {'read': [], 'write': [], 'locked': 0, 'lock': threading.Lock()}
+
+        def read_news_list():
+            list(
+                Post.objects.using(alias).filter(post_type=Post.NEWS)
+                .select_related('author__user').prefetch_related('categories')
+                .order_by('-created_at')[:10]
+            )
+
+        def create_post():
+            with transaction.atomic(using=alias):
+                post = Post.objects.using(alias).create(
+                    author_id=self.author_id, post_type=Post.NEWS, title='Новая', text='текст ' * 50
+                )
+                PostCategory.objects.using(alias).create(post=post, category=self.category)
+
+        def worker(kind, operation):
+            latencies = []
+            locked = 0
+            connection = connections[alias]
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    operation()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except OperationalError:
+                    locked += 1
+                # Как после каждого HTTP-запроса (сигнал request_finished)
+                connection.close_if_unusable_or_obsolete()
+            connection.close()
+            with result['lock']:
+                result[kind].extend(latencies)
+                result['locked'] += locked
+
+        threads = [threading.Thread(target=worker, args=('read', read_news_list)) for _ in range(readers)]
+        threads += [threading.Thread(target=worker, args=('write', create_post)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def _report(self, name, result, duration):
+        self.stdout.write(self.style.SUCCESS(f'[{name}]'))
+        for kind, label in (('read', 'список новостей'), ('write', 'создание поста')):
+            stats = summarize(result[kind])
+            self.stdout.write(
+                f"  {label:16} {stats['count'] / duration:9.1f} ops/s  "
+                f"p50={stats['p50']:.2f}ms  p95={stats['p95']:.2f}ms  p99={stats['p99']:.2f}ms"
+            )
+        self.stdout.write(f"  ошибок 'database is locked': {result['locked']}")
@@ -0,0 +1,98 @@
+"""
+Бенчмарк всех URL из news/urls.py на наборах данных разного размера.
+Использование: python manage.py bench_views [--scale small medium] [--iterations 20]
+               [--baseline benchmarks/baseline.json] [--save-baseline] [--tolerance 0.25]
+
+Для каждого набора создаётся отдельная тестовая БД (benchmark_database()),
+заполняется create_test_data и удаляется после прогона. Для каждого URL
+выводятся p50/p95/p99, число SQL-запросов и размер ответа; результаты
+сравниваются с baseline, и при регрессии команда завершается с ошибкой.
+"""
+import json
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from news.benchmarking import SCALES, benchmark_database, compare_to_baseline, measure_request, news_url_targets
+
+
+class Command(BaseCommand):
+    help = 'Замеряет латентность, число SQL-запросов и размер ответа URL новостей и сравнивает с baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', nargs='+', choices=list(SCALES), default=['small'],
+                            help='Наборы данных (по умолчанию small)')
+        parser.add_argument('--iterations', type=int, default=20, help='Замеров на URL (по умолчанию 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Прогревочных запросов на URL (по умолчанию 2)')
+        parser.add_argument('--url', action='append', help='Только эти имена URL (можно несколько раз)')
+        parser.add_argument('--keep-cache', action='store_true',
+                            help='Не очищать кэш перед запросами (замер закэшированных страниц)')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно create_test_data (по умолчанию 42)')
+        parser.add_argument('--baseline', default=str(settings.BENCHMARK_BASELINE),
+                            help='JSON с baseline (по умолчанию BENCHMARK_BASELINE)')
+        parser.add_argument('--save-baseline', action='store_true', help='Записать результаты как новый baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Допустимое ухудшение p95 и размера ответа, доля (по умолчанию 0.25)')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        setup_test_environment(debug=False)
+        try:
+            for scale in options['scale']:
+                results[scale] = self._run_scale(scale, options)
+        finally:
+            teardown_test_environment()
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline = json.loads(baseline_path.read_text(encoding='utf-8')) if baseline_path.exists() else {}
+            baseline.update(results)
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(baseline, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Baseline сохранён: {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f'Baseline не найден ({baseline_path}), сравнение пропущено'))
+            return
+
+        regressions = compare_to_baseline(
+            results, json.loads(baseline_path.read_text(encoding='utf-8')), options['tolerance']
+        )
+        if regressions:
+            raise CommandError('Регрессии производительности:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий относительно baseline нет'))
+
+    def _run_scale(self, scale, options):
+        # Все запросы идут с одного адреса: ограничение частоты для анонимов отключено
+        with benchmark_database(), override_settings(ANON_RATE_LIMIT=None):
+            self.stdout.write(f'[{scale}] заполнение: {SCALES[scale]}')
+            call_command('create_test_data', seed=options['seed'], stdout=StringIO(), **SCALES[scale])
+            # Ошибка view не прерывает прогон: URL попадает в отчёт с кодом 500
+            client = Client(raise_request_exception=False)
+            client.force_login(User.objects.create_superuser('bench', 'bench@example.com', 'bench'))
+
+            results = {}
+            self.stdout.write(f"  {'URL':24} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>5} {'байт':>10}  код")
+            for name, path in news_url_targets():
+                if options['url'] and name not in options['url']:
+                    continue
+                stats = measure_request(
+                    client, path, options['iterations'], options['warmup'], clear_cache=not options['keep_cache']
+                )
+                results[name] = stats
+                line = (
+                    f"  {name:24} {stats['p50']:8.2f} {stats['p95']:8.2f} {stats['p99']:8.2f} "
+                    f"{stats['queries']:5} {stats['bytes']:10}  {stats['status']}"
+                )
+                self.stdout.write(line if stats['status'] < 400 else self.style.ERROR(line))
+            return results
@@ -1,14 +1,93 @@
-from django.core.management.base import BaseCommand
+"""
+Генератор тестовых данных для разработки и нагрузочного тестирования.
+Использование: python manage.py create_test_data [--users 5] [--categories 8] [--posts 30]
+               [--comments 3] [--seed 42] [--batch-size 5000]
+
+Данные детерминированы при одинаковом --seed. Популярность авторов, категорий
+и комментаторов распределена по закону Ципфа (--zipf), длина текстов и число
+комментариев - с длинным хвостом. Всё создаётся через bulk_create пачками:
+сигналы post_save/m2m_changed не срабатывают, письма и задачи Celery не
+отправляются, поэтому миллионы постов генерируются за минуты. Версии лент и
+карты сайта, которые обновляли бы сигналы, команда обновляет сама после
+каждой пачки.
+"""
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
-import random
 
-from news.models import Author, Category, Post, Comment
+from news.bulk import keep_auto_now_add
+from news.censor import current_dictionary
+from news.feeds import post_scopes, touch_feeds
+from news.sitemaps import post_month, touch_sitemaps
+from news.models import Author, Category, Comment, Post, PostCategory
+
+CATEGORY_NAMES = [
+    'Политика', 'Экономика', 'Технологии', 'Спорт',
+    'Культура', 'Наука', 'Здоровье', 'Путешествия',
+    'Образование', 'Развлечения', 'Бизнес', 'Медиа'
+]
+
+NEWS_TITLES = [
+    'Новые законы вступили в силу',
+    'Встреча глав государств',
+    'Реформа образования',
+    'Новые технологии в медицине',
+    'Спортивные достижения',
+    'Культурные события',
+    'Экономические показатели',
+    'Научные открытия',
+    'Здоровый образ жизни',
+    'Туристические направления',
+]
+
+ARTICLE_TITLES = [
+    'Как правильно инвестировать',
+    'Анализ текущей ситуации',
+    'Руководство по использованию',
+    'Тенденции развития',
+    'Практические советы',
+    'Глубокий анализ проблемы',
+    'Методы решения задач',
+    'Опыт и рекомендации',
+    'Теоретические основы',
+    'Практические примеры',
+]
+
+POST_SENTENCES = [
+    'Это интересная новость о важных событиях в мире. ',
+    'Она содержит много полезной информации для читателей. ',
+    'Данная статья рассказывает о последних изменениях и тенденциях в различных сферах жизни. ',
+    'Автор рассматривает актуальные проблемы и предлагает различные подходы к их решению. ',
+    'Материал основан на глубоком анализе фактов и данных, представленных экспертами. ',
+    'Статья охватывает широкий спектр вопросов, связанных с современными вызовами и возможностями. ',
+]
+
+COMMENT_TEXTS = [
+    'Очень интересная статья!',
+    'Спасибо за информацию.',
+    'Не согласен с некоторыми моментами.',
+    'Отличный материал, рекомендую к прочтению.',
+    'Есть что обсудить по этой теме.',
+    'Много полезной информации.',
+    'Требуется дополнительное изучение вопроса.',
+]
+
+PASSWORD = 'testpass123'
+
+
+def zipf_cum_weights(n, exponent):
+    """Накопленные веса для random.choices: k-й элемент популярнее (k+1)-го в ((k+1)/k)^exponent раз."""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
 
 
 class Command(BaseCommand):
-    help = 'Создает тестовые данные для новостного портала'
+    help = 'Создает тестовые данные для новостного портала (детерминированно, пачками через bulk_create)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -29,176 +108,51 @@ class Command(BaseCommand):
             default=30,
             help='Количество постов (по умолчанию 30)',
         )
+        parser.add_argument(
+            '--comments',
+            type=float,
+            default=3,
+            help='Среднее число комментариев на пост (по умолчанию 3)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='За сколько последних дней распределить даты постов (по умолчанию 30)',
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа для популярности (по умолчанию 1.1)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Зерно генератора случайных чисел (по умолчанию 42)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Постов в одной транзакции (по умолчанию 5000)',
+        )
 
     def handle(self, *args, **options):
-        num_users = options['users']
-        num_categories = options['categories']
-        num_posts = options['posts']
+        self.rng = random.Random(options['seed'])
+        self.zipf = options['zipf']
+        self.now = timezone.now()
 
         self.stdout.write(self.style.SUCCESS('Начинаем создание тестовых данных...'))
 
-        # Создание пользователей и авторов
-        self.stdout.write('Создание пользователей и авторов...')
-        users = []
-        authors = []
-        for i in range(1, num_users + 1):
-            username = f'testuser{i}'
-            email = f'testuser{i}@example.com'
-            
-            user, created = User.objects.get_or_create(
-                username=username,
-                defaults={
-                    'email': email,
-                    'first_name': f'Test{i}',
-                    'last_name': 'User',
-                }
-            )
-            if created:
-                user.set_password('testpass123')
-                user.save()
-            
-            author, created = Author.objects.get_or_create(
-                user=user,
-                defaults={'rating': random.randint(0, 100)}
-            )
-            users.append(user)
-            authors.append(author)
-            if created:
-                self.stdout.write(f'  ✓ Создан пользователь: {username}')
-
-        # Создание категорий
-        self.stdout.write('Создание категорий...')
-        category_names = [
-            'Политика', 'Экономика', 'Технологии', 'Спорт',
-            'Культура', 'Наука', 'Здоровье', 'Путешествия',
-            'Образование', 'Развлечения', 'Бизнес', 'Медиа'
-        ]
-        
-        categories = []
-        for i, name in enumerate(category_names[:num_categories]):
-            category, created = Category.objects.get_or_create(
-                name=name,
-                defaults={}
-            )
-            categories.append(category)
-            if created:
-                self.stdout.write(f'  ✓ Создана категория: {name}')
-
-        # Создание постов (новостей и статей)
-        self.stdout.write('Создание постов...')
-        news_titles = [
-            'Новые законы вступили в силу',
-            'Встреча глав государств',
-            'Реформа образования',
-            'Новые технологии в медицине',
-            'Спортивные достижения',
-            'Культурные события',
-            'Экономические показатели',
-            'Научные открытия',
-            'Здоровый образ жизни',
-            'Туристические направления',
-        ]
-        
-        article_titles = [
-            'Как правильно инвестировать',
-            'Анализ текущей ситуации',
-            'Руководство по использованию',
-            'Тенденции развития',
-            'Практические советы',
-            'Глубокий анализ проблемы',
-            'Методы решения задач',
-            'Опыт и рекомендации',
-            'Теоретические основы',
-            'Практические примеры',
-        ]
-
-        post_texts = [
-            'Это интересная новость о важных событиях в мире. Она содержит много полезной информации для читателей.',
-            'Данная статья рассказывает о последних изменениях и тенденциях в различных сферах жизни.',
-            'Автор рассматривает актуальные проблемы и предлагает различные подходы к их решению.',
-            'Материал основан на глубоком анализе фактов и данных, представленных экспертами.',
-            'Статья охватывает широкий спектр вопросов, связанных с современными вызовами и возможностями.',
-        ]
-
-        posts_created = 0
-        for i in range(num_posts):
-            # Чередуем новости и статьи
-            post_type = Post.NEWS if i % 2 == 0 else Post.ARTICLE
-            if post_type == Post.NEWS:
-                title_base = random.choice(news_titles)
-            else:
-                title_base = random.choice(article_titles)
-            
-            title = f'{title_base} #{i+1}'
-            text = random.choice(post_texts) * (random.randint(2, 5))
-            author = random.choice(authors)
-            
-            # Создаем пост с случайной датой в последние 30 дней
-            days_ago = random.randint(0, 30)
-            created_at = timezone.now() - timedelta(days=days_ago)
-            
-            post = Post.objects.create(
-                author=author,
-                post_type=post_type,
-                title=title,
-                text=text,
-                rating=random.randint(-10, 50),
-                created_at=created_at
-            )
-            
-            # Добавляем случайные категории (1-3 категории на пост)
-            num_cats = random.randint(1, min(3, len(categories)))
-            selected_categories = random.sample(categories, num_cats)
-            post.categories.set(selected_categories)
-            
-            posts_created += 1
-            if posts_created % 10 == 0:
-                self.stdout.write(f'  ✓ Создано постов: {posts_created}')
-
-        # Создание комментариев
-        self.stdout.write('Создание комментариев...')
-        comment_texts = [
-            'Очень интересная статья!',
-            'Спасибо за информацию.',
-            'Не согласен с некоторыми моментами.',
-            'Отличный материал, рекомендую к прочтению.',
-            'Есть что обсудить по этой теме.',
-            'Много полезной информации.',
-            'Требуется дополнительное изучение вопроса.',
-        ]
-        
-        comments_created = 0
-        for post in Post.objects.all()[:posts_created]:
-            # Создаем 1-5 комментариев для каждого поста
-            num_comments = random.randint(1, 5)
-            for _ in range(num_comments):
-                user = random.choice(users)
-                days_ago = random.randint(0, 30)
-                created_at = timezone.now() - timedelta(days=days_ago)
-                
-                Comment.objects.create(
-                    post=post,
-                    user=user,
-                    text=random.choice(comment_texts),
-                    rating=random.randint(-5, 10),
-                    created_at=created_at
-                )
-                comments_created += 1
-        
-        self.stdout.write(f'  ✓ Создано комментариев: {comments_created}')
-
-        # Создание подписок
-        self.stdout.write('Создание подписок на категории...')
-        subscriptions = 0
-        for user in users:
-            # Каждый пользователь подписывается на 2-4 случайные категории
-            num_subs = random.randint(2, min(4, len(categories)))
-            selected_cats = random.sample(categories, num_subs)
-            for category in selected_cats:
-                category.subscribers.add(user)
-                subscriptions += 1
-        
-        self.stdout.write(f'  ✓ Создано подписок: {subscriptions}')
+        users, authors = self._create_users(options['users'])
+        categories = self._create_categories(options['categories'])
+        subscriptions = self._create_subscriptions(users, categories)
+        posts_created, comments_created = self._create_posts(
+            options['posts'], options['comments'], options['days'], options['batch_size'],
+            users, authors, categories,
+        )
 
         self.stdout.write(self.style.SUCCESS(
             f'\n✓ Тестовые данные успешно созданы!\n'
@@ -210,6 +164,136 @@ class Command(BaseCommand):
             f'  - Подписок: {subscriptions}\n'
             f'\nДля входа используйте:\n'
             f'  Username: testuser1 (и testuser2, testuser3 и т.д.)\n'
-            f'  Password: testpass123'
+            f'  Password: {PASSWORD}'
         ))
 
+    def _create_users(self, num_users):
+        self.stdout.write('Создание пользователей и авторов...')
+        usernames = [f'testuser{i}' for i in range(1, num_users + 1)]
+        wanted = set(usernames)
+        # Без username__in: у SQLite ограничено число параметров запроса
+        test_users = User.objects.filter(username__startswith='testuser')
+        existing = {name for name in test_users.values_list('username', flat=True) if name in wanted}
+        # Хэш пароля считается один раз: PBKDF2 на каждого пользователя занял бы минуты
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=username,
+                    email=f'{username}@example.com',
+                    first_name=f'Test{username.removeprefix("testuser")}',
+                    last_name='User',
+                    password=password,
+                )
+                for username in usernames if username not in existing
+            ],
+            batch_size=5000,
+        )
+        users = [pk for pk, name in test_users.order_by('pk').values_list('pk', 'username') if name in wanted]
+        Author.objects.bulk_create(
+            [Author(user_id=user_id, rating=self.rng.randint(0, 100)) for user_id in users],
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+        user_ids = set(users)
+        authors = [
+            pk for pk, user_id in Author.objects.filter(user__username__startswith='testuser')
+            .order_by('user_id').values_list('pk', 'user_id') if user_id in user_ids
+        ]
+        self.stdout.write(f'  ✓ Новых пользователей: {len(usernames) - len(existing)}')
+        return users, authors
+
+    def _create_categories(self, num_categories):
+        self.stdout.write('Создание категорий...')
+        names = CATEGORY_NAMES[:num_categories]
+        names += [f'Категория {i}' for i in range(len(names) + 1, num_categories + 1)]
+        Category.objects.bulk_create([Category(name=name) for name in names], ignore_conflicts=True)
+        ids = dict(Category.objects.filter(name__in=names).values_list('name', 'pk'))
+        # Порядок задаёт популярность: первая категория - самая популярная
+        return [ids[name] for name in names]
+
+    def _create_subscriptions(self, users, categories):
+        self.stdout.write('Создание подписок на категории...')
+        cum_weights = zipf_cum_weights(len(categories), self.zipf)
+        Subscription = Category.subscribers.through
+        links = []
+        for user_id in users:
+            # Каждый пользователь подписывается на 2-4 категории, чаще на популярные
+            num_subs = self.rng.randint(2, min(4, len(categories)))
+            for category_id in set(self.rng.choices(categories, cum_weights=cum_weights, k=num_subs)):
+                links.append(Subscription(category_id=category_id, user_id=user_id))
+        Subscription.objects.bulk_create(links, batch_size=5000, ignore_conflicts=True)
+        self.stdout.write(f'  ✓ Создано подписок: {len(links)}')
+        return len(links)
+
+    def _text(self):
+        # Логнормальная длина: в основном короткие заметки, изредка очень длинные статьи
+        sentences = max(1, int(self.rng.lognormvariate(1.5, 0.9)))
+        return ''.join(self.rng.choices(POST_SENTENCES, k=sentences)).strip()
+
+    def _num_comments(self, mean):
+        # Парето: у большинства постов комментариев мало, у немногих - сотни
+        if mean <= 0:
+            return 0
+        alpha = 1 + 1 / mean
+        return min(round(self.rng.paretovariate(alpha) - 1), 1000)
+
+    def _create_posts(self, num_posts, comments_mean, days, batch_size, users, authors, categories):
+        self.stdout.write('Создание постов и комментариев...')
+        author_weights = zipf_cum_weights(len(authors), self.zipf)
+        category_weights = zipf_cum_weights(len(categories), self.zipf)
+        user_weights = zipf_cum_weights(len(users), self.zipf)
+        period = timedelta(days=days).total_seconds()
+
+        posts_created = comments_created = 0
+        with keep_auto_now_add(Post, 'created_at'), keep_auto_now_add(Comment, 'created_at'):
+            for start in range(0, num_posts, batch_size):
+                posts = []
+                for i in range(start, min(start + batch_size, num_posts)):
+                    # Чередуем новости и статьи
+                    post_type = Post.NEWS if i % 2 == 0 else Post.ARTICLE
+                    titles = NEWS_TITLES if post_type == Post.NEWS else ARTICLE_TITLES
+                    posts.append(Post(
+                        author_id=self.rng.choices(authors, cum_weights=author_weights)[0],
+                        post_type=post_type,
+                        title=f'{self.rng.choice(titles)} #{i + 1}',
+                        text=self._text(),
+                        rating=self.rng.randint(-10, 50),
+                        created_at=self.now - timedelta(seconds=self.rng.uniform(0, period)),
+                    ))
+
+                # bulk_create не вызывает save(): копии для цензуры заполняем сами
+                dictionary = current_dictionary()
+                for post in posts:
+                    post.refresh_censored(dictionary)
+                with transaction.atomic():
+                    Post.objects.bulk_create(posts)
+                    links = []
+                    comments = []
+                    scopes = set()
+                    for post in posts:
+                        # 1-3 категории на пост
+                        picked = self.rng.choices(categories, cum_weights=category_weights, k=self.rng.randint(1, 3))
+                        links.extend(PostCategory(post_id=post.pk, category_id=category_id) for category_id in set(picked))
+                        scopes.update(post_scopes(post.post_type, set(picked)))
+                        age = (self.now - post.created_at).total_seconds()
+                        for _ in range(self._num_comments(comments_mean)):
+                            comments.append(Comment(
+                                post_id=post.pk,
+                                user_id=self.rng.choices(users, cum_weights=user_weights)[0],
+                                text=self.rng.choice(COMMENT_TEXTS),
+                                rating=self.rng.randint(-5, 10),
+                                created_at=self.now - timedelta(seconds=self.rng.uniform(0, age)),
+                            ))
+                    for comment in comments:
+                        comment.refresh_censored(dictionary)
+                    PostCategory.objects.bulk_create(links)
+                    Comment.objects.bulk_create(comments)
+                # bulk_create не вызывает сигналы: закрытые месяцы карты сайта кэшируются без срока
+                touch_feeds(scopes)
+                touch_sitemaps({post_month(post) for post in posts})
+
+                posts_created += len(posts)
+                comments_created += len(comments)
+                self.stdout.write(f'  ✓ Создано постов: {posts_created}, комментариев: {comments_created}')
+        return posts_created, comments_created
@@ -0,0 +1,47 @@
+"""
+Потоковая выгрузка постов в NDJSON или CSV.
+Использование: python manage.py export_posts [--format ndjson|csv] [--type NW|AR]
+               [--from 2024-01-01] [--to 2024-12-31] [--output posts.ndjson]
+"""
+import argparse
+import sys
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from news.export import FORMATS, export_queryset, iter_export, iter_rows
+from news.models import Post
+
+
+def _date(value):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        # Формат верный, но такой даты нет (2024-02-30)
+        parsed = None
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f'неверная дата: {value} (ожидается ГГГГ-ММ-ДД)')
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты с категориями, автором и рейтингом в NDJSON или CSV (в stdout или файл)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson', help='Формат (по умолчанию ndjson)')
+        parser.add_argument('--type', choices=[Post.NEWS, Post.ARTICLE], help='Только новости или статьи')
+        parser.add_argument('--from', dest='date_from', type=_date, help='С даты включительно (ГГГГ-ММ-ДД)')
+        parser.add_argument('--to', dest='date_to', type=_date, help='По дату включительно (ГГГГ-ММ-ДД)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Размер пачки (по умолчанию DB_ITERATOR_CHUNK_SIZE)')
+        parser.add_argument('--output', '-o', help='Файл для выгрузки (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        queryset = export_queryset(options['type'], options['date_from'], options['date_to'])
+        chunks = iter_export(options['format'], iter_rows(queryset, options['chunk_size']))
+        if options['output']:
+            newline = '' if options['format'] == 'csv' else None
+            with open(options['output'], 'w', encoding='utf-8', newline=newline) as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
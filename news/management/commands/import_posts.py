@@ -0,0 +1,159 @@
+"""
+Массовый импорт постов из NDJSON (формат manage.py export_posts).
+Использование: python manage.py import_posts [feed.ndjson | -] [--batch-size 5000]
+               [--default-author username] [--no-notify]
+
+Строка: {"title": ..., "text": ..., "author": "username", "categories": ["Спорт"],
+         "post_type": "NW", "created_at": "2024-05-01T10:00:00+00:00", "rating": 0}
+Обязательны title, text и author (или --default-author); остальное по желанию.
+Строки с неверным типом поста, слишком длинным заголовком или нечисловым
+рейтингом пропускаются и попадают в счётчик пропущенных - до bulk_create,
+чтобы одна плохая строка не откатывала всю пачку.
+Авторы и категории ищутся в словарях в памяти, посты и связи с категориями
+вставляются через bulk_create пачками в отдельных транзакциях; сигналы post_save
+не срабатывают, подписчики уведомляются одной задачей notify_imported_posts в конце
+(в задачу передаются диапазоны ID, а не сами ID).
+"""
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from news.bulk import keep_auto_now_add
+from news.censor import current_dictionary
+from news.feeds import ALL_SCOPE, touch_feeds
+from news.sitemaps import post_month, touch_sitemaps
+from news.models import Author, Category, Post, PostCategory
+from news.tasks import notify_imported_posts
+from scheduler.queue import enqueue
+
+
+TITLE_MAX_LENGTH = Post._meta.get_field('title').max_length
+POST_TYPES = {value for value, _ in Post.POST_TYPES}
+
+
+def id_ranges(ids):
+    """[1, 2, 3, 7, 8] -> [[1, 3], [7, 8]]"""
+    ranges = []
+    for pk in sorted(ids):
+        if ranges and pk == ranges[-1][1] + 1:
+            ranges[-1][1] = pk
+        else:
+            ranges.append([pk, pk])
+    return ranges
+
+
+def _validate(post):
+    if post.post_type not in POST_TYPES:
+        raise ValueError(f'неизвестный тип поста: {post.post_type}')
+    if not isinstance(post.title, str) or not isinstance(post.text, str):
+        raise ValueError('title и text должны быть строками')
+    if len(post.title) > TITLE_MAX_LENGTH:
+        raise ValueError(f'заголовок длиннее {TITLE_MAX_LENGTH} символов')
+    if not isinstance(post.rating, int) or isinstance(post.rating, bool):
+        raise ValueError(f'рейтинг не целое число: {post.rating!r}')
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты из NDJSON-файла или stdin пачками через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-', help='NDJSON-файл (по умолчанию stdin)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Постов в транзакции (по умолчанию 5000)')
+        parser.add_argument('--default-author', help='Автор (username) для строк без поля author')
+        parser.add_argument('--no-notify', action='store_true', help='Не уведомлять подписчиков')
+
+    def handle(self, *args, **options):
+        self.authors = dict(Author.objects.values_list('user__username', 'pk'))
+        self.categories = dict(Category.objects.values_list('name', 'pk'))
+        self.default_author = options['default_author']
+        if self.default_author and self.default_author not in self.authors:
+            raise CommandError(f'Автор не найден: {self.default_author}')
+        self.skipped = 0
+        self.months = set()
+
+        source = sys.stdin if options['input'] == '-' else open(options['input'], encoding='utf-8')
+        imported_ids = []
+        started = time.perf_counter()
+        try:
+            rows = self._parse(source)
+            with keep_auto_now_add(Post, 'created_at'):
+                while batch := list(islice(rows, options['batch_size'])):
+                    imported_ids.extend(self._import_batch(batch))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        elapsed = time.perf_counter() - started
+
+        if imported_ids:
+            # bulk_create не вызывает сигналы, обновляющие версии лент и карт сайта
+            touch_feeds([ALL_SCOPE])
+            touch_sitemaps(self.months)
+        if imported_ids and not options['no_notify']:
+            enqueue(notify_imported_posts, args=(id_ranges(imported_ids),))
+        rate = len(imported_ids) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {len(imported_ids)} за {elapsed:.2f} с ({rate:.0f}/с), пропущено строк: {self.skipped}'
+        ))
+
+    def _skip(self, line_no, reason):
+        self.skipped += 1
+        self.stderr.write(f'Строка {line_no}: {reason}')
+
+    def _parse(self, source):
+        """(Post, названия категорий) для каждой корректной строки."""
+        now = timezone.now()
+        for line_no, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                username = row.get('author') or self.default_author
+                author_id = self.authors.get(username)
+                if author_id is None:
+                    self._skip(line_no, f'автор не найден: {username}')
+                    continue
+                created_at = parse_datetime(row['created_at']) if row.get('created_at') else now
+                categories = row.get('categories') or []
+                if isinstance(categories, str):
+                    categories = [name for name in categories.split('|') if name]
+                post = Post(
+                    author_id=author_id,
+                    post_type=row.get('post_type') or Post.NEWS,
+                    title=row['title'],
+                    text=row['text'],
+                    rating=row.get('rating') or 0,
+                    created_at=created_at or now,
+                )
+                _validate(post)
+            except (ValueError, KeyError, TypeError, AttributeError) as exc:
+                self._skip(line_no, f'некорректная строка ({exc!r})')
+                continue
+            yield post, categories
+
+    def _category_ids(self, names):
+        missing = {name for name in names if name not in self.categories}
+        if missing:
+            Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+            self.categories.update(Category.objects.filter(name__in=missing).values_list('name', 'pk'))
+        return [self.categories[name] for name in names]
+
+    def _import_batch(self, batch):
+        # bulk_create не вызывает save(): копии для цензуры заполняем сами
+        dictionary = current_dictionary()
+        for post, _ in batch:
+            post.refresh_censored(dictionary)
+        with transaction.atomic():
+            posts = Post.objects.bulk_create([post for post, _ in batch])
+            links = []
+            for post, names in batch:
+                for category_id in self._category_ids(names):
+                    links.append(PostCategory(post_id=post.pk, category_id=category_id))
+            PostCategory.objects.bulk_create(links)
+        self.months.update(post_month(post) for post in posts)
+        return [post.pk for post in posts]
@@ -0,0 +1,57 @@
+"""
+Загрузка словаря фильтра censor (модель BannedWord) из файла: одна словоформа на строку.
+Использование: python manage.py load_banned_words words.txt [--replace]
+
+Слова приводятся к нижнему регистру; строки, которые фильтр не может заменить
+(не буквы, меньше двух букв), пропускаются. Вставка идёт через bulk_create
+пачками, затем версия словаря меняется один раз: все процессы перечитают
+словарь, а задача recensor пересчитает сохранённые копии текстов.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from news.censor import RELOAD_INTERVAL, bulk_dictionary_change, normalize_word, touch_dictionary
+from news.models import BannedWord
+from news.tasks import recensor
+from scheduler.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Загружает словарь запрещённых слов (по словоформе на строку) в BannedWord'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл со словоформами в UTF-8')
+        parser.add_argument('--replace', action='store_true', help='Удалить слова, которых нет в файле')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError as exc:
+            raise CommandError(f'Не удалось прочитать {options["path"]}: {exc}')
+        words = {normalize_word(line) for line in lines if line.strip()}
+        skipped = sum(1 for line in lines if line.strip() and normalize_word(line) is None)
+        words.discard(None)
+
+        with transaction.atomic():
+            before = BannedWord.objects.count()
+            if options['replace']:
+                # Без сигнала на каждую удалённую строку: touch_dictionary и recensor - один раз ниже
+                with bulk_dictionary_change():
+                    self._delete_missing(words)
+            BannedWord.objects.bulk_create(
+                [BannedWord(word=word) for word in sorted(words)], batch_size=5000, ignore_conflicts=True
+            )
+            after = BannedWord.objects.count()
+            transaction.on_commit(touch_dictionary)
+            transaction.on_commit(lambda: enqueue(recensor, countdown=RELOAD_INTERVAL))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Словоформ в словаре: {after} (было {before}), пропущено строк: {skipped}'
+        ))
+
+    def _delete_missing(self, words):
+        # Без exclude(word__in=...): словарь бывает больше лимита параметров SQLite
+        missing = [pk for pk, word in BannedWord.objects.values_list('pk', 'word') if word not in words]
+        for start in range(0, len(missing), 900):
+            BannedWord.objects.filter(pk__in=missing[start:start + 900]).delete()
@@ -0,0 +1,248 @@
+"""
+Нагрузочный тест: поднимает портал на локальном WSGI-сервере и гоняет
+смешанный трафик из пула потоков-клиентов по сценарию из JSON-файла.
+Использование: python manage.py load_test [benchmarks/scenarios/mixed.json]
+               [--clients 16] [--duration 30] [--scale small] [--existing-db]
+
+Сценарий: веса и шаблоны запросов ("path": "/news/{news_id}/"); подстановки
+{news_id}, {article_id}, {post_id}, {category_id}, {page}, {word} выбираются
+случайно из данных БД. Запросы с "auth": true идут от имени одного из "users"
+обычных пользователей loadtest-N (только право news.add_post) с сессией и
+CSRF-токеном; после теста пользователи удаляются вместе с их голосами.
+
+По умолчанию БД - временная копия схемы (для SQLite - файл, чтобы блокировки
+были как в продакшене), заполненная create_test_data. Отчёт: пропускная
+способность, p50/p95/p99 и доля ошибок по типам запросов, гистограмма
+латентности и число ошибок блокировки SQLite ("database is locked").
+"""
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from io import StringIO
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from news.benchmarking import SCALES, benchmark_database, histogram, summarize
+from news.models import Category, Post
+
+CSRF_TOKEN = 'loadtest' * 4  # 32 символа, как у настоящего CSRF-cookie
+
+LOAD_USER_PREFIX = 'loadtest-'
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _Params(dict):
+    """Подстановки для шаблонов запросов: каждое обращение - случайное значение."""
+    def __init__(self, pools, rng):
+        super().__init__()
+        self.pools = pools
+        self.rng = rng
+
+    def __missing__(self, key):
+        return self.rng.choice(self.pools[key])
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест смешанным трафиком на локальном WSGI-сервере по сценарию из JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', nargs='?',
+                            default=str(settings.BASE_DIR / 'benchmarks' / 'scenarios' / 'mixed.json'),
+                            help='JSON-файл сценария (по умолчанию benchmarks/scenarios/mixed.json)')
+        parser.add_argument('--clients', type=int, help='Параллельных клиентов (по умолчанию из сценария)')
+        parser.add_argument('--duration', type=float, help='Длительность, с (по умолчанию из сценария)')
+        parser.add_argument('--scale', choices=list(SCALES), help='Набор данных (по умолчанию из сценария)')
+        parser.add_argument('--existing-db', action='store_true',
+                            help='Работать с текущей БД без временной копии (данные изменятся!)')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генераторов (по умолчанию 42)')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            scenario = json.loads(Path(options['scenario']).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Не удалось прочитать сценарий {options["scenario"]}: {exc}')
+        clients = options['clients'] or scenario.get('clients', 16)
+        duration = options['duration'] or scenario.get('duration', 30)
+        scale = options['scale'] or scenario.get('scale', 'small')
+
+        setup_test_environment(debug=False)
+        try:
+            with ExitStack() as stack:
+                # Все клиенты - с одного адреса: ограничение частоты для анонимов отключено
+                stack.enter_context(override_settings(ANON_RATE_LIMIT=None))
+                if not options['existing_db']:
+                    stack.enter_context(benchmark_database())
+                    self.stdout.write(f'Заполнение БД: {scale} {SCALES[scale]}')
+                    call_command('create_test_data', seed=options['seed'], stdout=StringIO(), **SCALES[scale])
+                sessions = self._sessions(scenario.get('users', 50))
+                # С --existing-db пользователи остались бы в настоящей БД
+                stack.callback(self._delete_users)
+                pools = self._pools()
+                results = self._run(scenario['requests'], pools, sessions, clients, duration, options['seed'])
+        finally:
+            teardown_test_environment()
+
+        report = self._report(results, clients)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    def _sessions(self, num_users):
+        """Cookie сессий пользователей loadtest-1..loadtest-N для запросов с "auth": true."""
+        usernames = [f'{LOAD_USER_PREFIX}{i}' for i in range(1, num_users + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(username=username, email=f'{username}@example.com')
+            for username in usernames if username not in existing
+        ])
+        add_post = Permission.objects.get(codename='add_post', content_type__app_label='news')
+        sessions = []
+        for user in User.objects.filter(username__in=usernames):
+            user.user_permissions.add(add_post)
+            client = Client()
+            client.force_login(user)
+            sessions.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+        return sessions
+
+    def _delete_users(self):
+        # Сессии удалённых пользователей больше не действуют; посты и голоса удаляются каскадом
+        User.objects.filter(username__startswith=LOAD_USER_PREFIX).delete()
+
+    def _pools(self):
+        def ids(queryset):
+            # Не больше 10 000 случайных объектов: достаточно для разброса по кэшу и БД
+            return list(queryset.order_by('?').values_list('pk', flat=True)[:10_000]) or [0]
+
+        news_count = Post.objects.filter(post_type=Post.NEWS).count()
+        titles = Post.objects.values_list('title', flat=True)[:1000]
+        words = sorted({word for title in titles for word in title.split() if len(word) > 3}) or ['новость']
+        return {
+            'news_id': ids(Post.objects.filter(post_type=Post.NEWS)),
+            'article_id': ids(Post.objects.filter(post_type=Post.ARTICLE)),
+            'post_id': ids(Post.objects.all()),
+            'category_id': ids(Category.objects.all()),
+            'page': list(range(1, max(2, min(news_count // 10, 50) + 1))),
+            'word': words,
+        }
+
+    def _run(self, requests, pools, sessions, clients, duration, seed):
+        locked = Counter()
+
+        def count_lock_errors(sender, request, **kwargs):
+            exc = sys.exc_info()[1]
+            if isinstance(exc, OperationalError) and 'locked' in str(exc):
+                locked['database is locked'] += 1
+
+        got_request_exception.connect(count_lock_errors)
+        server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler, allow_reuse_address=False)
+        server.set_app(WSGIHandler())
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        host, port = server.server_address[:2]
+        self.stdout.write(f'Сервер: http://{host}:{port}/, клиентов: {clients}, длительность: {duration} с')
+
+        weights = [item['weight'] for item in requests]
+        samples = defaultdict(list)  # name -> [(status, latency_ms)]
+        samples_lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def client_loop(index):
+            rng = random.Random(seed + index)
+            local = defaultdict(list)
+            while time.perf_counter() < deadline:
+                item = rng.choices(requests, weights=weights)[0]
+                params = _Params(pools, rng)
+                path = item['path'].format_map(params)
+                headers = {}
+                body = None
+                if item.get('auth'):
+                    session = rng.choice(sessions)
+                    headers['Cookie'] = f'{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={CSRF_TOKEN}'
+                    headers['X-CSRFToken'] = CSRF_TOKEN
+                if item.get('method', 'GET') == 'POST':
+                    data = {key: str(value).format_map(params) for key, value in item.get('data', {}).items()}
+                    body = urlencode(data)
+                    headers['Content-Type'] = 'application/x-www-form-urlencoded'
+                start = time.perf_counter()
+                try:
+                    conn = http.client.HTTPConnection(host, port, timeout=30)
+                    conn.request(item.get('method', 'GET'), path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    status = response.status
+                    conn.close()
+                except OSError:
+                    status = 0  # соединение не удалось
+                local[item['name']].append((status, (time.perf_counter() - start) * 1000))
+            with samples_lock:
+                for name, values in local.items():
+                    samples[name].extend(values)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        server.shutdown()
+        server.server_close()
+        got_request_exception.disconnect(count_lock_errors)
+        return {'samples': samples, 'elapsed': elapsed, 'locked': locked['database is locked']}
+
+    def _report(self, results, clients):
+        elapsed = results['elapsed']
+        samples = results['samples']
+        all_latencies = [latency for values in samples.values() for _, latency in values]
+        total = len(all_latencies)
+        report = {'clients': clients, 'elapsed': elapsed, 'rps': total / elapsed, 'requests': {},
+                  'locked': results['locked']}
+
+        self.stdout.write(self.style.SUCCESS(f'\nВсего запросов: {total} за {elapsed:.1f} с ({total / elapsed:.1f} rps)'))
+        self.stdout.write(f"  {'запрос':16} {'rps':>8} {'ошибок':>7} {'p50':>8} {'p95':>8} {'p99':>8}  коды")
+        for name, values in sorted(samples.items()):
+            stats = summarize([latency for _, latency in values])
+            statuses = Counter(status for status, _ in values)
+            errors = sum(count for status, count in statuses.items() if status == 0 or status >= 500)
+            report['requests'][name] = {
+                **stats, 'rps': len(values) / elapsed, 'error_rate': errors / len(values),
+                'statuses': {str(status): count for status, count in statuses.items()},
+            }
+            codes = ' '.join(f'{status}:{count}' for status, count in sorted(statuses.items()))
+            line = (
+                f"  {name:16} {len(values) / elapsed:8.1f} {errors / len(values):7.1%} "
+                f"{stats['p50']:8.1f} {stats['p95']:8.1f} {stats['p99']:8.1f}  {codes}"
+            )
+            self.stdout.write(line if not errors else self.style.WARNING(line))
+
+        self.stdout.write('\nГистограмма латентности, мс:')
+        buckets = histogram(all_latencies)
+        widest = max((count for _, count in buckets), default=0) or 1
+        for bound, count in buckets:
+            label = f'<= {bound:g}' if bound != float('inf') else f'> {buckets[-2][0]:g}'
+            self.stdout.write(f'  {label:>9} {count:8} {"#" * round(40 * count / widest)}')
+        report['histogram'] = [[bound if bound != float('inf') else None, count] for bound, count in buckets]
+
+        self.stdout.write(f"\nОшибок блокировки SQLite ('database is locked'): {results['locked']}")
+        return report
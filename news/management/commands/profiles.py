@@ -0,0 +1,68 @@
+"""
+Просмотр профилей запросов, снятых ProfilingMiddleware.
+Использование:
+    python manage.py profiles                  # список профилей
+    python manage.py profiles --show <файл>    # сводка pstats
+    python manage.py profiles --token          # токен для заголовка X-Profile
+"""
+import io
+import pstats
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config.profiling import make_profile_token
+
+
+class Command(BaseCommand):
+    help = 'Показывает и суммирует профили запросов из PROFILES_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show', metavar='FILE', help='Вывести сводку по профилю (имя файла или "latest")')
+        parser.add_argument('--sort', default='cumulative', help='Ключ сортировки pstats (по умолчанию cumulative)')
+        parser.add_argument('--limit', type=int, default=30, help='Число строк в сводке (по умолчанию 30)')
+        parser.add_argument('--token', action='store_true', help='Сгенерировать подписанный токен для заголовка X-Profile')
+        parser.add_argument('--clean', action='store_true', help='Удалить все сохранённые профили')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(make_profile_token())
+            return
+
+        profiles = sorted(settings.PROFILES_DIR.glob('*.prof')) if settings.PROFILES_DIR.exists() else []
+
+        if options['clean']:
+            for path in profiles:
+                path.unlink()
+            self.stdout.write(self.style.SUCCESS(f'Удалено профилей: {len(profiles)}'))
+            return
+
+        if options['show']:
+            self._show(profiles, options['show'], options['sort'], options['limit'])
+            return
+
+        if not profiles:
+            self.stdout.write('Профилей нет.')
+            return
+        for path in profiles:
+            stats = pstats.Stats(str(path))
+            modified = datetime.fromtimestamp(path.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+            self.stdout.write(
+                f'{path.name}  {modified}  {stats.total_tt * 1000:9.1f} ms  {stats.total_calls:8d} calls'
+            )
+
+    def _show(self, profiles, name, sort, limit):
+        if name == 'latest':
+            if not profiles:
+                raise CommandError('Профилей нет.')
+            path = profiles[-1]
+        else:
+            path = settings.PROFILES_DIR / name
+            if not path.exists():
+                raise CommandError(f'Профиль не найден: {name}')
+
+        out = io.StringIO()
+        stats = pstats.Stats(str(path), stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(out.getvalue())
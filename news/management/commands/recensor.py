@@ -0,0 +1,19 @@
+"""
+Пересчёт сохранённых отцензурированных копий постов и комментариев (задача
+news.tasks.recensor) прямо в процессе команды - например, после миграции,
+добавившей копии, или когда Celery недоступен.
+Использование: python manage.py recensor [--batch-size 2000]
+"""
+from django.core.management.base import BaseCommand
+
+from news.tasks import recensor
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает отцензурированные копии текстов по текущему словарю'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Строк в транзакции (по умолчанию DB_ITERATOR_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(recensor(options['batch_size'], repeat=False)))
@@ -0,0 +1,74 @@
+"""
+Сводка по логу медленных запросов (config.slowlog).
+Использование: python manage.py slowqueries [--sort total|p95|count] [--limit 20]
+"""
+import json
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from news.benchmarking import percentile
+
+
+class Command(BaseCommand):
+    help = 'Агрегирует лог медленных запросов по fingerprint: count, p50, p95, суммарное время'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None, help='Путь к логу (по умолчанию SLOW_QUERY_LOG)')
+        parser.add_argument('--sort', choices=['total', 'p95', 'count'], default='total',
+                            help='Сортировка (по умолчанию total)')
+        parser.add_argument('--limit', type=int, default=20, help='Сколько fingerprint вывести (по умолчанию 20)')
+        parser.add_argument('--plans', action='store_true', help='Показать захваченные EXPLAIN-планы')
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SLOW_QUERY_LOG
+        try:
+            lines = open(path, encoding='utf-8').readlines()
+        except FileNotFoundError:
+            raise CommandError(f'Лог не найден: {path}')
+
+        durations = defaultdict(list)
+        sites = defaultdict(Counter)
+        sql_by_fp = {}
+        plans = {}
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            fp = entry.get('fingerprint')
+            if entry.get('type') == 'explain':
+                plans[fp] = entry['plan']
+            elif entry.get('type') == 'query':
+                durations[fp].append(entry['duration_ms'])
+                sites[fp][entry.get('call_site', '-')] += 1
+                sql_by_fp[fp] = entry['sql']
+
+        rows = []
+        for fp, values in durations.items():
+            values.sort()
+            rows.append({
+                'fingerprint': fp,
+                'count': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'total': sum(values),
+            })
+        rows.sort(key=lambda row: row[options['sort']], reverse=True)
+
+        if not rows:
+            self.stdout.write('Медленных запросов нет.')
+            return
+        for row in rows[:options['limit']]:
+            fp = row['fingerprint']
+            self.stdout.write(self.style.SUCCESS(
+                f"{fp}  count={row['count']}  p50={row['p50']:.1f}ms  "
+                f"p95={row['p95']:.1f}ms  total={row['total']:.1f}ms"
+            ))
+            top_sites = ', '.join(f'{site} ({n})' for site, n in sites[fp].most_common(3))
+            self.stdout.write(f'  где: {top_sites}')
+            self.stdout.write(f'  sql: {sql_by_fp[fp][:300]}')
+            if options['plans'] and fp in plans:
+                for plan_line in plans[fp].splitlines():
+                    self.stdout.write(f'  plan: {plan_line}')
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def create_trigram_index(apps, schema_editor):
+    # Только для Postgres: GIN-индекс pg_trgm под icontains-поиск по заголовку
+    # (Django строит его как UPPER("title"::text) LIKE UPPER(%s))
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS news_post_title_upper_trgm '
+        'ON news_post USING gin (UPPER("title"::text) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS news_post_title_upper_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_category_subscribers'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_post_title_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at'], name='news_post_created_at_idx'),
+        ),
+    ]
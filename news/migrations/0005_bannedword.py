@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:02
+
+import django.core.validators
+import re
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_post_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BannedWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=64, unique=True, validators=[django.core.validators.RegexValidator(re.compile('^[a-zа-яё]{2,}$'), 'Только строчные буквы, не меньше двух.')])),
+            ],
+        ),
+    ]
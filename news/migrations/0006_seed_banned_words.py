@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# Слова, которые раньше были зашиты в news_filters.BAD_WORDS
+INITIAL_WORDS = ['редиска']
+
+
+def seed_banned_words(apps, schema_editor):
+    BannedWord = apps.get_model('news', 'BannedWord')
+    BannedWord.objects.using(schema_editor.connection.alias).bulk_create(
+        [BannedWord(word=word) for word in INITIAL_WORDS], ignore_conflicts=True
+    )
+
+
+def remove_banned_words(apps, schema_editor):
+    BannedWord = apps.get_model('news', 'BannedWord')
+    BannedWord.objects.using(schema_editor.connection.alias).filter(word__in=INITIAL_WORDS).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_bannedword'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_banned_words, remove_banned_words),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_seed_banned_words'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='censor_version',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='censored_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='censor_version',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='censored_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='censored_title',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
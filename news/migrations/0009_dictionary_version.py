@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:31
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    DictionaryVersion = apps.get_model('news', 'DictionaryVersion')
+    DictionaryVersion.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_post_votes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DictionaryVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
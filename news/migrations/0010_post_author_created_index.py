@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_dictionary_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'created_at'], name='news_post_author_created_idx'),
+        ),
+    ]
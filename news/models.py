@@ -1,8 +1,81 @@
-from django.db import models
+from django.db import models, connections, router, transaction
+from django.db.models.signals import post_save
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.urls import reverse
 from django.db.models import Sum
+from django.core.validators import RegexValidator
+from config.db import supports_update_returning
+from .censor import WORD_RE, censor_text, censor_words, current_dictionary
+
+
+def _change_rating(instance, delta: int) -> None:
+    """
+    Атомарно меняет rating на delta и обновляет значение в instance.
+    Где поддерживается UPDATE ... RETURNING - одним запросом, иначе
+    через F-выражение и повторное чтение. В обоих случаях отправляется
+    post_save с update_fields={'rating'}, как при save(update_fields=...).
+    Если строки уже нет - DoesNotExist.
+    """
+    model = type(instance)
+    using = router.db_for_write(model, instance=instance)
+    if supports_update_returning(using):
+        ops = connections[using].ops
+        table = ops.quote_name(instance._meta.db_table)
+        pk_column = ops.quote_name(instance._meta.pk.column)
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET rating = rating + %s WHERE {pk_column} = %s RETURNING rating',
+                [delta, instance.pk],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise model.DoesNotExist(f'{model.__name__} {instance.pk} удалён')
+        instance.rating = row[0]
+        post_save.send(
+            sender=model, instance=instance, created=False, update_fields=frozenset(['rating']),
+            raw=False, using=using,
+        )
+        return
+    instance.rating = models.F("rating") + delta
+    instance.save(update_fields=["rating"])
+    instance.refresh_from_db(fields=["rating"])  # resolve F-expression
+
+
+class CensoredModel(models.Model):
+    """
+    Модель с сохранённой отцензурированной копией полей (CENSORED_FIELDS:
+    поле -> копия). Копии пересчитываются при save() и хранятся вместе с
+    версией словаря, по которой они получены (news/censor.py).
+    """
+    CENSORED_FIELDS = {}
+
+    censor_version = models.CharField(max_length=32, blank=True, default='', editable=False)
+
+    class Meta:
+        abstract = True
+
+    def refresh_censored(self, dictionary=None) -> None:
+        """Пересчитывает копии (без сохранения); для bulk_create и массового пересчёта."""
+        dictionary = dictionary or current_dictionary()
+        for source, target in self.CENSORED_FIELDS.items():
+            setattr(self, target, censor_words(getattr(self, source), dictionary.words))
+        self.censor_version = dictionary.version
+
+    def censored(self, source) -> str:
+        # Строки из bulk_create без копий (версии нет) цензурируются на лету
+        if self.censor_version:
+            return getattr(self, self.CENSORED_FIELDS[source])
+        return censor_text(getattr(self, source))
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.refresh_censored()
+        elif set(self.CENSORED_FIELDS) & set(update_fields):
+            self.refresh_censored()
+            kwargs['update_fields'] = {*update_fields, *self.CENSORED_FIELDS.values(), 'censor_version'}
+        super().save(*args, **kwargs)
 
 
 class Author(models.Model):
@@ -32,7 +105,7 @@ class Category(models.Model):
         return reverse('news:category_detail', args=[self.pk])
 
 
-class Post(models.Model):
+class Post(CensoredModel):
     ARTICLE = "AR"
     NEWS = "NW"
     POST_TYPES = [
@@ -47,21 +120,62 @@ class Post(models.Model):
     title = models.CharField(max_length=255)
     text = models.TextField()
     rating = models.IntegerField(default=0)
+    censored_title = models.CharField(max_length=255, blank=True, default='', editable=False)
+    censored_text = models.TextField(blank=True, default='', editable=False)
+
+    CENSORED_FIELDS = {'title': 'censored_title', 'text': 'censored_text'}
+
+    class Meta:
+        indexes = [
+            # Ленты, списки и карта сайта выбирают посты по диапазону и порядку created_at
+            models.Index(fields=['created_at'], name='news_post_created_at_idx'),
+            # Лимит публикаций считает посты автора за последние сутки
+            models.Index(fields=['author', 'created_at'], name='news_post_author_created_idx'),
+        ]
 
     def like(self) -> None:
-        self.rating = models.F("rating") + 1
-        self.save(update_fields=["rating"])
-        self.refresh_from_db(fields=["rating"])  # resolve F-expression
+        _change_rating(self, 1)
 
     def dislike(self) -> None:
-        self.rating = models.F("rating") - 1
-        self.save(update_fields=["rating"])
-        self.refresh_from_db(fields=["rating"])  # resolve F-expression
+        _change_rating(self, -1)
+
+    def vote(self, user, value: int) -> None:
+        """
+        Голос пользователя (PostVote.LIKE / PostVote.DISLIKE): один на пост.
+        Повторный такой же голос ничего не меняет, противоположный заменяет прежний.
+        """
+        with transaction.atomic(using=router.db_for_write(PostVote)):
+            vote, created = PostVote.objects.select_for_update().get_or_create(
+                post=self, user=user, defaults={'value': value},
+            )
+            if created:
+                delta = value
+            elif vote.value == value:
+                return
+            else:
+                vote.value = value
+                vote.save(update_fields=['value'])
+                delta = 2 * value
+            _change_rating(self, delta)
 
     def preview(self) -> str:
         preview_text = self.text[:124]
         return f"{preview_text}..." if len(self.text) > 124 else preview_text
 
+    # Для шаблонов: отцензурированные заголовок, текст и превью
+    @property
+    def display_title(self) -> str:
+        return self.censored('title')
+
+    @property
+    def display_text(self) -> str:
+        return self.censored('text')
+
+    @property
+    def display_preview(self) -> str:
+        text = self.display_text
+        return f"{text[:124]}..." if len(text) > 124 else text
+
     def get_absolute_url(self):
         # Return appropriate URL based on post type
         if self.post_type == self.NEWS:
@@ -81,25 +195,77 @@ class PostCategory(models.Model):
         return f"{self.post_id}:{self.category_id}"
 
 
-class Comment(models.Model):
+class PostVote(models.Model):
+    """Голос пользователя за пост; ограничение уникальности не даёт голосовать дважды."""
+    LIKE = 1
+    DISLIKE = -1
+    VALUES = [
+        (LIKE, "нравится"),
+        (DISLIKE, "не нравится"),
+    ]
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="votes")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    value = models.SmallIntegerField(choices=VALUES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user'], name='news_postvote_post_user_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_id}:{self.post_id}:{self.value:+d}"
+
+
+class Comment(CensoredModel):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     rating = models.IntegerField(default=0)
+    censored_text = models.TextField(blank=True, default='', editable=False)
+
+    CENSORED_FIELDS = {'text': 'censored_text'}
 
     def like(self) -> None:
-        self.rating = models.F("rating") + 1
-        self.save(update_fields=["rating"])
-        self.refresh_from_db(fields=["rating"])  # resolve F-expression
+        _change_rating(self, 1)
 
     def dislike(self) -> None:
-        self.rating = models.F("rating") - 1
-        self.save(update_fields=["rating"])
-        self.refresh_from_db(fields=["rating"])  # resolve F-expression
+        _change_rating(self, -1)
+
+    @property
+    def display_text(self) -> str:
+        return self.censored('text')
 
     def __str__(self) -> str:
         return f"Comment by {self.user.username} on {self.post_id}"
 
 
+class BannedWord(models.Model):
+    """Словоформа для фильтра censor; каждая форма слова - отдельная строка."""
+    word = models.CharField(
+        max_length=64,
+        unique=True,
+        validators=[RegexValidator(WORD_RE, 'Только строчные буквы, не меньше двух.')],
+    )
+
+    def save(self, *args, **kwargs):
+        self.word = self.word.strip().lower()
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return self.word
+
+
 # Create your models here.
+
+
+class DictionaryVersion(models.Model):
+    """
+    Счётчик изменений словаря BannedWord (одна строка, pk=1). Процессы сверяют
+    его раз в RELOAD_INTERVAL секунд и перечитывают словарь, когда он сменился.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return str(self.version)
@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Post
-from .tasks import notify_subscribers
+from scheduler.queue import enqueue
+from .censor import RELOAD_INTERVAL, in_bulk_dictionary_change, touch_dictionary
+from .events import publish_post
+from .feeds import post_scopes, touch_feeds
+from .models import BannedWord, Category, Post
+from .sitemaps import post_month, touch_sitemaps
+from .tasks import notify_subscribers, recensor
 
 
 @receiver(post_save, sender=Post)
@@ -17,5 +23,72 @@ def notify_subscribers_on_create(sender, instance: Post, created, **kwargs):
     if not categories:
         return
 
-    # Отправляем задачу в очередь Celery
-    notify_subscribers.delay(instance.pk)
+    # Отправляем задачу в очередь Celery (при недоступном брокере - в спул)
+    enqueue(notify_subscribers, args=(instance.pk,))
+
+
+@receiver(post_save, sender=Post)
+def publish_post_event(sender, instance: Post, created, **kwargs):
+    """
+    Событие о новом посте для SSE-подписчиков (news/events.py) - после коммита,
+    когда категории поста уже сохранены.
+    """
+    if created:
+        transaction.on_commit(lambda: publish_post(instance))
+
+
+def _touch_feeds_on_commit(scopes):
+    transaction.on_commit(lambda: touch_feeds(scopes))
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def touch_post_feeds(sender, instance: Post, update_fields=None, **kwargs):
+    """Ленты с постом перегенерируются после коммита (pre_delete: категории ещё на месте)."""
+    if update_fields and set(update_fields) <= {'rating'}:
+        # Рейтинга в лентах нет: лайки не должны сбрасывать их кэш
+        return
+    category_ids = list(instance.categories.values_list('pk', flat=True))
+    _touch_feeds_on_commit(post_scopes(instance.post_type, category_ids))
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def touch_category_feeds(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # category.posts.add(...): меняются лента категории и ленты типов (в них есть категории записей)
+        _touch_feeds_on_commit([f'category:{instance.pk}', f'type:{Post.NEWS}', f'type:{Post.ARTICLE}'])
+        return
+    if action == 'pre_clear':
+        pk_set = set(instance.categories.values_list('pk', flat=True))
+    _touch_feeds_on_commit(post_scopes(instance.post_type, pk_set))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def touch_feeds_on_category_change(sender, instance: Category, **kwargs):
+    # Название категории есть в её ленте и в записях лент новостей и статей
+    _touch_feeds_on_commit([f'category:{instance.pk}', f'type:{Post.NEWS}', f'type:{Post.ARTICLE}'])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def touch_post_sitemap(sender, instance: Post, created=True, **kwargs):
+    """Карта месяца поста перестраивается, только когда в нём появился или исчез пост."""
+    if created:
+        month = post_month(instance)
+        transaction.on_commit(lambda: touch_sitemaps([month]))
+
+
+@receiver(post_save, sender=BannedWord)
+@receiver(post_delete, sender=BannedWord)
+def reload_censor_dictionary(sender, **kwargs):
+    """
+    Процессы перечитают словарь фильтра censor после коммита, а копии текстов
+    пересчитаются, когда все процессы уже будут писать их по новому словарю.
+    """
+    if in_bulk_dictionary_change():
+        return
+    transaction.on_commit(touch_dictionary)
+    transaction.on_commit(lambda: enqueue(recensor, countdown=RELOAD_INTERVAL))
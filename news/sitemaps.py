@@ -0,0 +1,173 @@
+"""
+Карта сайта для поисковиков: индекс /sitemap.xml и карты по месяцам
+/sitemap-ГГГГ-ММ-N.xml (N - часть месяца, по SITEMAP_LIMIT адресов).
+
+Карты месяцев строятся из values_list(...).iterator(): строки читаются
+пачками без моделей, в памяти - только собранный XML одной части. Готовый
+XML кэшируется без срока под версией месяца; версию меняют только создание и
+удаление постов этого месяца (news/signals.py), поэтому закрытые месяцы
+генерируются один раз, а перестраивается в основном текущий.
+
+Индекс тоже инкрементальный: статистика закрытых месяцев (число постов и
+дата последнего) кэшируется, пока не изменится какой-нибудь закрытый месяц
+или не начнётся новый; для текущего месяца считается отдельный запрос.
+Все запросы статистики - диапазоны по индексу created_at.
+"""
+import math
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import Post
+
+SITEMAP_LIMIT = 50_000  # ограничение протокола на число адресов в одной карте
+CURRENT_MONTH_TIMEOUT = 60 * 60 * 24  # версии текущего месяца меняются часто, старые должны истекать
+CLOSED_MONTHS = 'closed'  # версия статистики закрытых месяцев для индекса
+_PK_PLACEHOLDER = 987654321
+
+_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+_XMLNS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def _version_key(bucket):
+    return f'sitemap-version:{bucket}'
+
+
+def _month_label(value):
+    return f'{value.year:04d}-{value.month:02d}'
+
+
+def _month_start(year, month):
+    return timezone.make_aware(datetime(year, month, 1))
+
+
+def _month_range(year, month):
+    return _month_start(year, month), _month_start(year + month // 12, month % 12 + 1)
+
+
+def _current_month():
+    return _month_label(timezone.localtime())
+
+
+def touch_sitemaps(months):
+    """Отмечает месяцы (ГГГГ-ММ) изменёнными; изменение закрытого месяца перестраивает и индекс."""
+    now = time.time_ns()
+    buckets = set(months)
+    if buckets - {_current_month()}:
+        buckets.add(CLOSED_MONTHS)
+    cache.set_many({_version_key(bucket): now for bucket in buckets}, None)
+
+
+def post_month(post):
+    return _month_label(timezone.localtime(post.created_at))
+
+
+def _version(bucket):
+    version = cache.get(_version_key(bucket))
+    if version is None:
+        cache.add(_version_key(bucket), time.time_ns(), None)
+        version = cache.get(_version_key(bucket), 0)
+    return version
+
+
+def month_stats():
+    """[(год, месяц, постов, последний created_at)] по возрастанию месяца."""
+    current = _current_month()
+    year, month = map(int, current.split('-'))
+    start, end = _month_range(year, month)
+
+    key = f'sitemap-closed:{current}:{_version(CLOSED_MONTHS)}'
+    closed = cache.get(key)
+    if closed is None:
+        # По запросу на месяц с диапазоном по индексу created_at: дешевле, чем
+        # GROUP BY по усечённой дате, которая считается для каждой строки
+        closed = []
+        first = Post.objects.filter(created_at__lt=start).aggregate(first=Min('created_at'))['first']
+        if first is not None:
+            first = timezone.localtime(first)
+            for index in range(first.year * 12 + first.month - 1, year * 12 + month - 1):
+                y, m = divmod(index, 12)
+                stats = _range_stats(y, m + 1)
+                if stats['count']:
+                    closed.append((y, m + 1, stats['count'], stats['last']))
+        cache.set(key, closed, None)
+
+    key = f'sitemap-current:{current}:{_version(current)}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = _range_stats(year, month)
+        cache.set(key, stats, CURRENT_MONTH_TIMEOUT)
+    if stats['count']:
+        return [*closed, (year, month, stats['count'], stats['last'])]
+    return closed
+
+
+def _range_stats(year, month):
+    start, end = _month_range(year, month)
+    return Post.objects.filter(created_at__gte=start, created_at__lt=end).aggregate(
+        count=Count('id'), last=Max('created_at')
+    )
+
+
+def _url_templates():
+    """Шаблоны адресов постов по типу: reverse() один раз, а не на каждую строку."""
+    return {
+        post_type: reverse(name, args=[_PK_PLACEHOLDER]).replace(str(_PK_PLACEHOLDER), '{}')
+        for post_type, name in ((Post.NEWS, 'news:news_detail'), (Post.ARTICLE, 'news:article_detail'))
+    }
+
+
+def iter_month_urls(base_url, year, month, page):
+    """Строки XML карты части месяца; посты читаются потоком пачками."""
+    start, end = _month_range(year, month)
+    templates = _url_templates()
+    rows = (
+        Post.objects.filter(created_at__gte=start, created_at__lt=end)
+        .order_by('created_at', 'id')
+        .values_list('id', 'post_type', 'created_at')[(page - 1) * SITEMAP_LIMIT:page * SITEMAP_LIMIT]
+        .iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE)
+    )
+    yield f'{_HEADER}<urlset {_XMLNS}>\n'
+    for pk, post_type, created_at in rows:
+        loc = escape(base_url + templates[post_type].format(pk))
+        yield f'<url><loc>{loc}</loc><lastmod>{timezone.localdate(created_at).isoformat()}</lastmod></url>\n'
+    yield '</urlset>\n'
+
+
+def _xml_response(content):
+    return HttpResponse(content, content_type='application/xml; charset=utf-8')
+
+
+def sitemap_index(request):
+    base_url = request.build_absolute_uri('/').rstrip('/')
+    lines = [f'{_HEADER}<sitemapindex {_XMLNS}>\n']
+    for year, month, count, last in month_stats():
+        for page in range(1, math.ceil(count / SITEMAP_LIMIT) + 1):
+            loc = escape(base_url + reverse('sitemap_month', args=[year, f'{month:02d}', page]))
+            lines.append(
+                f'<sitemap><loc>{loc}</loc><lastmod>{timezone.localdate(last).isoformat()}</lastmod></sitemap>\n'
+            )
+    lines.append('</sitemapindex>\n')
+    return _xml_response(''.join(lines))
+
+
+def sitemap_month(request, year, month, page):
+    if not (1 <= month <= 12 and 1 <= year < 9999 and page >= 1):
+        raise Http404('Нет такой карты')
+    base_url = request.build_absolute_uri('/').rstrip('/')
+    label = f'{year:04d}-{month:02d}'
+    key = f'sitemap:{base_url}:{label}:{page}:{_version(label)}'
+    content = cache.get(key)
+    if content is None:
+        content = ''.join(iter_month_urls(base_url, year, month, page))
+        if '<url>' not in content:
+            raise Http404('Нет такой карты')
+        cache.set(key, content, CURRENT_MONTH_TIMEOUT if label == _current_month() else None)
+    return _xml_response(content)
@@ -6,8 +6,14 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.sites.models import Site
-from .models import Post, Category
-from datetime import timedelta
+from config.metrics import EMAILS_SENT
+from config.routers import pinned_to_primary
+from scheduler.queue import enqueue
+from django.db import transaction
+from .censor import RELOAD_INTERVAL, load_dictionary
+from .feeds import ALL_SCOPE, touch_feeds
+from .models import Post, Category, Comment
+from datetime import datetime, timedelta
 from django.utils import timezone
 
 
@@ -21,7 +27,7 @@ def build_abs_url(path: str) -> str:
         return f'http://localhost:8000{path}'
 
 
-@shared_task
+@shared_task(priority=3)
 def notify_subscribers(post_id):
     """
     Отправляет уведомления подписчикам категорий при создании новой новости/статьи.
@@ -30,7 +36,9 @@ def notify_subscribers(post_id):
         post_id: ID поста, для которого нужно отправить уведомления
     """
     try:
-        post = Post.objects.prefetch_related('categories__subscribers').get(pk=post_id)
+        # Пост только что создан: читаем из primary, реплика может отставать
+        with pinned_to_primary():
+            post = Post.objects.prefetch_related('categories').get(pk=post_id)
     except Post.DoesNotExist:
         return f"Post with id {post_id} does not exist"
     
@@ -41,12 +49,14 @@ def notify_subscribers(post_id):
     
     emails_sent = 0
     
+    # Абсолютная ссылка одна для всех писем
+    abs_post_url = build_abs_url(post.get_absolute_url())
+
     # Отправляем уведомления для каждой категории
     for category in categories:
-        subscribers = category.subscribers.select_related().all()
-        if not subscribers:
-            continue
-        
+        # Подписчиков читаем потоково: на Postgres через серверный курсор
+        subscribers = category.subscribers.exclude(email='').iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE)
+
         # Персонально каждому: чтобы вставить username и корректно собрать ссылку
         for user in subscribers:
             if not user.email:
@@ -57,12 +67,9 @@ def notify_subscribers(post_id):
                 'post': post,
                 'snippet': post.text[:50],
                 'user': user,
+                'abs_post_url': abs_post_url,
             }
             
-            # Создаем абсолютный URL (используем метод модели)
-            relative_url = post.get_absolute_url()
-            context['abs_post_url'] = build_abs_url(relative_url)
-            
             html = render_to_string('emails/new_post_personal.html', context)
             text = f"""{post.title}
 {post.text[:50]}…
@@ -86,62 +93,180 @@ def notify_subscribers(post_id):
                 # Логируем ошибку, но продолжаем отправку другим пользователям
                 print(f"Error sending email to {user.email}: {e}")
     
+    EMAILS_SENT.labels('notify_subscribers').inc(emails_sent)
     return f"Sent {emails_sent} notification emails for post {post_id}"
 
 
-@shared_task
+def _mail_category_subscribers(cat, posts, subject, heading=None):
+    """
+    Отправляет каждому подписчику категории письмо со списком posts.
+    heading - первая строка текста письма (по умолчанию тема).
+    Возвращает число отправленных писем.
+    """
+    total_emails = 0
+
+    # Ссылки на посты одинаковы для всех подписчиков категории
+    for p in posts:
+        p.abs_url = build_abs_url(p.get_absolute_url())
+
+    # Подписчиков читаем потоково: на Postgres через серверный курсор
+    for user in cat.subscribers.exclude(email='').iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE):
+        # Текстовая версия
+        text_lines = [f'Привет, {user.get_username()}! {heading or subject}:\n']
+        for p in posts:
+            text_lines.append(f'- {p.title} ({p.abs_url})')
+        text = '\n'.join(text_lines)
+
+        # HTML версия
+        context = {
+            'user': user,
+            'category': cat,
+            'posts': posts,
+        }
+
+        html = render_to_string('emails/weekly_digest.html', context)
+
+        try:
+            send_mail(
+                subject=subject,
+                message=text,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[user.email],
+                html_message=html,
+                fail_silently=False,
+            )
+            total_emails += 1
+        except Exception as e:
+            print(f"Error sending {subject!r} to {user.email}: {e}")
+
+    return total_emails
+
+
+@shared_task(priority=6)
 def send_weekly_digest():
     """
     Раз в неделю отправляет подписчикам каждой категории список новых статей за 7 дней.
     Письмо содержит заголовки и кликабельные ссылки.
+
+    Сама задача только ставит в очередь bulk по задаче send_category_digest
+    на каждую категорию с новыми постами: рассылка идёт небольшими частями
+    с ограничением скорости и не занимает воркеры надолго.
     """
     since = timezone.now() - timedelta(days=7)
-    categories = Category.objects.prefetch_related('subscribers').all()
-    
+    category_ids = (
+        Category.objects.filter(posts__created_at__gte=since)
+        .values_list('pk', flat=True).distinct()
+    )
+
+    queued = 0
+    for category_id in category_ids:
+        enqueue(send_category_digest, args=(category_id, since.isoformat()))
+        queued += 1
+
+    return f"Queued weekly digest for {queued} categories"
+
+
+@shared_task(priority=6, rate_limit='30/m')
+def send_category_digest(category_id, since):
+    """
+    Отправляет еженедельный дайджест подписчикам одной категории.
+
+    Args:
+        category_id: ID категории
+        since: начало периода дайджеста (ISO 8601)
+    """
+    try:
+        cat = Category.objects.get(pk=category_id)
+    except Category.DoesNotExist:
+        return f"Category with id {category_id} does not exist"
+
+    since = datetime.fromisoformat(since)
+    posts = list(Post.objects.filter(categories=cat, created_at__gte=since).order_by('-created_at'))
+    if not posts:
+        return f"No new posts in category {category_id}"
+
+    total_emails = _mail_category_subscribers(
+        cat, posts, f'Еженедельный дайджест: {cat.name}', f'Еженедельный дайджест категории "{cat.name}"'
+    )
+    EMAILS_SENT.labels('send_weekly_digest').inc(total_emails)
+    return f"Sent {total_emails} weekly digest emails for category {category_id}"
+
+
+@shared_task(priority=6)
+def notify_imported_posts(id_ranges):
+    """
+    Уведомляет подписчиков о постах, загруженных manage.py import_posts:
+    одно письмо на подписчика и категорию со всеми новыми постами этой категории.
+
+    Args:
+        id_ranges: ID импортированных постов как список пар [первый, последний]
+            (bulk_create выдаёт ID подряд, так что сообщение остаётся маленьким)
+    """
+    posts_by_category = {}
+    total_posts = 0
+    chunk_size = settings.DB_ITERATOR_CHUNK_SIZE
+    for first, last in id_ranges:
+        with pinned_to_primary():
+            chunk = (
+                Post.objects.filter(pk__range=(first, last))
+                .order_by('pk')
+                .prefetch_related('categories')
+                .iterator(chunk_size=chunk_size)
+            )
+            for post in chunk:
+                total_posts += 1
+                for cat in post.categories.all():
+                    posts_by_category.setdefault(cat, []).append(post)
+
     total_emails = 0
-    
-    for cat in categories:
-        posts = Post.objects.filter(categories=cat, created_at__gte=since).order_by('-created_at')
-        if not posts.exists():
-            continue
-        
-        for user in cat.subscribers.all():
-            if not user.email:
-                continue
-                
-            subject = f'Еженедельный дайджест: {cat.name}'
-            
-            # Текстовая версия
-            text_lines = [f'Привет, {user.get_username()}! Еженедельный дайджест категории "{cat.name}":\n']
-            for p in posts:
-                url = build_abs_url(p.get_absolute_url())
-                text_lines.append(f'- {p.title} ({url})')
-            text = '\n'.join(text_lines)
-            
-            # HTML версия
-            context = {
-                'user': user,
-                'category': cat,
-                'posts': posts,
-            }
-            # Обновляем контекст с правильными URL
-            for p in context['posts']:
-                p.abs_url = build_abs_url(p.get_absolute_url())
-            
-            html = render_to_string('emails/weekly_digest.html', context)
-            
-            try:
-                send_mail(
-                    subject=subject,
-                    message=text,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    html_message=html,
-                    fail_silently=False,
-                )
-                total_emails += 1
-            except Exception as e:
-                print(f"Error sending weekly digest to {user.email}: {e}")
-    
-    return f"Sent {total_emails} weekly digest emails"
+    for cat, cat_posts in posts_by_category.items():
+        cat_posts.sort(key=lambda p: p.created_at, reverse=True)
+        total_emails += _mail_category_subscribers(cat, cat_posts, f'Новые публикации: {cat.name}')
 
+    EMAILS_SENT.labels('notify_imported_posts').inc(total_emails)
+    return f"Sent {total_emails} emails for {total_posts} imported posts"
+
+
+@shared_task(priority=8)
+def recensor(batch_size=None, repeat=True):
+    """
+    Пересчитывает сохранённые отцензурированные копии постов и комментариев,
+    полученные по другой версии словаря (после его изменения или bulk_create).
+    Процесс, ещё не перечитавший словарь, может записать копию по старому уже
+    после прохода, поэтому задача повторяется через RELOAD_INTERVAL, пока
+    проход не найдёт ни одной устаревшей копии.
+
+    Args:
+        batch_size: строк в одной транзакции (по умолчанию DB_ITERATOR_CHUNK_SIZE)
+        repeat: ставить ли следующий проход в очередь
+    """
+    batch_size = batch_size or settings.DB_ITERATOR_CHUNK_SIZE
+    # Словарь - из БД: словарь процесса может отставать на RELOAD_INTERVAL
+    dictionary = load_dictionary()
+    updated = 0
+    for model in (Post, Comment):
+        fields = [*model.CENSORED_FIELDS.values(), 'censor_version']
+        last_pk = 0
+        while True:
+            with pinned_to_primary(), transaction.atomic():
+                # Строки пачки заблокированы: параллельный save() не затрёт копию из нового текста
+                batch = list(
+                    model.objects.select_for_update()
+                    .filter(pk__gt=last_pk)
+                    .exclude(censor_version=dictionary.version)
+                    .order_by('pk')
+                    .only('pk', *model.CENSORED_FIELDS)[:batch_size]
+                )
+                if not batch:
+                    break
+                for obj in batch:
+                    obj.refresh_censored(dictionary)
+                model.objects.bulk_update(batch, fields)
+            last_pk = batch[-1].pk
+            updated += len(batch)
+    if updated:
+        # Ленты кэшируют уже отцензурированный текст
+        touch_feeds([ALL_SCOPE])
+        if repeat:
+            enqueue(recensor, args=(batch_size,), countdown=RELOAD_INTERVAL)
+    return f"Recensored {updated} rows for dictionary {dictionary.version}"
@@ -1,7 +1,9 @@
-from django.test import TestCase
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.template import Context, Template
-from .models import Author, Post
+from .models import Author, BannedWord, Category, Comment, Post, PostCategory, PostVote
 from django.contrib.auth.models import User
 
 
@@ -25,6 +27,116 @@ class CensorFilterTests(TestCase):
         with self.assertRaises(TypeError):
             self.render("{% load news_filters %}{{ value|censor }}", {"value": 123})
 
+    def test_censor_whole_words_only(self):
+        out = self.render("{% load news_filters %}{{ text|censor }}", {"text": "редиска1 редиски редиска."})
+        self.assertEqual(out, "редиска1 редиски р******.")
+
+    def test_dictionary_change_reloads_censor(self):
+        from unittest import mock
+
+        from .censor import touch_dictionary
+
+        self.addCleanup(touch_dictionary)
+        tpl = "{% load news_filters %}{{ text|censor }}"
+        self.assertEqual(self.render(tpl, {"text": "Редиски"}), "Редиски")
+        with mock.patch('news.signals.enqueue'), self.captureOnCommitCallbacks(execute=True):
+            BannedWord.objects.create(word=" Редиски ")
+        self.assertEqual(self.render(tpl, {"text": "Редиски и редиска"}), "Р****** и р******")
+        with mock.patch('news.signals.enqueue'), self.captureOnCommitCallbacks(execute=True):
+            BannedWord.objects.filter(word="редиска").delete()
+        self.assertEqual(self.render(tpl, {"text": "редиска"}), "редиска")
+
+
+class CensoredCopiesTests(TestCase):
+    def setUp(self):
+        from .censor import touch_dictionary
+
+        self.addCleanup(touch_dictionary)
+        self.user = User.objects.create_user('censored_author')
+        self.author = Author.objects.create(user=self.user)
+
+    def test_save_stores_censored_copies(self):
+        from .censor import load_dictionary
+
+        post = Post.objects.create(author=self.author, post_type=Post.NEWS, title='Редиска', text='он редиска')
+        comment = Comment.objects.create(post=post, user=self.user, text='Редиска!')
+        post.refresh_from_db()
+        self.assertEqual((post.censored_title, post.censored_text), ('Р******', 'он р******'))
+        self.assertEqual(post.censor_version, load_dictionary().version)
+        self.assertEqual(post.display_title, 'Р******')
+        self.assertEqual(Comment.objects.get(pk=comment.pk).display_text, 'Р******!')
+
+        post.text = 'редиска, но уже другая'
+        post.save(update_fields=['text'])
+        post.like()
+        post.refresh_from_db()
+        self.assertEqual(post.censored_text, 'р******, но уже другая')
+
+    def test_rows_without_copies_are_censored_on_read(self):
+        post, = Post.objects.bulk_create([Post(author=self.author, post_type=Post.NEWS, title='T', text='редиска')])
+        self.assertEqual(post.censor_version, '')
+        self.assertEqual(post.display_text, 'р******')
+
+    def test_dictionary_change_recensors_stale_copies(self):
+        from unittest import mock
+
+        from .tasks import recensor
+
+        post = Post.objects.create(author=self.author, post_type=Post.NEWS, title='Морковка', text='редиска')
+        Post.objects.bulk_create([Post(author=self.author, post_type=Post.NEWS, title='Морковка', text='текст')])
+        with mock.patch('news.signals.enqueue') as enqueue, self.captureOnCommitCallbacks(execute=True):
+            BannedWord.objects.create(word='морковка')
+        enqueue.assert_called_once_with(recensor, countdown=mock.ANY)
+
+        with mock.patch('news.tasks.enqueue') as enqueue:
+            recensor(batch_size=1)
+        self.assertEqual(
+            sorted(Post.objects.values_list('censored_title', flat=True)), ['М*******', 'М*******']
+        )
+        self.assertEqual(Post.objects.get(pk=post.pk).censored_text, 'р******')
+        # Следующий проход догонит копии, записанные отстающими процессами; пустой проход завершает цепочку
+        enqueue.assert_called_once_with(recensor, args=(1,), countdown=mock.ANY)
+        with mock.patch('news.tasks.enqueue') as enqueue:
+            self.assertEqual(
+                recensor(), 'Recensored 0 rows for dictionary ' + Post.objects.get(pk=post.pk).censor_version
+            )
+        enqueue.assert_not_called()
+
+    def test_load_with_replace_schedules_one_recensor(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        BannedWord.objects.bulk_create([BannedWord(word=f'слово{chr(0x430 + i)}') for i in range(5)])
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as words:
+            words.write('морковка\n')
+        self.addCleanup(os.remove, words.name)
+
+        with mock.patch('news.signals.enqueue') as signal_enqueue, \
+                mock.patch('news.management.commands.load_banned_words.enqueue') as command_enqueue, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            call_command('load_banned_words', words.name, '--replace', stdout=StringIO())
+        self.assertEqual(list(BannedWord.objects.values_list('word', flat=True)), ['морковка'])
+        signal_enqueue.assert_not_called()
+        command_enqueue.assert_called_once()
+        self.assertEqual(len(callbacks), 2)
+
+    def test_dictionary_change_is_detected_from_the_database(self):
+        from django.db.models import F
+
+        from .censor import _engine, censor_text
+        from .models import DictionaryVersion
+
+        self.assertEqual(censor_text('морковка'), 'морковка')
+        # Другой процесс поменял словарь: в кэше этого процесса ничего не менялось
+        BannedWord.objects.bulk_create([BannedWord(word='морковка')])
+        DictionaryVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        _engine.checked_at = None  # как будто прошло RELOAD_INTERVAL секунд
+        self.assertEqual(censor_text('морковка'), 'м*******')
+
 
 class NewsViewsTests(TestCase):
     def setUp(self):
@@ -47,3 +159,841 @@ class NewsViewsTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertIn(self.p1.created_at.strftime('%d.%m.%Y'), resp.content.decode('utf-8'))
 
+
+class MetricsEndpointTests(TestCase):
+    def test_metrics_exposes_request_histogram(self):
+        self.client.get('/no-such-page/')
+        resp = self.client.get(reverse('metrics'))
+        self.assertEqual(resp.status_code, 200)
+        body = resp.content.decode('utf-8')
+        self.assertIn('newsportal_http_request_duration_seconds_bucket', body)
+        self.assertIn('view="unresolved"', body)
+
+    def test_metrics_forbidden_for_remote_addr(self):
+        resp = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(resp.status_code, 403)
+
+    def test_cache_page_counts_only_get_and_head(self):
+        from unittest import mock
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from config.metrics import MetricsMiddleware
+
+        def get_response(request):
+            # Так FetchFromCacheMiddleware помечает ответ из кэша и любой не-GET запрос
+            request._cache_update_cache = False
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(get_response)
+        with mock.patch('config.metrics.CACHE_PAGE_REQUESTS') as counter:
+            middleware(RequestFactory().post('/news/'))
+            counter.labels.assert_not_called()
+            middleware(RequestFactory().head('/news/'))
+        counter.labels.assert_called_once_with('unresolved', 'hit')
+
+class ProfilingMiddlewareTests(TestCase):
+    def test_signed_header_dumps_profile(self):
+        from config.profiling import make_profile_token
+        resp = self.client.get('/no-such-page/', HTTP_X_PROFILE=make_profile_token())
+        self.assertIn('X-Profile-File', resp)
+        path = settings.PROFILES_DIR / resp['X-Profile-File']
+        self.assertTrue(path.exists())
+        path.unlink()
+
+    def test_bad_token_and_anonymous_param_are_ignored(self):
+        resp = self.client.get('/no-such-page/', HTTP_X_PROFILE='forged')
+        self.assertNotIn('X-Profile-File', resp)
+        resp = self.client.get('/no-such-page/?_profile=1')
+        self.assertNotIn('X-Profile-File', resp)
+
+
+class SlowQueryLogTests(TestCase):
+    def test_normalize_sql_collapses_literals_and_in_lists(self):
+        from config.slowlog import normalize_sql
+        sql = "SELECT *  FROM news_post WHERE id IN (%s, %s, %s) AND title = 'x''y' LIMIT 21"
+        self.assertEqual(normalize_sql(sql), "SELECT * FROM news_post WHERE id IN (...) AND title = ? LIMIT ?")
+
+    def test_wrapper_installed_on_connection(self):
+        from django.db import connection
+        from config.slowlog import slow_query_wrapper
+        connection.ensure_connection()
+        self.assertIn(slow_query_wrapper, connection.execute_wrappers)
+
+
+class RatingCounterTests(TestCase):
+    def test_like_and_dislike_update_rating_atomically(self):
+        author = Author.objects.create(user=User.objects.create_user('rated'))
+        post = Post.objects.create(author=author, post_type=Post.NEWS, title='T', text='t')
+        post.like()
+        post.like()
+        post.dislike()
+        self.assertEqual(post.rating, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.rating, 1)
+
+    def test_rating_change_sends_post_save_and_fails_for_deleted_rows(self):
+        from django.db.models.signals import post_save
+
+        author = Author.objects.create(user=User.objects.create_user('rated2'))
+        post = Post.objects.create(author=author, post_type=Post.NEWS, title='T', text='t')
+        received = []
+
+        def receiver(sender, update_fields, **kwargs):
+            received.append(update_fields)
+
+        post_save.connect(receiver, sender=Post)
+        self.addCleanup(post_save.disconnect, receiver, sender=Post)
+        post.like()
+        self.assertEqual(received, [frozenset(['rating'])])
+
+        Post.objects.filter(pk=post.pk).delete()
+        with self.assertRaises(Post.DoesNotExist):
+            post.dislike()
+
+
+class VoteViewsTests(TestCase):
+    def test_like_and_dislike_require_post_and_login(self):
+        user = User.objects.create_user('voter')
+        post = Post.objects.create(author=Author.objects.create(user=user), post_type=Post.ARTICLE, title='T', text='t')
+        like_url = reverse('news:post_like', args=[post.pk])
+        self.assertEqual(self.client.post(like_url).status_code, 302)  # на страницу входа
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(like_url).status_code, 405)
+        response = self.client.post(like_url)
+        self.assertRedirects(response, post.get_absolute_url(), fetch_redirect_response=False)
+        self.client.post(like_url)  # повторный голос не считается
+        post.refresh_from_db()
+        self.assertEqual(post.rating, 1)
+        self.client.post(reverse('news:post_dislike', args=[post.pk]))  # голос меняется на противоположный
+        post.refresh_from_db()
+        self.assertEqual(post.rating, -1)
+        self.assertEqual(post.votes.get(user=user).value, PostVote.DISLIKE)
+
+        self.client.force_login(User.objects.create_user('other'))
+        self.client.post(like_url)
+        post.refresh_from_db()
+        self.assertEqual(post.rating, 0)
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1'],
+    DATABASES={**settings.DATABASES, 'replica1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica1.sqlite3'}},
+)
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        from config.routers import PrimaryReplicaRouter, reset_pin
+        reset_pin()
+        self.addCleanup(reset_pin)
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_go_to_replica_until_first_write(self):
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(
+        DATABASE_REPLICAS=['replica1', 'replica2'],
+        DATABASES={
+            **settings.DATABASES,
+            'replica1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica1.sqlite3'},
+            'replica2': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica2.sqlite3'},
+        },
+    )
+    def test_replica_is_chosen_once_per_request(self):
+        from config.routers import reset_pin
+
+        self.assertEqual(len({self.router.db_for_read(Post) for _ in range(20)}), 1)
+        chosen = set()
+        for _ in range(30):
+            reset_pin()
+            chosen.add(self.router.db_for_read(Post))
+        self.assertEqual(chosen, {'replica1', 'replica2'})
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'news'))
+        self.assertTrue(self.router.allow_migrate('default', 'news'))
+
+    def test_middleware_pins_client_after_write(self):
+        from config.routers import PIN_COOKIE, ReplicaPinMiddleware
+        from django.test import RequestFactory
+
+        def write_view(request):
+            self.router.db_for_write(Post)
+            return HttpResponse()
+
+        def read_view(request):
+            return HttpResponse(self.router.db_for_read(Post))
+
+        response = ReplicaPinMiddleware(write_view)(RequestFactory().post('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(ReplicaPinMiddleware(read_view)(request).content, b'default')
+        self.assertEqual(ReplicaPinMiddleware(read_view)(RequestFactory().get('/')).content, b'replica1')
+
+
+TIERED_CACHES = {
+    'default': {
+        'BACKEND': 'config.cache.TieredCache',
+        'LOCATION': 'tiered-tests',
+        'OPTIONS': {'L2': 'l2', 'L1_MAX_ENTRIES': 2, 'LOCK_WAIT': 2},
+    },
+    'l2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-tests-l2'},
+}
+
+
+@override_settings(CACHES=TIERED_CACHES)
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        self.cache = caches['default']
+        self.l2 = caches['l2']
+        self.cache.clear()
+
+    def test_values_are_written_through_to_l2(self):
+        self.cache.set('k', {'a': 1})
+        self.assertEqual(self.cache.get('k'), {'a': 1})
+        self.assertEqual(self.l2.get('k').value, {'a': 1})
+        self.cache.delete('k')
+        self.assertIsNone(self.l2.get('k'))
+
+    def test_l1_returns_copies_and_evicts_lru(self):
+        self.cache.set('a', [1])
+        self.cache.get('a').append(2)
+        self.assertEqual(self.cache.get('a'), [1])
+        self.cache.set('b', 2.0)
+        self.cache.set('c', 3.0)
+        self.l2.clear()
+        self.assertEqual(self.cache.get('c'), 3.0)
+        self.assertEqual(self.cache.get('a', 'evicted'), 'evicted')
+
+    def test_incr_is_delegated_to_l2(self):
+        self.cache.add('counter', 0)
+        self.assertEqual(self.cache.incr('counter'), 1)
+        self.assertEqual(self.cache.get('counter'), 1)
+
+    def test_get_miss_does_not_block(self):
+        import time as _time
+
+        started = _time.monotonic()
+        for _ in range(3):
+            self.assertIsNone(self.cache.get('absent'))
+        self.assertEqual(self.cache.get_many(['absent', 'other']), {})
+        self.assertLess(_time.monotonic() - started, 0.5)
+
+    def test_concurrent_miss_is_regenerated_once(self):
+        import threading
+        import time as _time
+        from django.core.cache import caches
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            _time.sleep(0.2)
+            return 'value'
+
+        def worker():
+            results.append(caches['default'].get_or_set('hot', compute))
+
+        results = []
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def test_failed_fill_releases_lock(self):
+        import time as _time
+
+        def broken():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_set('hot', broken)
+        started = _time.monotonic()
+        self.assertEqual(self.cache.get_or_set('hot', lambda: 'value'), 'value')
+        self.assertLess(_time.monotonic() - started, 0.5)
+
+
+class ExportPostsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('exporter')
+        author = Author.objects.create(user=self.user)
+        politics = Category.objects.create(name='Политика')
+        sport = Category.objects.create(name='Спорт')
+        self.posts = [
+            Post.objects.create(author=author, post_type=Post.NEWS, title=f'Новость {i}', text='текст', rating=i)
+            for i in range(3)
+        ]
+        PostCategory.objects.create(post=self.posts[0], category=politics)
+        PostCategory.objects.create(post=self.posts[0], category=sport)
+        Post.objects.create(author=author, post_type=Post.ARTICLE, title='Статья', text='текст')
+
+    def test_categories_are_loaded_per_chunk(self):
+        from .export import export_queryset, iter_rows
+
+        with self.assertNumQueries(3):  # посты + категории для двух пачек
+            rows = list(iter_rows(export_queryset(Post.NEWS), chunk_size=2))
+        self.assertEqual([row['id'] for row in rows], [post.pk for post in self.posts])
+        self.assertEqual(rows[0]['categories'], ['Политика', 'Спорт'])
+        self.assertEqual(rows[0]['author'], 'exporter')
+        self.assertEqual(rows[2]['rating'], 2)
+
+    def test_endpoint_streams_ndjson_and_csv(self):
+        import json
+
+        self.assertEqual(self.client.get(reverse('news:export_posts')).status_code, 302)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('news:export_posts'), {'type': Post.NEWS})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 3)
+
+        response = self.client.get(reverse('news:export_posts'), {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,post_type,created_at,author,rating,categories,title,text')
+        self.assertEqual(len(lines), 5)
+        self.assertIn('Политика|Спорт', lines[1])
+
+        self.assertEqual(self.client.get(reverse('news:export_posts'), {'from': 'вчера'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('news:export_posts'), {'from': '2024-02-30'}).status_code, 400)
+
+    def test_date_bounds_are_inclusive_days(self):
+        from datetime import date, datetime
+
+        from django.utils import timezone
+
+        from .export import export_queryset
+
+        Post.objects.filter(pk=self.posts[0].pk).update(created_at=timezone.make_aware(datetime(2024, 5, 1, 0, 0)))
+        Post.objects.filter(pk=self.posts[1].pk).update(created_at=timezone.make_aware(datetime(2024, 5, 2, 23, 59)))
+        Post.objects.filter(pk=self.posts[2].pk).update(created_at=timezone.make_aware(datetime(2024, 5, 3, 0, 0)))
+        queryset = export_queryset(Post.NEWS, date(2024, 5, 1), date(2024, 5, 2))
+        self.assertEqual(list(queryset.values_list('pk', flat=True)), [self.posts[0].pk, self.posts[1].pk])
+        self.assertNotIn('django_datetime_cast_date', str(queryset.query))
+
+
+class ImportPostsTests(TestCase):
+    def test_import_creates_posts_categories_and_one_notification(self):
+        import json
+        import os
+        import tempfile
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        Author.objects.create(user=User.objects.create_user('partner'))
+        Category.objects.create(name='Спорт')
+        rows = [
+            {'title': 'Матч', 'text': 'текст', 'author': 'partner', 'categories': ['Спорт', 'Новая'],
+             'created_at': '2024-05-01T10:00:00+00:00'},
+            {'title': 'Статья', 'text': 'текст', 'author': 'partner', 'post_type': Post.ARTICLE, 'categories': 'Новая'},
+            {'title': 'Чужая', 'text': 'текст', 'author': 'unknown'},
+            {'title': 'Тип', 'text': 'текст', 'author': 'partner', 'post_type': 'XX'},
+            {'title': 'Д' * 256, 'text': 'текст', 'author': 'partner'},
+            {'title': 'Рейтинг', 'text': 'текст', 'author': 'partner', 'rating': 'много'},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False, encoding='utf-8') as feed:
+            feed.write('\n'.join(json.dumps(row) for row in rows) + '\nне json\n')
+        self.addCleanup(os.remove, feed.name)
+
+        stdout = StringIO()
+        with mock.patch('news.management.commands.import_posts.enqueue') as enqueue:
+            call_command('import_posts', feed.name, '--batch-size', '1', stdout=stdout, stderr=StringIO())
+        # auto_now_add восстановлен после импорта
+        self.assertTrue(Post._meta.get_field('created_at').auto_now_add)
+
+        match = Post.objects.get(title='Матч')
+        self.assertEqual(match.created_at.year, 2024)
+        self.assertEqual(sorted(match.categories.values_list('name', flat=True)), ['Новая', 'Спорт'])
+        self.assertEqual(Post.objects.get(title='Статья').post_type, Post.ARTICLE)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertIn('пропущено строк: 5', stdout.getvalue())
+        enqueue.assert_called_once()
+        first, last = Post.objects.order_by('pk').values_list('pk', flat=True)
+        self.assertEqual(enqueue.call_args.kwargs['args'][0], [[first, last]])
+
+    def test_notification_reads_posts_by_id_ranges(self):
+        from unittest import mock
+
+        from django.core import mail
+
+        from .tasks import notify_imported_posts
+
+        author = Author.objects.create(user=User.objects.create_user('partner'))
+        sport = Category.objects.create(name='Спорт')
+        sport.subscribers.add(User.objects.create_user('fan', 'fan@example.com'))
+        posts = [Post.objects.create(author=author, title=f'Матч {i}', text='текст') for i in range(3)]
+        for post in posts:
+            PostCategory.objects.create(post=post, category=sport)
+
+        with mock.patch('news.tasks.render_to_string', return_value=''):
+            notify_imported_posts([[posts[0].pk, posts[1].pk]])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Матч 1', mail.outbox[0].body)
+        self.assertNotIn('Матч 2', mail.outbox[0].body)
+
+    def test_id_ranges(self):
+        from .management.commands.import_posts import id_ranges
+
+        self.assertEqual(id_ranges([8, 1, 2, 3, 7]), [[1, 3], [7, 8]])
+        self.assertEqual(id_ranges([]), [])
+
+
+class CreateTestDataTests(TestCase):
+    def test_generates_bulk_data_without_signals(self):
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        from .sitemaps import post_month
+
+        command = 'news.management.commands.create_test_data'
+        with mock.patch('news.signals.enqueue') as enqueue, \
+                mock.patch(f'{command}.touch_sitemaps') as touch_sitemaps, \
+                mock.patch(f'{command}.touch_feeds') as touch_feeds:
+            call_command('create_test_data', users=3, categories=4, posts=40, batch_size=15, stdout=StringIO())
+            call_command('create_test_data', users=3, categories=4, posts=5, stdout=StringIO())
+        enqueue.assert_not_called()
+        # Сигналы не срабатывают: версии лент и карты сайта обновляются после каждой пачки
+        self.assertEqual(touch_sitemaps.call_count, 4)
+        months = set().union(*(call.args[0] for call in touch_sitemaps.call_args_list))
+        self.assertEqual(months, {post_month(post) for post in Post.objects.all()})
+        scopes = set().union(*(call.args[0] for call in touch_feeds.call_args_list))
+        self.assertTrue({'type:NW', 'type:AR'} <= scopes)
+        self.assertEqual(User.objects.filter(username__startswith='testuser').count(), 3)
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertEqual(Category.objects.count(), 4)
+        self.assertEqual(Post.objects.count(), 45)
+        self.assertFalse(Post.objects.filter(categories=None).exists())
+        self.assertTrue(User.objects.get(username='testuser1').check_password('testpass123'))
+
+
+class BenchmarkHarnessTests(TestCase):
+    def test_measure_request_and_baseline_comparison(self):
+        from .benchmarking import compare_to_baseline, measure_request, news_url_targets
+
+        author = Author.objects.create(user=User.objects.create_user('bench'))
+        Post.objects.create(author=author, post_type=Post.NEWS, title='T', text='t')
+        self.client.force_login(author.user)
+        stats = measure_request(self.client, reverse('news:export_posts'), iterations=3, warmup=1)
+        self.assertEqual(stats['status'], 200)
+        self.assertEqual(stats['count'], 3)
+        self.assertGreater(stats['bytes'], 0)
+        self.assertGreater(stats['queries'], 0)
+
+        self.assertIn(('news_detail', reverse('news:news_detail', args=[Post.objects.get().pk])), news_url_targets())
+
+        baseline = {'small': {'export_posts': {**stats, 'queries': stats['queries'] - 1}}}
+        regressions = compare_to_baseline({'small': {'export_posts': stats}}, baseline)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('SQL', regressions[0])
+        self.assertEqual(compare_to_baseline({'small': {'export_posts': stats}}, {'small': {}}), [])
+
+    def test_percentile_is_nearest_rank(self):
+        from .benchmarking import percentile
+
+        self.assertEqual(percentile([1, 2], 50), 1)
+        self.assertEqual(percentile(list(range(1, 101)), 7), 7)
+        self.assertEqual(percentile(list(range(1, 21)), 95), 19)
+        self.assertEqual(percentile([5], 99), 5)
+
+
+class EmailBenchmarkTests(TestCase):
+    def test_phase_timer_excludes_nested_phases_and_backend_times_mime(self):
+        import time as _time
+
+        from django.core import mail
+
+        from .benchmarking import PhaseTimer, TimingEmailBackend
+
+        timer = PhaseTimer()
+        with timer.phase('render'):
+            with timer.phase('sql'):
+                _time.sleep(0.02)
+        self.assertLess(timer.totals['render'], 0.02)
+        self.assertGreaterEqual(timer.totals['sql'], 0.02)
+
+        TimingEmailBackend.timer = timer
+        self.addCleanup(setattr, TimingEmailBackend, 'timer', None)
+        with self.settings(EMAIL_BACKEND='news.benchmarking.TimingEmailBackend'):
+            mail.send_mail('Тема', 'Текст', 'from@example.com', ['to@example.com'])
+        self.assertEqual(timer.counts['mime'], 1)
+        self.assertEqual(timer.counts['delivery'], 1)
+
+
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        author = Author.objects.create(user=User.objects.create_user('async_author'))
+        self.posts = [
+            Post.objects.create(author=author, post_type=Post.NEWS, title=f'N{i}', text='t') for i in range(12)
+        ]
+        self.article = Post.objects.create(author=author, post_type=Post.ARTICLE, title='A', text='t')
+
+    async def test_list_paginates_and_serves_page_from_cache(self):
+        from django.test import AsyncRequestFactory
+
+        from . import async_views
+
+        view = async_views.NewsListView.as_view()
+        response = await view(AsyncRequestFactory().get('/news/', {'page': 'last'}))
+        context = response.context_data
+        self.assertEqual(context['page_obj'].number, 2)
+        self.assertEqual(context['paginator'].num_pages, 2)
+        self.assertTrue(context['is_paginated'])
+        self.assertEqual(context['page_numbers_window'], [1, 2])
+        self.assertEqual([post.title for post in context['posts']], ['N1', 'N0'])
+
+        await Post.objects.filter(post_type=Post.NEWS).adelete()
+        response = await view(AsyncRequestFactory().get('/news/', {'page': 'last'}))
+        self.assertEqual([post.title for post in response.context_data['posts']], ['N1', 'N0'])
+
+    async def test_concurrent_misses_fetch_page_once(self):
+        import asyncio
+        from unittest import mock
+
+        from django.test import AsyncRequestFactory
+
+        from . import async_views
+
+        view = async_views.NewsListView.as_view()
+        fetch = async_views.NewsListView.fetch
+        calls = []
+
+        async def slow_fetch(self, page):
+            calls.append(page)
+            await asyncio.sleep(0.05)
+            return await fetch(self, page)
+
+        with mock.patch.object(async_views.NewsListView, 'fetch', slow_fetch):
+            responses = await asyncio.gather(*[view(AsyncRequestFactory().get('/news/')) for _ in range(3)])
+        self.assertEqual(calls, [1])
+        for response in responses:
+            self.assertEqual(len(response.context_data['posts']), 10)
+
+    async def test_detail_and_invalid_page_return_404(self):
+        from django.http import Http404
+        from django.test import AsyncRequestFactory
+
+        from . import async_views
+
+        request = AsyncRequestFactory().get('/')
+        response = await async_views.ArticleDetailView.as_view()(request, pk=self.article.pk)
+        self.assertEqual(response.context_data['post'].author.user.username, 'async_author')
+        with self.assertRaises(Http404):
+            await async_views.NewsDetailView.as_view()(request, pk=self.article.pk)
+        with self.assertRaises(Http404):
+            await async_views.NewsListView.as_view()(AsyncRequestFactory().get('/', {'page': 'x'}))
+
+
+class PostEventsTests(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(user=User.objects.create_user('sse_author'))
+        self.sport = Category.objects.create(name='Спорт')
+
+    def test_event_is_published_on_commit_with_categories(self):
+        from unittest import mock
+
+        from . import events
+
+        broker = mock.Mock()
+        with mock.patch.object(events, 'get_broker', return_value=broker), \
+                self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.author, post_type=Post.NEWS, title='Редиска забила', text='t')
+            post.categories.add(self.sport)
+        channels, event = broker.publish.call_args.args
+        self.assertEqual(channels, ['posts', 'posts:NW', f'category:{self.sport.pk}'])
+        self.assertEqual(event['id'], post.pk)
+        self.assertEqual(event['title'], 'Р****** забила')
+        self.assertEqual(event['categories'], [self.sport.pk])
+        self.assertNotIn('text', event)
+
+    async def test_stream_filters_by_type_and_replays_missed_posts(self):
+        from asgiref.sync import sync_to_async
+
+        from .events import get_broker, post_channels
+
+        old = await sync_to_async(Post.objects.create)(author=self.author, post_type=Post.NEWS, title='Старая', text='t')
+        response = await self.async_client.get(
+            reverse('news:post_events'), {'category': self.sport.pk, 'type': Post.NEWS},
+            headers={'Last-Event-ID': str(old.pk - 1)},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        await sync_to_async(old.categories.add)(self.sport)
+        self.assertIn(f'id: {old.pk}'.encode(), await anext(stream))
+
+        channels = post_channels(Post.ARTICLE, [self.sport.pk])
+        get_broker().publish(channels, {'id': old.pk + 1, 'type': Post.ARTICLE})
+        get_broker().publish(post_channels(Post.NEWS, [self.sport.pk]), {'id': old.pk + 2, 'type': Post.NEWS})
+        self.assertIn(f'id: {old.pk + 2}'.encode(), await anext(stream))
+        await stream.aclose()
+
+    def test_malformed_redis_message_is_skipped(self):
+        import json
+        from unittest import mock
+
+        from .events import RedisBroker
+
+        broker = RedisBroker('redis://localhost:6379/15')
+        with mock.patch.object(broker, 'dispatch') as dispatch, self.assertLogs('news.events', 'WARNING'):
+            for raw in ('не json', '{}', json.dumps({'channels': ['posts'], 'event': {'type': 'NW'}})):
+                broker._handle(raw)
+            dispatch.assert_not_called()
+        with mock.patch.object(broker, 'dispatch') as dispatch:
+            broker._handle(json.dumps({'channels': ['posts'], 'event': {'id': 1, 'type': 'NW'}}))
+        dispatch.assert_called_once_with(['posts'], {'id': 1, 'type': 'NW'})
+
+    def test_wsgi_request_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('news:post_events')).status_code, 501)
+
+
+class JsonApiTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(user=User.objects.create_user('api_author'))
+        self.sport = Category.objects.create(name='Спорт')
+        self.posts = []
+        for i in range(5):
+            post = Post.objects.create(author=author, post_type=Post.NEWS, title=f'N{i}', text='длинный текст')
+            post.categories.add(self.sport)
+            self.posts.append(post)
+
+    def test_query_budget_and_sparse_fieldsets(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        # Посты и одна загрузка категорий на страницу, без N+1
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('news:api_posts')).json()
+        self.assertEqual(data['results'][0]['author'], 'api_author')
+        self.assertEqual(data['results'][0]['categories'], [{'id': self.sport.pk, 'name': 'Спорт'}])
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('news:api_posts'), {'fields': 'id,title'}).json()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"text"', queries[0]['sql'])
+        self.assertNotIn('auth_user', queries[0]['sql'])
+        self.assertEqual(data['results'][0], {'id': self.posts[-1].pk, 'title': 'N4'})
+
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('news:api_categories'), {'fields': 'name,posts_count'}).json()
+        self.assertEqual(data['results'], [{'name': 'Спорт', 'posts_count': 5}])
+
+        self.assertEqual(self.client.get(reverse('news:api_posts'), {'fields': 'secret'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('news:api_posts'), {'cursor': '!!'}).status_code, 400)
+
+    def test_title_and_text_are_censored(self):
+        post = self.posts[0]
+        post.title, post.text = 'Редиска тут', 'и тут редиска'
+        post.save()
+        Comment.objects.create(post=post, user=post.author.user, text='редиска!')
+        url = reverse('news:api_post', args=[post.pk])
+        self.assertEqual(self.client.get(url).json()['title'], post.display_title)
+        self.assertEqual(self.client.get(url).json()['text'], 'и тут р******')
+
+        # Строка без сохранённой копии (bulk_create до пересчёта)
+        Post.objects.filter(pk=post.pk).update(censor_version='', censored_title='')
+        self.assertEqual(self.client.get(url, {'fields': 'title'}).json()['title'], 'Р****** тут')
+
+        comments = self.client.get(reverse('news:api_comments'), {'post': post.pk}).json()['results']
+        self.assertEqual([comment['text'] for comment in comments], ['р******!'])
+
+    def test_cursor_pagination_and_etag(self):
+        url = reverse('news:api_posts')
+        titles = []
+        next_url = f'{url}?fields=title&limit=2'
+        while next_url:
+            response = self.client.get(next_url)
+            titles += [item['title'] for item in response.json()['results']]
+            next_url = response.json()['next']
+        self.assertEqual(titles, ['N4', 'N3', 'N2', 'N1', 'N0'])
+
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        self.posts[0].like()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 200)
+
+
+class FeedsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = Author.objects.create(user=User.objects.create_user('feed_author'))
+        self.sport = Category.objects.create(name='Спорт')
+
+    def create_post(self, title, text, days_ago=0):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.author, post_type=Post.NEWS, title=title, text=text)
+            post.categories.add(self.sport)
+        Post.objects.filter(pk=post.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return post
+
+    def test_old_entries_do_not_select_full_text(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.create_post('Свежая', 'новый ' * 50)
+        self.create_post('Старая', 'старый ' * 50, days_ago=30)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('news:category_rss', args=[self.sport.pk]))
+        content = response.content.decode()
+        self.assertIn('новый ' * 49, content)
+        self.assertIn(('старый ' * 50)[:124] + '...', content)
+        post_query = next(q['sql'] for q in queries if 'CASE WHEN' in q['sql'])
+        self.assertIn('SUBSTR', post_query.upper())
+
+    def test_feed_is_cached_until_a_post_in_scope_changes(self):
+        post = self.create_post('Первая', 'текст')
+        url = reverse('news:feed_news_atom')
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']}).status_code, 304
+        )
+
+        # Статья не входит в ленту новостей: её версия не меняется
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.author, post_type=Post.ARTICLE, title='Статья', text='т')
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.title = 'Исправленная'
+            post.save()
+        updated = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(updated.status_code, 200)
+        self.assertIn('Исправленная', updated.content.decode())
+
+    def test_feed_requests_do_not_wait_on_tiered_cache(self):
+        import time as _time
+
+        from django.core.cache import cache
+
+        from .feeds import ALL_SCOPE, _version_key
+
+        self.create_post('Первая', 'текст')
+        url = reverse('news:feed_news_atom')
+        with self.settings(CACHES=TIERED_CACHES):
+            started = _time.monotonic()
+            response = self.client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).content, response.content)
+            self.assertLess(_time.monotonic() - started, 1)
+            # Версию 'all' пишет только импорт: она заводится при первом чтении
+            self.assertEqual(cache.get(_version_key(ALL_SCOPE)), 0)
+            cache.clear()
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = Author.objects.create(user=User.objects.create_user('map_author'))
+
+    def create_post(self, created_at=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.author, post_type=Post.NEWS, title='T', text='t')
+        if created_at:
+            Post.objects.filter(pk=post.pk).update(created_at=created_at)
+        return post
+
+    def test_index_lists_months_and_only_current_month_is_rebuilt(self):
+        from datetime import datetime
+        from unittest import mock
+
+        from django.utils import timezone
+
+        from . import sitemaps
+
+        old = self.create_post(timezone.make_aware(datetime(2020, 3, 15)))
+        self.create_post()
+        index = self.client.get('/sitemap.xml').content.decode()
+        self.assertIn('/sitemap-2020-03-1.xml', index)
+        current = timezone.localtime()
+        self.assertIn(f'/sitemap-{current.year}-{current.month:02d}-1.xml', index)
+
+        closed = self.client.get('/sitemap-2020-03-1.xml')
+        self.assertIn(f'/news/{old.pk}/', closed.content.decode())
+        self.assertIn('<lastmod>2020-03-15</lastmod>', closed.content.decode())
+
+        # Новый пост меняет только текущий месяц: закрытый и статистика закрытых месяцев - из кэша
+        self.create_post()
+        with self.assertNumQueries(1):
+            index = self.client.get('/sitemap.xml').content.decode()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/sitemap-2020-03-1.xml').content, closed.content)
+
+        with mock.patch.object(sitemaps, 'SITEMAP_LIMIT', 1):
+            self.assertEqual(self.client.get('/sitemap-2020-03-2.xml').status_code, 404)
+        self.assertEqual(self.client.get('/sitemap-2020-13-1.xml').status_code, 404)
+
+
+class PublicationLimitTests(TestCase):
+    def test_publication_limit(self):
+        from datetime import timedelta
+        from unittest import mock
+
+        from django.contrib.auth.models import Permission
+        from django.core.cache import cache
+        from django.utils import timezone
+
+        from .views import NewsCreateView
+
+        user = User.objects.create_user('publisher')
+        user.user_permissions.add(Permission.objects.get(codename='add_post'))
+        self.client.force_login(user)
+        url = reverse('news:news_create')
+        with mock.patch('news.signals.enqueue'), \
+                mock.patch.object(NewsCreateView, 'form_invalid', return_value=HttpResponse('limit')) as invalid:
+            for i in range(settings.POST_DAILY_LIMIT + 1):
+                self.client.post(url, {'title': f'Пост {i}', 'text': 'текст'})
+            self.assertEqual(Post.objects.filter(author__user=user).count(), settings.POST_DAILY_LIMIT)
+            invalid.assert_called_once()
+
+            # Лимит - за скользящие сутки по БД: посты старше суток не считаются, кэш не участвует
+            Post.objects.filter(author__user=user).update(created_at=timezone.now() - timedelta(hours=25))
+            cache.clear()
+            self.client.post(url, {'title': 'Через сутки', 'text': 'текст'})
+        self.assertTrue(Post.objects.filter(title='Через сутки').exists())
+
+
+class WeeklyDigestTests(TestCase):
+    def test_category_digests_are_queued_through_enqueue(self):
+        from unittest import mock
+
+        from .tasks import send_category_digest, send_weekly_digest
+
+        author = Author.objects.create(user=User.objects.create_user('digest_author'))
+        sport = Category.objects.create(name='Спорт')
+        with mock.patch('news.signals.enqueue'):
+            post = Post.objects.create(author=author, post_type=Post.NEWS, title='Матч', text='текст')
+            post.categories.add(sport)
+
+        with mock.patch('news.tasks.enqueue') as enqueue:
+            self.assertEqual(send_weekly_digest(), 'Queued weekly digest for 1 categories')
+        task, = enqueue.call_args.args
+        self.assertIs(task, send_category_digest)
+        self.assertEqual(enqueue.call_args.kwargs['args'][0], sport.pk)
@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.urls import path
+from .api import categories_api, comments_api, post_api, posts_api
+from .feeds import ArticlesAtomFeed, ArticlesFeed, CategoryAtomFeed, CategoryFeed, NewsAtomFeed, NewsFeed
 from .views import (
     NewsListView, NewsDetailView, NewsSearchView,
     NewsCreateView, NewsUpdateView, NewsDeleteView,
     ArticleListView, ArticleDetailView,
     ArticleCreateView, ArticleUpdateView, ArticleDeleteView,
     CategoryListView, CategoryDetailView, subscribe_category, unsubscribe_category,
+    like_post, dislike_post, export_posts, post_events,
 )
 
+if settings.ASYNC_VIEWS:
+    # Под ASGI страницы только для чтения обслуживают async-версии
+    from .async_views import NewsListView, NewsDetailView, ArticleListView, ArticleDetailView, CategoryListView
+
 app_name = 'news'
 
 urlpatterns = [
@@ -30,6 +38,30 @@ urlpatterns = [
     path('category/<int:pk>/', CategoryDetailView.as_view(), name='category_detail'),
     path('category/<int:pk>/subscribe/', subscribe_category, name='category_subscribe'),
     path('category/<int:pk>/unsubscribe/', unsubscribe_category, name='category_unsubscribe'),
+
+    # Оценки постов (новостей и статей)
+    path('post/<int:pk>/like/', like_post, name='post_like'),
+    path('post/<int:pk>/dislike/', dislike_post, name='post_dislike'),
+
+    # Выгрузка
+    path('export/', export_posts, name='export_posts'),
+
+    # Поток новых постов (SSE, под ASGI)
+    path('events/', post_events, name='post_events'),
+
+    # RSS и Atom
+    path('feeds/news/rss/', NewsFeed(), name='feed_news_rss'),
+    path('feeds/news/atom/', NewsAtomFeed(), name='feed_news_atom'),
+    path('feeds/articles/rss/', ArticlesFeed(), name='feed_articles_rss'),
+    path('feeds/articles/atom/', ArticlesAtomFeed(), name='feed_articles_atom'),
+    path('category/<int:pk>/rss/', CategoryFeed(), name='category_rss'),
+    path('category/<int:pk>/atom/', CategoryAtomFeed(), name='category_atom'),
+
+    # JSON API только для чтения
+    path('api/posts/', posts_api, name='api_posts'),
+    path('api/posts/<int:pk>/', post_api, name='api_post'),
+    path('api/categories/', categories_api, name='api_categories'),
+    path('api/comments/', comments_api, name='api_comments'),
 ]
 
 
@@ -5,14 +5,24 @@ from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMix
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect
-from django.utils import timezone
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db.models import Count
-from django.views.decorators.cache import cache_page
+from config.cache import cache_page
 from django.utils.decorators import method_decorator
-from .models import Post, Category, Author
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.utils.dateparse import parse_date
+from django.utils import timezone
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from .models import Post, PostVote, Category, Author
 from .forms import PostForm
 from .filters import PostFilter
+from .events import event_stream, post_event
+from .export import CONTENT_TYPES, FORMATS, export_queryset, iter_export, iter_rows
 
 
 class PaginationWindowMixin:
@@ -50,16 +60,20 @@ class PaginationWindowMixin:
 class PostCreateMixin:
     """Mixin для создания постов с проверкой лимита публикаций."""
     def form_valid(self, form):
-        # Проверяем лимит публикаций (не более 3 в сутки)
-        today = timezone.now().date()
-        posts_today = Post.objects.filter(
-            author__user=self.request.user,
-            created_at__date=today
-        ).count()
-        if posts_today >= 3:
-            form.add_error(None, ValidationError('Лимит публикаций: не более 3 в сутки.'))
-            return self.form_invalid(form)
-        
+        # Проверка и запись в одной транзакции под блокировкой строки автора (на SQLite
+        # транзакции IMMEDIATE): одновременные отправки одного пользователя считаются по очереди.
+        # Событие о новом посте (on_commit) уходит уже с категориями
+        with transaction.atomic():
+            author, created = Author.objects.get_or_create(user=self.request.user)
+            author = Author.objects.select_for_update().get(pk=author.pk)
+            # Посты за скользящие сутки - диапазон по индексу (author, created_at)
+            published = Post.objects.filter(author=author, created_at__gte=timezone.now() - timedelta(days=1)).count()
+            if published >= settings.POST_DAILY_LIMIT:
+                form.add_error(None, ValidationError(f'Лимит публикаций: не более {settings.POST_DAILY_LIMIT} в сутки.'))
+                return self.form_invalid(form)
+            return self._publish(form, author)
+
+    def _publish(self, form, author):
         # Если instance уже создан в дочернем классе, используем его
         if hasattr(self, '_instance'):
             instance = self._instance
@@ -68,7 +82,6 @@ class PostCreateMixin:
         
         # Автоматически назначаем автора из текущего пользователя
         if not hasattr(instance, 'author') or instance.author is None:
-            author, created = Author.objects.get_or_create(user=self.request.user)
             instance.author = author
         
         instance.save()
@@ -260,3 +273,89 @@ def unsubscribe_category(request, pk):
     return redirect(category.get_absolute_url())
 
 
+@login_required
+@require_POST
+def like_post(request, pk):
+    post = get_object_or_404(Post, pk=pk)
+    post.vote(request.user, PostVote.LIKE)
+    return redirect(post.get_absolute_url())
+
+
+@login_required
+@require_POST
+def dislike_post(request, pk):
+    post = get_object_or_404(Post, pk=pk)
+    post.vote(request.user, PostVote.DISLIKE)
+    return redirect(post.get_absolute_url())
+
+
+@login_required
+def export_posts(request):
+    """
+    Потоковая выгрузка постов: /news/export/?format=ndjson|csv&type=NW|AR&from=ГГГГ-ММ-ДД&to=ГГГГ-ММ-ДД
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    post_type = request.GET.get('type') or None
+    if fmt not in FORMATS or post_type not in (None, Post.NEWS, Post.ARTICLE):
+        return HttpResponseBadRequest('Неверный формат или тип поста')
+    dates = {}
+    for param in ('from', 'to'):
+        value = request.GET.get(param)
+        if value:
+            try:
+                dates[param] = parse_date(value)
+            except ValueError:
+                # Формат верный, но такой даты нет (2024-02-30)
+                dates[param] = None
+            if dates[param] is None:
+                return HttpResponseBadRequest(f'Неверная дата в параметре {param}')
+    queryset = export_queryset(post_type, dates.get('from'), dates.get('to'))
+    response = StreamingHttpResponse(iter_export(fmt, iter_rows(queryset)), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="posts.{fmt}"'
+    return response
+
+
+MISSED_EVENTS_LIMIT = 50
+
+
+async def post_events(request):
+    """
+    SSE-поток новых постов: /news/events/?type=NW|AR&category=<id>[&category=<id>...]
+    Без параметров - все посты. После переподключения (заголовок Last-Event-ID)
+    сначала досылаются пропущенные посты. Работает только под ASGI.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Поток событий доступен только под ASGI-сервером', status=501,
+                            content_type='text/plain; charset=utf-8')
+    post_type = request.GET.get('type') or None
+    try:
+        categories = sorted({int(pk) for pk in request.GET.getlist('category')})
+        last_id = request.headers.get('Last-Event-ID')
+        last_id = int(last_id) if last_id is not None else None
+    except ValueError:
+        return HttpResponseBadRequest('Неверный id категории или Last-Event-ID')
+    if post_type not in (None, Post.NEWS, Post.ARTICLE):
+        return HttpResponseBadRequest('Неверный тип поста')
+
+    if categories:
+        channels = [f'category:{pk}' for pk in categories]
+    else:
+        channels = [f'posts:{post_type}'] if post_type else ['posts']
+
+    async def missed():
+        queryset = Post.objects.filter(pk__gt=last_id).prefetch_related('categories').order_by('pk')
+        if post_type:
+            queryset = queryset.filter(post_type=post_type)
+        if categories:
+            queryset = queryset.filter(categories__in=categories).distinct()
+        posts = [post async for post in queryset[:MISSED_EVENTS_LIMIT]]
+        # display_title может обратиться к БД за словарём цензуры - в потоке
+        return await sync_to_async(lambda: [
+            post_event(post, [category.pk for category in post.categories.all()]) for post in posts
+        ])()
+
+    stream = event_stream(channels, post_type, missed if last_id is not None else None)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx не должен буферизовать поток
+    return response
@@ -1,11 +1,13 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
 
+from sign.backends import is_author
+
 
 class IndexView(LoginRequiredMixin, TemplateView):
     template_name = 'protect/index.html'
     
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx['is_not_author'] = not self.request.user.groups.filter(name='authors').exists()
+        ctx['is_not_author'] = not is_author(self.request.user)
         return ctx
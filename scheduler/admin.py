@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import SpooledTask
 
-# Register your models here.
+
+@admin.register(SpooledTask)
+class SpooledTaskAdmin(admin.ModelAdmin):
+    list_display = ("task_name", "created_at", "attempts", "failed")
+    list_filter = ("failed", "task_name")
@@ -0,0 +1,23 @@
+"""
+Management command для переотправки задач из спула в брокер Celery.
+Использование: python manage.py replay_spool [--batch-size 500]
+"""
+from django.core.management.base import BaseCommand
+
+from scheduler.models import SpooledTask
+from scheduler.queue import replay_spool
+
+
+class Command(BaseCommand):
+    help = "Переотправляет в брокер задачи, отложенные при его недоступности"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Размер пачки (по умолчанию CELERY_SPOOL_REPLAY_BATCH)')
+
+    def handle(self, *args, **options):
+        replayed = replay_spool(options['batch_size'])
+        left = SpooledTask.objects.filter(failed=False).count()
+        failed = SpooledTask.objects.filter(failed=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Переотправлено задач: {replayed}, осталось в спуле: {left}, с ошибкой (failed): {failed}'
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spooledtask',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='spooledtask',
+            name='failed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
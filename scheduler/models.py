@@ -1,3 +1,25 @@
 from django.db import models
 
-# Create your models here.
+
+class SpooledTask(models.Model):
+    """
+    Задача Celery, которую не удалось отправить в брокер (брокер недоступен
+    или открыт circuit breaker). Переотправляется scheduler.tasks.replay_spooled_tasks.
+    """
+    task_name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    options = models.JSONField(default=dict)  # queue, priority, countdown и т.п.
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Задача исчерпала CELERY_SPOOL_MAX_ATTEMPTS и больше не переотправляется
+    failed = models.BooleanField(default=False)
+    # Пачка захвачена воркером до этого момента (см. queue.replay_spool)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self) -> str:
+        return f"{self.task_name}({self.args}, {self.kwargs})"
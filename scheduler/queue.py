@@ -0,0 +1,170 @@
+"""
+Отправка задач в Celery, не зависящая от состояния брокера.
+
+enqueue() публикует задачу с коротким таймаутом подключения и без повторов.
+Если брокер недоступен, задача сохраняется в таблицу SpooledTask, а circuit
+breaker на CELERY_BREAKER_RESET_TIMEOUT секунд перестаёт обращаться к брокеру -
+следующие задачи сразу уходят в спул. Когда брокер снова принимает задачи,
+спул переотправляется задачей replay_spooled_tasks (а также по расписанию
+Celery Beat и командой manage.py replay_spool). Задача, которую не удалось
+отправить CELERY_SPOOL_MAX_ATTEMPTS раз, помечается failed и остаётся в таблице
+для разбора вручную.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from config.db import supports_skip_locked
+from .models import SpooledTask
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    closed -> (failure_threshold ошибок подряд) -> open -> (reset_timeout) ->
+    half-open: пропускает одну пробную отправку; успех закрывает, ошибка снова открывает.
+    """
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # half-open: пропускаем одного, остальные ждут следующего окна
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> bool:
+        """Возвращает True, если breaker был открыт (брокер только что восстановился)."""
+        with self._lock:
+            recovered = self.opened_at is not None
+            self.failures = 0
+            self.opened_at = None
+            return recovered
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(settings.CELERY_BREAKER_FAILURE_THRESHOLD, settings.CELERY_BREAKER_RESET_TIMEOUT)
+
+
+def spool(task_name, args=(), kwargs=None, options=None, error=''):
+    return SpooledTask.objects.create(
+        task_name=task_name, args=list(args), kwargs=kwargs or {}, options=options or {}, last_error=error
+    )
+
+
+def enqueue(task, args=(), kwargs=None, **options):
+    """
+    Аналог task.apply_async(args, kwargs, **options), который не блокирует
+    вызывающего при недоступном брокере. Возвращает AsyncResult или None,
+    если задача отложена в спул. options должны сериализоваться в JSON.
+    """
+    error = 'circuit breaker open'
+    if breaker.allow():
+        try:
+            result = task.apply_async(args, kwargs, retry=False, **options)
+        except Exception as exc:
+            breaker.record_failure()
+            error = repr(exc)
+            logger.warning("Брокер недоступен, задача %s отложена в спул: %s", task.name, exc)
+        else:
+            if breaker.record_success():
+                _schedule_replay()
+            return result
+    spool(task.name, args, kwargs, options, error)
+    return None
+
+
+def _schedule_replay():
+    if not SpooledTask.objects.filter(failed=False).exists():
+        return
+    from .tasks import replay_spooled_tasks
+    try:
+        replay_spooled_tasks.apply_async(retry=False)
+    except Exception:
+        # Спул переотправит Celery Beat или manage.py replay_spool
+        logger.warning("Не удалось запланировать переотправку спула")
+
+
+def _claim_batch(batch_size):
+    """
+    Захватывает пачку задач на CELERY_SPOOL_CLAIM_TIMEOUT секунд. Блокировка
+    строк держится только на время захвата, отправка идёт уже вне транзакции.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = (
+            SpooledTask.objects
+            .filter(failed=False)
+            .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+            .order_by('id')
+        )
+        if supports_skip_locked():
+            # Несколько воркеров разбирают спул, не мешая друг другу
+            queryset = queryset.select_for_update(skip_locked=True)
+        batch = list(queryset[:batch_size])
+        if batch:
+            claimed_until = now + timedelta(seconds=settings.CELERY_SPOOL_CLAIM_TIMEOUT)
+            SpooledTask.objects.filter(pk__in=[item.pk for item in batch]).update(claimed_until=claimed_until)
+    return batch
+
+
+def replay_spool(batch_size=None) -> int:
+    """
+    Переотправляет задачи из спула в брокер пачками. Останавливается на первой
+    ошибке брокера. Возвращает число переотправленных задач.
+    """
+    batch_size = batch_size or settings.CELERY_SPOOL_REPLAY_BATCH
+    replayed = 0
+    while True:
+        batch = _claim_batch(batch_size)
+        if not batch:
+            return replayed
+        sent = []
+        for item in batch:
+            try:
+                current_app.send_task(item.task_name, item.args, item.kwargs, retry=False, **item.options)
+            except Exception as exc:
+                attempts = item.attempts + 1
+                failed = attempts >= settings.CELERY_SPOOL_MAX_ATTEMPTS
+                SpooledTask.objects.filter(pk=item.pk).update(
+                    attempts=attempts, last_error=repr(exc), failed=failed, claimed_until=None
+                )
+                SpooledTask.objects.filter(pk__in=sent).delete()
+                # Остаток пачки возвращаем в спул для следующей переотправки
+                SpooledTask.objects.filter(
+                    pk__in=[other.pk for other in batch if other.pk not in sent and other.pk != item.pk]
+                ).update(claimed_until=None)
+                if failed:
+                    logger.error("Задача %s #%s не отправлена после %s попыток и помечена failed: %s",
+                                 item.task_name, item.pk, attempts, exc)
+                else:
+                    logger.warning("Переотправка спула прервана: %s", exc)
+                return replayed + len(sent)
+            sent.append(item.pk)
+        SpooledTask.objects.filter(pk__in=sent).delete()
+        replayed += len(sent)
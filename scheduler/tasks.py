@@ -0,0 +1,15 @@
+"""
+Celery tasks for the scheduler app.
+"""
+from celery import shared_task
+
+from .queue import replay_spool
+
+
+@shared_task
+def replay_spooled_tasks():
+    """
+    Переотправляет в брокер задачи, отложенные в спул, пока брокер был недоступен.
+    """
+    replayed = replay_spool()
+    return f"Replayed {replayed} spooled tasks"
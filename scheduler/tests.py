@@ -1,3 +1,73 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from .models import SpooledTask
+from .queue import CircuitBreaker, enqueue, replay_spool
+
+
+class CircuitBreakerTests(TestCase):
+    def test_opens_after_threshold_and_probes_after_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        self.assertFalse(breaker.is_open)
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertTrue(breaker.allow())  # half-open probe
+        self.assertTrue(breaker.record_success())
+        self.assertFalse(breaker.is_open)
+
+
+class EnqueueTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('scheduler.queue.breaker', CircuitBreaker(failure_threshold=1, reset_timeout=60))
+        self.breaker = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.task = mock.Mock()
+        self.task.name = 'news.tasks.notify_subscribers'
+
+    def test_broker_error_spools_task_and_opens_breaker(self):
+        self.task.apply_async.side_effect = ConnectionError('broker down')
+        self.assertIsNone(enqueue(self.task, args=(42,), priority=5))
+        self.assertTrue(self.breaker.is_open)
+        spooled = SpooledTask.objects.get()
+        self.assertEqual((spooled.task_name, spooled.args, spooled.options),
+                         ('news.tasks.notify_subscribers', [42], {'priority': 5}))
+
+    def test_open_breaker_skips_broker(self):
+        self.breaker.record_failure()
+        enqueue(self.task, args=(1,))
+        self.task.apply_async.assert_not_called()
+        self.assertEqual(SpooledTask.objects.count(), 1)
+
+    def test_replay_sends_and_removes_spooled_tasks(self):
+        SpooledTask.objects.create(task_name='news.tasks.notify_subscribers', args=[7])
+        with mock.patch('scheduler.queue.current_app') as app:
+            self.assertEqual(replay_spool(), 1)
+        app.send_task.assert_called_once_with('news.tasks.notify_subscribers', [7], {}, retry=False)
+        self.assertFalse(SpooledTask.objects.exists())
+
+    def test_replay_marks_task_failed_after_max_attempts(self):
+        broken = SpooledTask.objects.create(task_name='news.tasks.broken', attempts=1)
+        SpooledTask.objects.create(task_name='news.tasks.notify_subscribers', args=[7])
+        with self.settings(CELERY_SPOOL_MAX_ATTEMPTS=2), mock.patch('scheduler.queue.current_app') as app:
+            app.send_task.side_effect = [TypeError('bad options')]
+            self.assertEqual(replay_spool(), 0)
+            broken.refresh_from_db()
+            self.assertEqual((broken.attempts, broken.failed, broken.claimed_until), (2, True, None))
+            # Остаток пачки возвращён в спул, failed-задача очередь больше не держит
+            self.assertFalse(SpooledTask.objects.filter(claimed_until__isnull=False).exists())
+            app.send_task.side_effect = None
+            self.assertEqual(replay_spool(), 1)
+        app.send_task.assert_called_with('news.tasks.notify_subscribers', [7], {}, retry=False)
+        self.assertEqual(list(SpooledTask.objects.values_list('pk', flat=True)), [broken.pk])
+
+    def test_replay_skips_batch_claimed_by_another_worker(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        SpooledTask.objects.create(task_name='news.tasks.notify_subscribers',
+                                   claimed_until=timezone.now() + timedelta(minutes=1))
+        with mock.patch('scheduler.queue.current_app') as app:
+            self.assertEqual(replay_spool(), 0)
+        app.send_task.assert_not_called()
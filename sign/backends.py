@@ -0,0 +1,116 @@
+"""
+Кэширование пользователя, его групп и прав.
+
+Пользователь сессии (get_user), его группы и права читаются из БД один раз и
+хранятся в кэше (settings.AUTH_CACHE_TIMEOUT секунд). Сброс - в sign/signals.py:
+пользователь - при сохранении и удалении, состав групп и личные права -
+через m2m_changed точечно для пользователя, права группы - для всех
+пользователей сразу, увеличением общей версии ключей.
+Изменения через QuerySet.update() сигналов не вызывают и кэш не сбрасывают.
+"""
+from allauth.account.auth_backends import AuthenticationBackend
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+
+AUTHORS_GROUP = 'authors'
+
+VERSION_KEY = 'auth-cache:version'
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def _user_key(user_id, version):
+    return f'auth-cache:{version}:{user_id}'
+
+
+def _user_object_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(_user_key(user_id, _version()))
+
+
+def invalidate_user_object(user_id):
+    cache.delete(_user_object_key(user_id))
+
+
+def invalidate_all():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Ключа версии ещё нет (или кэш очищен) - начнём с новой версии
+        cache.set(VERSION_KEY, 2, None)
+
+
+def _load(user):
+    groups = list(user.groups.values_list('name', flat=True))
+    user_perms = Permission.objects.filter(user=user).values_list('content_type__app_label', 'codename')
+    group_perms = Permission.objects.filter(group__user=user).values_list('content_type__app_label', 'codename')
+    return {
+        'groups': groups,
+        'user_perms': sorted({f'{app}.{codename}' for app, codename in user_perms}),
+        'group_perms': sorted({f'{app}.{codename}' for app, codename in group_perms}),
+    }
+
+
+def auth_data(user):
+    """Группы и права пользователя: из объекта (в пределах запроса), из кэша или из БД."""
+    data = getattr(user, '_auth_cache', None)
+    if data is None:
+        key = _user_key(user.pk, _version())
+        data = cache.get(key)
+        if data is None:
+            data = _load(user)
+            cache.set(key, data, settings.AUTH_CACHE_TIMEOUT)
+        user._auth_cache = data
+    return data
+
+
+def group_names(user) -> set:
+    if not user.is_authenticated:
+        return set()
+    return set(auth_data(user)['groups'])
+
+
+def is_author(user) -> bool:
+    return AUTHORS_GROUP in group_names(user)
+
+
+class CachedBackendMixin:
+    """Берёт пользователя сессии, права пользователя и его групп из кэша."""
+
+    def get_user(self, user_id):
+        key = _user_object_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                # Кэшируем только что загруженный объект, без кэшей прав текущего запроса
+                cache.set(key, user, settings.AUTH_CACHE_TIMEOUT)
+        return user
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        perm_cache_name = f'_{from_name}_perm_cache'
+        if not hasattr(user_obj, perm_cache_name):
+            if user_obj.is_superuser:
+                perms = Permission.objects.values_list('content_type__app_label', 'codename')
+                perms = {f'{app}.{codename}' for app, codename in perms}
+            else:
+                perms = set(auth_data(user_obj)[f'{from_name}_perms'])
+            setattr(user_obj, perm_cache_name, perms)
+        return getattr(user_obj, perm_cache_name)
+
+
+class CachedModelBackend(CachedBackendMixin, ModelBackend):
+    pass
+
+
+class CachedAuthenticationBackend(CachedBackendMixin, AuthenticationBackend):
+    """Бэкенд allauth (вход по email) с тем же кэшированием."""
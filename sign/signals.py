@@ -1,11 +1,15 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from allauth.account.signals import user_signed_up
 from allauth.account.models import EmailAddress, EmailConfirmationHMAC
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
 from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
 from django.contrib.sites.models import Site
+from scheduler.queue import enqueue
+from .backends import invalidate_all, invalidate_user, invalidate_user_object
+from .tasks import send_welcome_email
 
 
 @receiver(user_signed_up)
@@ -28,22 +32,48 @@ def send_welcome_with_activation(request, user, **kwargs):
     except (Site.DoesNotExist, AttributeError):
         activation_url = f"http://localhost:8000{activation_path}"
 
-    context = {
-        'user': user,
-        'activation_url': activation_url,
-    }
-    html = render_to_string('emails/welcome.html', context)
-    text = f"""Привет, {user.get_username()}!
-Добро пожаловать в News Portal.
-Пожалуйста, активируйте аккаунт: {activation_url}
-"""
-
-    send_mail(
-        subject='Добро пожаловать в News Portal!',
-        message=text,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        html_message=html,
-        fail_silently=False,
-    )
+    # Письмо отправляет воркер очереди realtime после коммита регистрации;
+    # запрос регистрации не ждёт SMTP
+    transaction.on_commit(lambda: enqueue(send_welcome_email, args=(user.pk, activation_url)))
 
+
+
+def _invalidate(func, *args):
+    # Сразу (эта транзакция видит свои изменения) и ещё раз после коммита: параллельный
+    # запрос мог успеть закэшировать ещё не закоммиченные, т.е. старые данные
+    func(*args)
+    transaction.on_commit(lambda: func(*args))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_auth_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш групп и прав при изменении членства в группах и личных прав."""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        _invalidate(invalidate_user, instance.pk)
+    elif pk_set is not None:
+        # group.user_set.add(...) / permission.user_set.remove(...)
+        for user_id in pk_set:
+            _invalidate(invalidate_user, user_id)
+    else:
+        # group.user_set.clear(): затронутые пользователи уже неизвестны
+        _invalidate(invalidate_all)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_auth_cache_for_all(sender, **kwargs):
+    """Права группы касаются всех её участников - сбрасываем кэш целиком."""
+    action = kwargs.get('action')
+    if action is None or action.startswith('post_'):
+        _invalidate(invalidate_all)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Пользователь сессии берётся из кэша - сбрасываем его при любом изменении (пароль, is_active, last_login)."""
+    _invalidate(invalidate_user_object, instance.pk)
@@ -0,0 +1,46 @@
+"""
+Celery tasks for the sign app.
+"""
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+
+from config.metrics import EMAILS_SENT
+
+
+@shared_task(priority=0)
+def send_welcome_email(user_id, activation_url):
+    """
+    Отправляет приветственное письмо со ссылкой активации новому пользователю.
+
+    Args:
+        user_id: ID зарегистрированного пользователя
+        activation_url: абсолютная ссылка подтверждения email
+    """
+    try:
+        user = User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        return f"User with id {user_id} does not exist"
+
+    context = {
+        'user': user,
+        'activation_url': activation_url,
+    }
+    html = render_to_string('emails/welcome.html', context)
+    text = f"""Привет, {user.get_username()}!
+Добро пожаловать в News Portal.
+Пожалуйста, активируйте аккаунт: {activation_url}
+"""
+
+    send_mail(
+        subject='Добро пожаловать в News Portal!',
+        message=text,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[user.email],
+        html_message=html,
+        fail_silently=False,
+    )
+    EMAILS_SENT.labels('send_welcome_email').inc()
+    return f"Sent welcome email to user {user_id}"
@@ -1,3 +1,96 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from .backends import is_author
+
+
+class CachedPermissionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'pass')
+        self.authors = Group.objects.create(name='authors')
+        self.add_post = Permission.objects.get(codename='add_post', content_type__app_label='news')
+
+    def fresh_user(self):
+        # Новый объект, как в следующем запросе
+        return User.objects.get(pk=self.user.pk)
+
+    def test_second_request_needs_no_queries(self):
+        self.authors.permissions.add(self.add_post)
+        self.authors.user_set.add(self.user)
+        user = self.fresh_user()
+        self.assertTrue(is_author(user))
+        self.assertTrue(user.has_perm('news.add_post'))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(is_author(user))
+            self.assertTrue(user.has_perm('news.add_post'))
+            self.assertFalse(user.has_perm('news.delete_post'))
+
+    def test_group_membership_change_invalidates(self):
+        self.assertFalse(is_author(self.fresh_user()))
+        self.authors.user_set.add(self.user)
+        self.assertTrue(is_author(self.fresh_user()))
+        self.user.groups.remove(self.authors)
+        self.assertFalse(is_author(self.fresh_user()))
+
+    def test_group_permission_change_invalidates(self):
+        self.authors.user_set.add(self.user)
+        self.assertFalse(self.fresh_user().has_perm('news.add_post'))
+        self.authors.permissions.add(self.add_post)
+        self.assertTrue(self.fresh_user().has_perm('news.add_post'))
+        self.authors.permissions.clear()
+        self.assertFalse(self.fresh_user().has_perm('news.add_post'))
+
+    def test_user_permission_change_invalidates(self):
+        self.assertFalse(self.fresh_user().has_perm('news.add_post'))
+        self.user.user_permissions.add(self.add_post)
+        self.assertTrue(self.fresh_user().has_perm('news.add_post'))
+
+    def test_cache_is_invalidated_again_after_commit(self):
+        from .backends import _user_key, _version
+        self.assertFalse(self.fresh_user().has_perm('news.add_post'))
+        key = _user_key(self.user.pk, _version())
+        stale = cache.get(key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(self.add_post)
+            # Параллельный запрос успел закэшировать права до коммита
+            cache.set(key, stale)
+        self.assertTrue(self.fresh_user().has_perm('news.add_post'))
+
+
+class CachedSessionUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def authenticated_user(self):
+        request = RequestFactory().get('/news/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = self.session_key
+
+        def view(request):
+            request.resolved_user = request.user
+            request.resolved_user.is_authenticated
+            return HttpResponse()
+
+        SessionMiddleware(AuthenticationMiddleware(view))(request)
+        return request.resolved_user
+
+    def test_session_and_user_come_from_cache(self):
+        self.assertEqual(self.authenticated_user().pk, self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticated_user().pk, self.user.pk)
+
+    def test_user_change_invalidates_cached_user(self):
+        self.authenticated_user()
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.authenticated_user().is_authenticated)
@@ -3,6 +3,7 @@ from django.views.generic.edit import CreateView
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import Group
+from .backends import AUTHORS_GROUP, is_author
 from .models import BaseRegisterForm
 
 
@@ -15,7 +16,7 @@ class BaseRegisterView(CreateView):
 @login_required
 def upgrade_me(request):
     user = request.user
-    authors_group, _ = Group.objects.get_or_create(name='authors')
-    if not user.groups.filter(name='authors').exists():
+    if not is_author(user):
+        authors_group, _ = Group.objects.get_or_create(name=AUTHORS_GROUP)
         authors_group.user_set.add(user)
     return redirect('/news/')